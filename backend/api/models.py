@@ -1,5 +1,5 @@
 # backend/api/models.py
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 from pydantic import BaseModel
 
 
@@ -28,6 +28,8 @@ class ChatRequest(BaseModel):
     Input payload for /chat endpoint.
     """
     message: str
+    session_id: Optional[str] = None
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class ChatResponse(BaseModel):
@@ -35,3 +37,32 @@ class ChatResponse(BaseModel):
     Output payload.
     """
     reply: str
+
+
+class ChatBatchRequest(BaseModel):
+    """
+    Input payload for /chat/batch: independent queries, each answered
+    with its own history.
+    """
+    messages: List[str]
+    session_id: Optional[str] = None
+    concurrency: Optional[int] = None
+
+
+# -------------------------------------------
+# FILES
+# -------------------------------------------
+
+class UploadResponse(BaseModel):
+    file_name: str
+    size: int
+
+
+class ExportRequest(BaseModel):
+    """
+    Input payload for /export: a read-only SQL query over the workbook
+    mirror (see run_sql) and the download format.
+    """
+    query: str
+    format: Literal["csv", "xlsx"] = "csv"
+    file_name: Optional[str] = None
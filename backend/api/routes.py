@@ -1,18 +1,33 @@
 # backend/api/routes.py
-from typing import Optional
+import asyncio
+import json
+import os
+import re
+from typing import Optional, Union
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi import status
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from backend.config import get_settings
+from backend.core import workbook_files
+from backend.core.admission import AdmissionRejected
+from backend.core.workbook_files import UploadError
+from backend.services.usage_tracker import usage_tracker
 from backend.utils.logger import get_logger
+from backend.utils.metrics import REGISTRY
+from backend.utils.tracing import current_trace
 
 
 from backend.api.models import (
     AuthUrlResponse,
     AuthCallbackResponse,
+    ChatBatchRequest,
     ChatRequest,
     ChatResponse,
+    ExportRequest,
+    UploadResponse,
 )
 
 logger = get_logger(__name__)
@@ -35,6 +50,51 @@ async def health_check():
     return {"status": "ok"}
 
 
+# ----------------------------------------------------
+# Metrics (Prometheus text format)
+# ----------------------------------------------------
+@router.get("/metrics", tags=["system"], response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """
+    Backend metrics followed by each MCP server's own metrics.
+    """
+    body = REGISTRY.render()
+
+    chat_agent = request.app.state.chat_agent
+    for name, client in chat_agent.mcp_clients.items():
+        try:
+            body += await client.server_metrics()
+        except Exception as e:
+            logger.warning(f"Could not scrape metrics from MCP client '{name}': {e}")
+
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+# ----------------------------------------------------
+# Gemini token / latency accounting
+# ----------------------------------------------------
+@router.get("/usage", tags=["system"])
+async def usage_summary(top: int = 10):
+    """
+    Per-session totals plus the recent turns with the largest prompts.
+    """
+    return {
+        "sessions": usage_tracker.sessions(),
+        "top_turns": usage_tracker.top_turns(limit=top),
+    }
+
+
+@router.get("/usage/{session_id}", tags=["system"])
+async def session_usage(session_id: str):
+    turns = usage_tracker.session_turns(session_id)
+    if not turns:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No usage recorded for session '{session_id}'",
+        )
+    return {"session_id": session_id, "turns": turns}
+
+
 # ----------------------------------------------------
 # Chat Endpoint (Gemini + MCP + Salesforce context)
 # ----------------------------------------------------
@@ -49,6 +109,9 @@ async def chat_endpoint(request: Request, payload: ChatRequest):
     - Accepts user message string
     - Uses Gemini + MCP + Salesforce where needed
     - Returns final text answer
+
+    Runs under admission control: 429 when the client is over its rate
+    limit, 503 when the chat queue is full, both with Retry-After.
     """
     user_message = payload.message.strip()
     if not user_message:
@@ -56,6 +119,204 @@ async def chat_endpoint(request: Request, payload: ChatRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Message cannot be empty",
         )
+    trace = current_trace()
+    if trace is not None and payload.session_id:
+        trace.session_id = payload.session_id  # log correlation
+
     chat_agent = request.app.state.chat_agent
-    reply = await chat_agent.run(user_message)
+    admission = request.app.state.admission
+    try:
+        async with admission.slot(_client_id(request, payload), payload.priority):
+            reply = await chat_agent.run(user_message)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
     return ChatResponse(reply=reply)
+
+
+@router.post("/chat/batch", tags=["chat"])
+async def chat_batch_endpoint(request: Request, payload: ChatBatchRequest):
+    """
+    Batch chat API for report generation:
+    - Accepts many independent queries, each answered with its own history
+    - Runs them concurrently, sharing read-only tool results
+    - Streams one JSON line per query as it finishes:
+      {"index", "query", "reply" | "error", "seconds"}
+
+    The batch counts once against the client's rate limit; each query then
+    waits for an admission slot at batch priority.
+    """
+    queries = [m.strip() for m in payload.messages]
+    if not queries or not all(queries):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Messages cannot be empty",
+        )
+    if len(queries) > settings.CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.CHAT_BATCH_MAX_QUERIES} messages per batch",
+        )
+
+    trace = current_trace()
+    if trace is not None and payload.session_id:
+        trace.session_id = payload.session_id
+
+    chat_agent = request.app.state.chat_agent
+    admission = request.app.state.admission
+    client = _client_id(request, payload)
+    try:
+        admission.check_rate(client, "batch")
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    concurrency = min(
+        payload.concurrency or settings.CHAT_BATCH_CONCURRENCY,
+        settings.CHAT_BATCH_CONCURRENCY,
+    )
+    results = chat_agent.run_batch(
+        queries,
+        concurrency=concurrency,
+        max_tool_calls=settings.CHAT_BATCH_MAX_TOOL_CALLS,
+        slot=lambda: admission.slot(client, "batch", rate_limit=False),
+    )
+
+    async def lines():
+        async for result in results:
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# ----------------------------------------------------
+# Workbook files
+# ----------------------------------------------------
+
+# Warm-up tasks after uploads; referenced so they are not garbage collected
+_warmups = set()
+
+
+@router.put(
+    "/files/{file_name}",
+    response_model=UploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    tags=["files"],
+)
+async def upload_file(request: Request, file_name: str, overwrite: bool = False):
+    """
+    Streamed workbook upload: the raw request body is the file, e.g.
+    curl -T Sales.xlsx http://localhost:8000/api/files/Sales.xlsx
+
+    - Written to disk chunk by chunk (never held in memory)
+    - Checked against its suffix, then atomically moved into EXCEL_DATA_DIR
+    - 409 if the file exists and overwrite is false, 413 above UPLOAD_MAX_MB
+    - The MCP server then loads it and refreshes its search index and SQL
+      mirror in the background
+    """
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds {settings.UPLOAD_MAX_MB} MB",
+        )
+
+    try:
+        size = await workbook_files.receive_upload(
+            request.stream(), settings.EXCEL_DATA_DIR, file_name, max_bytes, overwrite
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    task = asyncio.create_task(_warm_up(request.app.state.excel_client, file_name))
+    _warmups.add(task)
+    task.add_done_callback(_warmups.discard)
+    return UploadResponse(file_name=file_name, size=size)
+
+
+async def _warm_up(client, file_name: str):
+    try:
+        info = await client.warm_up(file_name)
+        logger.info(f"Warmed up '{file_name}': {info}")
+    except Exception as e:
+        logger.warning(f"Warm-up of '{file_name}' failed: {e}")
+
+
+@router.get("/files/{file_name}", tags=["files"])
+async def download_file(file_name: str):
+    """
+    Stream a workbook from EXCEL_DATA_DIR.
+    """
+    try:
+        workbook_files.check_file_name(file_name)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    path = settings.EXCEL_DATA_DIR / file_name
+    if not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Excel file '{file_name}' not found",
+        )
+    return FileResponse(path, filename=file_name)
+
+
+@router.post("/export", tags=["files"])
+async def export_query(request: Request, payload: ExportRequest):
+    """
+    Download the result of a read-only SQL query over the workbooks
+    (the run_sql mirror) as CSV or XLSX.
+
+    Rows are fetched EXPORT_PAGE_ROWS at a time from one server-side
+    cursor, so every page reads the same snapshot: CSV is streamed as the
+    pages arrive, XLSX is written to a temp file in write-only mode first.
+    At most EXPORT_MAX_ROWS rows are exported.
+    """
+    client = request.app.state.excel_client
+    try:
+        first = await client.run_sql(payload.query, limit=settings.EXPORT_PAGE_ROWS, paginate=True)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    columns = first["columns"]
+    pages = workbook_files.sql_pages(
+        client, first, settings.EXPORT_PAGE_ROWS, settings.EXPORT_MAX_ROWS
+    )
+    stem = re.sub(r"[^\w.\- ]", "_", os.path.splitext(os.path.basename(payload.file_name or ""))[0]) or "export"
+    download = f"{stem}.{payload.format}"
+    headers = {"Content-Disposition": f'attachment; filename="{download}"'}
+
+    if payload.format == "csv":
+        return StreamingResponse(
+            workbook_files.csv_chunks(columns, pages),
+            media_type=workbook_files.EXPORT_FORMATS["csv"],
+            headers=headers,
+        )
+
+    try:
+        path = await workbook_files.write_xlsx(columns, pages)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return FileResponse(
+        path,
+        media_type=workbook_files.EXPORT_FORMATS["xlsx"],
+        headers=headers,
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+def _client_id(request: Request, payload: Union[ChatRequest, ChatBatchRequest]) -> str:
+    """
+    Rate-limit key: X-Client-ID header, then session id, then peer address.
+    """
+    return (
+        request.headers.get("X-Client-ID")
+        or payload.session_id
+        or (request.client.host if request.client else "unknown")
+    )
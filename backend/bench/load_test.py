@@ -0,0 +1,299 @@
+# backend/bench/load_test.py
+"""
+Offline load generator for /api/chat.
+
+Starts the FastAPI app in-process (uvicorn on 127.0.0.1) with the fake
+Gemini backend and the real stdio MCP Excel server, then drives /api/chat
+at a fixed concurrency (closed loop) or a target RPS (open loop).
+
+Usage (from the repo root):
+    python -m backend.bench.load_test --concurrency 8 --duration 20
+    python -m backend.bench.load_test --rps 5 --latency-ms 300 --script my_script.json
+    python -m backend.bench.load_test --error-rate 0.1 --slow-rate 0.05 --slow-ms 4000
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+
+# ------------------------------
+# Measurement helpers
+# ------------------------------
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class StageTimer:
+    """
+    Accumulates wall time spent inside wrapped methods of a live object.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+
+    def wrap(self, obj: Any, attr: str):
+        original = getattr(obj, attr, None)
+        if original is None:
+            return
+
+        if inspect.iscoroutinefunction(original):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.seconds += time.perf_counter() - start
+                    self.calls += 1
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.seconds += time.perf_counter() - start
+                    self.calls += 1
+
+        setattr(obj, attr, timed)
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01):
+    """
+    Records how late the event loop wakes up a sleeping task.
+    Anything blocking the loop (sync I/O, CPU work) shows up here.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+# ------------------------------
+# Load shapes
+# ------------------------------
+
+class LoadResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.started = 0
+
+    def record_error(self, key: str):
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+
+async def _one_request(client, url: str, message: str, result: LoadResult):
+    result.started += 1
+    start = time.perf_counter()
+    try:
+        res = await client.post(url, json={"message": message})
+        if res.status_code == 200:
+            result.latencies.append(time.perf_counter() - start)
+        else:
+            result.record_error(f"HTTP {res.status_code}")
+    except Exception as e:
+        result.record_error(type(e).__name__)
+
+
+async def run_closed_loop(client, url, messages, concurrency: int, deadline: float) -> LoadResult:
+    result = LoadResult()
+    cycle = itertools.cycle(messages)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await _one_request(client, url, next(cycle), result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result
+
+
+async def run_open_loop(client, url, messages, rps: float, concurrency: int, deadline: float) -> LoadResult:
+    """
+    Fires requests on a fixed schedule; at most `concurrency` are in flight,
+    so a saturated server shows up as a lower achieved RPS.
+    """
+    result = LoadResult()
+    cycle = itertools.cycle(messages)
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def fire(message):
+        try:
+            await _one_request(client, url, message, result)
+        finally:
+            slots.release()
+
+    next_at = time.perf_counter()
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        await slots.acquire()
+        tasks.append(asyncio.create_task(fire(next(cycle))))
+        next_at += 1.0 / rps
+
+    await asyncio.gather(*tasks)
+    return result
+
+
+# ------------------------------
+# Report
+# ------------------------------
+
+def build_report(result: LoadResult, elapsed: float, lag: List[float], model: StageTimer, mcp: StageTimer) -> Dict[str, Any]:
+    ok = len(result.latencies)
+    ms = lambda s: round(s * 1000, 2)
+    return {
+        "requests": result.started,
+        "ok": ok,
+        "errors": result.errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(result.latencies, 50)),
+            "p95": ms(percentile(result.latencies, 95)),
+            "p99": ms(percentile(result.latencies, 99)),
+            "max": ms(max(result.latencies, default=0.0)),
+        },
+        "event_loop_lag_ms": {
+            "p50": ms(percentile(lag, 50)),
+            "p99": ms(percentile(lag, 99)),
+            "max": ms(max(lag, default=0.0)),
+        },
+        "model": {
+            "calls": model.calls,
+            "total_s": round(model.seconds, 3),
+            "per_request_ms": ms(model.seconds / ok) if ok else 0.0,
+        },
+        "mcp": {
+            "calls": mcp.calls,
+            "total_s": round(mcp.seconds, 3),
+            "per_request_ms": ms(mcp.seconds / ok) if ok else 0.0,
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    lat, lag = report["latency_ms"], report["event_loop_lag_ms"]
+    print()
+    print(f"requests      {report['requests']}  ok={report['ok']}  errors={report['errors'] or 0}")
+    print(f"throughput    {report['throughput_rps']} req/s over {report['elapsed_s']} s")
+    print(f"latency ms    p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  max={lat['max']}")
+    print(f"loop lag ms   p50={lag['p50']}  p99={lag['p99']}  max={lag['max']}")
+    for stage in ("model", "mcp"):
+        s = report[stage]
+        print(f"{stage:<13} calls={s['calls']}  total={s['total_s']} s  per request={s['per_request_ms']} ms")
+
+
+# ------------------------------
+# Entry point
+# ------------------------------
+
+def _configure_env(args):
+    """
+    Must run before anything imports backend.config (settings are cached).
+    """
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    if args.script:
+        os.environ["GEMINI_FAKE_SCRIPT"] = args.script
+    if args.latency_ms is not None:
+        os.environ["GEMINI_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    if args.error_rate is not None:
+        os.environ["GEMINI_FAKE_ERROR_RATE"] = str(args.error_rate)
+    if args.slow_rate is not None:
+        os.environ["GEMINI_FAKE_SLOW_RATE"] = str(args.slow_rate)
+        os.environ["GEMINI_FAKE_SLOW_MS"] = str(args.slow_ms)
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import uvicorn
+
+    from backend import main as backend_main
+
+    model_timer, mcp_timer = StageTimer(), StageTimer()
+    model_timer.wrap(backend_main.gemini.model, "generate_content")
+    model_timer.wrap(backend_main.gemini.model, "generate_content_async")
+    mcp_timer.wrap(backend_main.excel_mcp_client, "call_tool")
+
+    server = uvicorn.Server(
+        uvicorn.Config(backend_main.app, host="127.0.0.1", port=args.port, log_level="warning")
+    )
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{backend_main.settings.API_PREFIX}/chat"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    lag: List[float] = []
+    stop = asyncio.Event()
+
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            # Warm-up: tool schema fetch, first sheet parse
+            await _one_request(client, url, args.message[0], LoadResult())
+            model_timer.seconds = mcp_timer.seconds = 0.0
+            model_timer.calls = mcp_timer.calls = 0
+
+            lag_task = asyncio.create_task(monitor_loop_lag(lag, stop))
+            start = time.perf_counter()
+            deadline = start + args.duration
+            if args.rps:
+                result = await run_open_loop(client, url, args.message, args.rps, args.concurrency, deadline)
+            else:
+                result = await run_closed_loop(client, url, args.message, args.concurrency, deadline)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await lag_task
+    finally:
+        server.should_exit = True
+        await serve_task
+
+    return build_report(result, elapsed, lag, model_timer, mcp_timer)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline load test for /api/chat")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max requests in flight")
+    parser.add_argument("--rps", type=float, default=None, help="Open-loop target rate (default: closed loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured run length in seconds")
+    parser.add_argument("--message", action="append", help="Chat message(s) to send, cycled")
+    parser.add_argument("--script", default=None, help="Fake Gemini script (JSON)")
+    parser.add_argument("--latency-ms", type=float, default=None, help="Fake model latency per call")
+    parser.add_argument("--error-rate", type=float, default=None, help="Share of fake model calls failing with a 503")
+    parser.add_argument("--slow-rate", type=float, default=None, help="Share of fake model calls taking --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000.0, help="Latency of the slow fake model calls")
+    parser.add_argument("--port", type=int, default=0, help="Port for the in-process app (0 = random)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout")
+    parser.add_argument("--log-level", default="WARNING", help="App LOG_LEVEL during the run")
+    parser.add_argument("--json", dest="json_out", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+    args.message = args.message or ["Show me the accounts"]
+
+    _configure_env(args)
+    report = asyncio.run(run(args))
+
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
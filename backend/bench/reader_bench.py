@@ -0,0 +1,96 @@
+# backend/bench/reader_bench.py
+"""
+Compare the Excel MCP server's reader engines.
+
+Times every installed engine on the given files (default: excel_data/)
+and/or on a generated sheet of --rows rows, and prints a markdown table.
+
+Usage (from the repo root):
+    python -m backend.bench.reader_bench
+    python -m backend.bench.reader_bench --rows 100000 --formats xlsx,csv,ods
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.mcp import excel_readers
+
+WRITERS = {
+    "xlsx": lambda df, p: df.to_excel(p, index=False, engine="openpyxl"),
+    "ods": lambda df, p: df.to_excel(p, index=False, engine="odf"),
+    "csv": lambda df, p: df.to_csv(p, index=False),
+}
+
+
+def synthetic_frame(rows: int) -> pd.DataFrame:
+    """
+    CRM-like mix of ids, text, numbers and dates.
+    """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "OppID": [f"O-{i:07d}" for i in range(rows)],
+        "Account": rng.choice([f"Company{i} Pvt Ltd" for i in range(500)], rows),
+        "Stage": rng.choice(["New", "Qualified", "Proposal Sent", "Negotiation", "Closed Won"], rows),
+        "Amount": rng.integers(1_000, 2_000_000, rows),
+        "Probability": rng.random(rows).round(2),
+        "CloseDate": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "Owner": rng.choice(["Alex R", "Sam K", "Priya N", "Jordan T"], rows),
+    })
+
+
+def run(files: List[Path], repeat: int) -> List[dict]:
+    results = []
+    for path in files:
+        timings = excel_readers.benchmark(path, repeat=repeat)
+        if not timings:
+            continue
+        rows = sum(len(df) for df in excel_readers.read_sheets(path).values())
+        fastest = min(timings.values())
+        for engine, seconds in sorted(timings.items(), key=lambda kv: kv[1]):
+            results.append({
+                "file": path.name,
+                "rows": rows,
+                "engine": engine,
+                "ms": seconds * 1000,
+                "x_fastest": seconds / fastest,
+            })
+    return results
+
+
+def print_table(results: List[dict]):
+    print("| file | rows | engine | median ms | vs fastest |")
+    print("|---|---:|---|---:|---:|")
+    for r in results:
+        print(f"| {r['file']} | {r['rows']} | {r['engine']} | {r['ms']:.1f} | {r['x_fastest']:.1f}x |")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark Excel reader engines")
+    parser.add_argument("files", nargs="*", type=Path, help="Files to read (default: excel_data/*)")
+    parser.add_argument("--rows", type=int, default=0, help="Also benchmark a generated sheet of this many rows")
+    parser.add_argument("--formats", default="xlsx,csv", help=f"Formats for the generated sheet: {','.join(WRITERS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine (median is reported)")
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(
+        f for f in Path("excel_data").iterdir()
+        if f.suffix.lower() in excel_readers.SUPPORTED_SUFFIXES
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.rows:
+            df = synthetic_frame(args.rows)
+            for fmt in args.formats.split(","):
+                path = Path(tmp) / f"synthetic_{args.rows}.{fmt}"
+                WRITERS[fmt](df, path)
+                files.append(path)
+
+        print_table(run(files, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# backend/bench/startup_bench.py
+"""
+Cold-start benchmark for the backend and the Excel MCP server.
+
+Default mode starts the app with uvicorn in a fresh process (fake Gemini
+backend, real stdio MCP server) and measures, from the process spawn, the
+time until /api/health answers and until the first /api/chat succeeds.
+The startup phase gauges are then scraped from /api/metrics:
+
+    backend_startup_seconds           import, gemini, mcp_connect, ready
+    excel_mcp_startup_seconds         spawn, initialize, first_tool_call
+    excel_mcp_server_startup_seconds  import (inside the server process)
+
+--respawn instead times MCPExcelClient.reconnect() plus one tool call
+in-process, with a cold server and with a warm standby taking over.
+
+Usage (from the repo root):
+    python -m backend.bench.startup_bench --runs 5
+    python -m backend.bench.startup_bench --runs 5 --standby
+    python -m backend.bench.startup_bench --respawn --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.bench.load_test import percentile
+
+PHASE_METRICS = (
+    "backend_startup_seconds",
+    "excel_mcp_startup_seconds",
+    "excel_mcp_server_startup_seconds",
+)
+_SAMPLE_RE = re.compile(r'^(\w+)\{phase="(\w+)"\} (\S+)$')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_phases(metrics_text: str) -> Dict[str, float]:
+    """
+    {"metric.phase": seconds} for the startup phase gauges in a scrape.
+    """
+    phases = {}
+    for line in metrics_text.splitlines():
+        m = _SAMPLE_RE.match(line)
+        if m and m.group(1) in PHASE_METRICS:
+            phases[f"{m.group(1)}.{m.group(2)}"] = float(m.group(3))
+    return phases
+
+
+# ------------------------------
+# Cold start of the whole app
+# ------------------------------
+
+async def cold_start(args) -> Dict[str, float]:
+    import httpx
+
+    port = _free_port()
+    env = {
+        **os.environ,
+        "GEMINI_BACKEND": "fake",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "offline"),
+        "LOG_LEVEL": args.log_level,
+        "EXCEL_MCP_STANDBY": "true" if args.standby else "false",
+    }
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}/api"
+    sample: Dict[str, float] = {}
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout) as client:
+            deadline = start + args.timeout
+            while "health" not in sample:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("app did not come up")
+                try:
+                    if (await client.get(f"{base}/health")).status_code == 200:
+                        sample["health"] = time.perf_counter() - start
+                except httpx.TransportError:
+                    await asyncio.sleep(0.02)
+
+            while "first_chat" not in sample:
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("no successful chat")
+                res = await client.post(f"{base}/chat", json={"message": args.message})
+                if res.status_code == 200:
+                    sample["first_chat"] = time.perf_counter() - start
+                else:
+                    await asyncio.sleep(0.05)
+
+            sample.update(parse_phases((await client.get(f"{base}/metrics")).text))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return sample
+
+
+# ------------------------------
+# Respawn of the MCP server only
+# ------------------------------
+
+async def respawn(args) -> Dict[str, float]:
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    from backend.mcp.mcp_client import MCPExcelClient
+
+    sample = {}
+    for label, standby in (("cold", False), ("standby", True)):
+        client = MCPExcelClient(standby=standby)
+        await client.connect()
+        try:
+            await client.list_excel_files()
+            if client._standby is not None:
+                await client._standby.wait()
+
+            start = time.perf_counter()
+            await client.reconnect()
+            await client.list_excel_files()
+            sample[f"reconnect_{label}"] = time.perf_counter() - start
+        finally:
+            await client.close()
+    return sample
+
+
+def build_report(samples: List[Dict[str, float]]) -> Dict[str, Any]:
+    keys = sorted({k for s in samples for k in s}, key=lambda k: (k.count("."), k))
+    report = {"runs": len(samples), "metrics": {}}
+    for key in keys:
+        values = [s[key] for s in samples if key in s]
+        report["metrics"][key] = {
+            "median_s": round(statistics.median(values), 4),
+            "p95_s": round(percentile(values, 95), 4),
+            "min_s": round(min(values), 4),
+            "max_s": round(max(values), 4),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\nruns: {report['runs']}")
+    width = max((len(k) for k in report["metrics"]), default=10)
+    print(f"{'':{width}}  {'median':>8} {'p95':>8} {'min':>8} {'max':>8}")
+    for key, m in report["metrics"].items():
+        print(f"{key:{width}}  {m['median_s']:8.3f} {m['p95_s']:8.3f} {m['min_s']:8.3f} {m['max_s']:8.3f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backend / MCP server cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="Measured starts")
+    parser.add_argument("--standby", action="store_true", help="Run the app with EXCEL_MCP_STANDBY=true")
+    parser.add_argument("--respawn", action="store_true", help="Time MCP reconnects in-process instead")
+    parser.add_argument("--message", default="Show me the accounts", help="Chat message of the first chat")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-run limit in seconds")
+    parser.add_argument("--log-level", default="WARNING", help="App LOG_LEVEL during the run")
+    parser.add_argument("--json", dest="json_out", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    bench = respawn if args.respawn else cold_start
+    samples = []
+    for i in range(args.runs):
+        sample = asyncio.run(bench(args))
+        print(f"run {i + 1}: " + ", ".join(f"{k} {v:.3f}s" for k, v in sample.items() if "." not in k))
+        samples.append(sample)
+
+    report = build_report(samples)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
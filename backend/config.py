@@ -22,15 +22,126 @@ class Settings(BaseSettings):
     # ---- Logging ----
     LOG_LEVEL: str = Field(default="INFO", description="Logging level")
     LOG_DIR: Path = Field(default=Path("logs"), description="Directory for log files")
+    LOG_JSON_CONSOLE: bool = Field(default=False, description="JSON lines on the console too")
+    LOG_QUEUE_SIZE: int = Field(
+        default=10000,
+        description="Records buffered for the background writer before new ones are dropped",
+    )
+    LOG_MAX_FIELD_CHARS: int = Field(
+        default=2000,
+        description="Cap for payloads wrapped in logger.truncated() (tool args/results)",
+    )
+    LOG_MAX_MESSAGE_CHARS: int = Field(default=8000, description="Cap for a whole log message")
 
     # ---- Gemini API ----
     GEMINI_API_KEY: str = Field(..., description="API key for Google Gemini")
+    GEMINI_BACKEND: str = Field(
+        default="google",
+        description="Model backend: google (real API) or fake (offline scripted stub)",
+    )
+    GEMINI_FAKE_SCRIPT: Optional[Path] = Field(
+        default=None,
+        description="JSON script replayed by the fake backend (built-in default if unset)",
+    )
+    GEMINI_FAKE_LATENCY_MS: Optional[float] = Field(
+        default=None,
+        description="Per-call latency for the fake backend, overrides the script value",
+    )
+    GEMINI_FAKE_ERROR_RATE: Optional[float] = Field(
+        default=None,
+        description="Fraction of fake backend calls failing with a transient 503, overrides the script value",
+    )
+    GEMINI_FAKE_SLOW_RATE: Optional[float] = Field(
+        default=None,
+        description="Fraction of fake backend calls taking GEMINI_FAKE_SLOW_MS, overrides the script value",
+    )
+    GEMINI_FAKE_SLOW_MS: Optional[float] = Field(
+        default=None,
+        description="Latency of the fake backend's slow calls, overrides the script value",
+    )
+    GEMINI_TIMEOUT_S: float = Field(default=60.0, description="Deadline per Gemini call attempt")
+    GEMINI_MAX_RETRIES: int = Field(
+        default=2,
+        description="Retries of a Gemini call after a deadline, 429/5xx or connection error",
+    )
+    GEMINI_RETRY_BACKOFF_S: float = Field(
+        default=0.5,
+        description="Backoff before the first retry, doubled per retry (with full jitter)",
+    )
+    GEMINI_RETRY_BACKOFF_MAX_S: float = Field(default=8.0, description="Cap of the retry backoff")
+    GEMINI_HEDGE: bool = Field(
+        default=False,
+        description="Send a duplicate Gemini request when the first is slower than the recent quantile",
+    )
+    GEMINI_HEDGE_QUANTILE: float = Field(
+        default=0.95,
+        description="Latency quantile of recent calls after which a hedge request is sent",
+    )
+    GEMINI_HEDGE_MIN_DELAY_S: float = Field(default=0.5, description="Lower bound of the hedge delay")
+    USAGE_MAX_TURNS: int = Field(
+        default=1000,
+        description="Recent turns kept in memory for token/latency accounting",
+    )
 
     # ---- Excel / MCP ----
     EXCEL_DATA_DIR: Path = Field(
         default=Path("excel_data"),
         description="Directory where Excel files are stored",
     )
+    EXCEL_MCP_URL: Optional[str] = Field(
+        default=None,
+        description="Streamable HTTP URL of a shared Excel MCP server (e.g. http://127.0.0.1:8765/mcp); "
+        "unset: spawn a private server over stdio",
+    )
+    EXCEL_MCP_POOL_SIZE: int = Field(
+        default=10,
+        description="Kept-alive HTTP connections to the shared Excel MCP server",
+    )
+    EXCEL_MCP_STANDBY: bool = Field(
+        default=False,
+        description="Keep a second, initialized stdio MCP server ready to take over on respawn/reconnect",
+    )
+    UPLOAD_MAX_MB: int = Field(default=100, description="Largest workbook accepted by PUT /api/files/{name}")
+    EXPORT_PAGE_ROWS: int = Field(
+        default=1000,
+        description="Rows fetched per run_sql call while streaming /api/export (at most the server's EXCEL_SQL_MAX_ROWS)",
+    )
+    EXPORT_MAX_ROWS: int = Field(default=1_000_000, description="Rows written by one /api/export download")
+
+    # ---- Chat ----
+    CHAT_MAX_TOOL_ITERATIONS: int = Field(
+        default=8,
+        description="Rounds of tool calls per chat turn before the loop is cut off",
+    )
+    CHAT_MENTION_ROWS: int = Field(
+        default=50,
+        description="Rows of an @mentioned file's prefetched read_sheet injected as context (the rest is marked truncated)",
+    )
+
+    # ---- Chat admission control ----
+    CHAT_MAX_IN_FLIGHT: int = Field(default=8, description="Chat requests run concurrently")
+    CHAT_MAX_QUEUE: int = Field(
+        default=32,
+        description="Chat requests allowed to wait for a slot before new ones get 503",
+    )
+    CHAT_QUEUE_TIMEOUT_S: float = Field(
+        default=30.0,
+        description="Longest a queued chat request waits before it gets 503",
+    )
+    CHAT_RATE_PER_MINUTE: float = Field(
+        default=30.0,
+        description="Sustained chat requests per client per minute (0 disables the limit)",
+    )
+    CHAT_RATE_BURST: int = Field(default=10, description="Chat requests a client may send at once")
+    CHAT_BATCH_CONCURRENCY: int = Field(
+        default=4,
+        description="Queries of one /api/chat/batch request run concurrently (upper bound for the request's own value)",
+    )
+    CHAT_BATCH_MAX_QUERIES: int = Field(default=100, description="Queries accepted per /api/chat/batch request")
+    CHAT_BATCH_MAX_TOOL_CALLS: int = Field(
+        default=8,
+        description="MCP tool calls one batch keeps in flight",
+    )
 
     # ---- CORS / Frontend ----
     FRONTEND_ORIGIN: AnyHttpUrl = Field(
@@ -0,0 +1,211 @@
+# backend/core/admission.py
+"""
+Admission control in front of Chat.run.
+
+At most `max_in_flight` chats run at once; further requests wait in a
+bounded priority queue (interactive ahead of batch) and are turned away
+with a Retry-After hint when the queue is full, when they have waited
+longer than `queue_timeout` or when their client exceeds its rate limit.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+from backend.utils.metrics import Counter, Gauge, Histogram
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+QUEUE_DEPTH = Gauge(
+    "chat_admission_queue_depth",
+    "Chat requests waiting for a slot",
+    ("priority",),
+)
+IN_FLIGHT = Gauge(
+    "chat_admission_in_flight",
+    "Chat requests currently running",
+)
+WAIT_SECONDS = Histogram(
+    "chat_admission_wait_seconds",
+    "Time chat requests spent queued before running",
+    ("priority",),
+)
+REJECTED = Counter(
+    "chat_admission_rejected_total",
+    "Chat requests turned away by admission control",
+    ("reason", "priority"),
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised instead of queueing; routes turn it into a 429/503 response.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimiter:
+    """
+    Token bucket per client: `rate_per_minute` sustained, `burst` at once.
+    """
+
+    MAX_CLIENTS = 10000
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # client -> (tokens, updated)
+
+    def acquire(self, client: str) -> float:
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until
+        the next token is available.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+        self._buckets[client] = (tokens - 1, now)
+        if len(self._buckets) > self.MAX_CLIENTS:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = [
+            c for c, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]
+        for client in full:
+            del self._buckets[client]
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit plus priority queue. Batch requests may only
+    fill half of the queue so interactive ones can still get in.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+        rate_per_minute: float = 30.0,
+        burst: int = 10,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.limiter = RateLimiter(rate_per_minute, burst)
+
+        self._in_flight = 0
+        self._waiting: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # Smoothed run time of a chat, for Retry-After estimates
+        self._service_seconds = 5.0
+
+    @property
+    def queued(self) -> int:
+        return sum(self._waiting.values())
+
+    def _retry_after(self) -> float:
+        return self._service_seconds * (self.queued + 1) / self.max_in_flight
+
+    def check_rate(self, client: str, priority: str = "interactive"):
+        """
+        Take one request from the client's rate limit or raise a 429.
+        """
+        wait = self.limiter.acquire(client)
+        if wait:
+            REJECTED.inc(reason="rate_limited", priority=priority)
+            raise AdmissionRejected(429, "Too many requests for this client", wait)
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: str = "interactive", rate_limit: bool = True):
+        """
+        Hold a run slot for the body of the `async with`.
+        Raises AdmissionRejected when the request cannot be admitted.
+
+        rate_limit:
+            False when the caller already charged the client (one batch
+            request runs many queries).
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Supported: {list(PRIORITIES)}")
+
+        if rate_limit:
+            self.check_rate(client, priority)
+
+        await self._acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._service_seconds += 0.2 * (elapsed - self._service_seconds)
+            self._release()
+
+    async def _acquire(self, priority: str):
+        if self._in_flight < self.max_in_flight and not self.queued:
+            self._start(priority, 0.0)
+            return
+
+        limit = self.max_queue if priority == "interactive" else self.max_queue // 2
+        if self._waiting[priority] >= limit or self.queued >= self.max_queue:
+            REJECTED.inc(reason="queue_full", priority=priority)
+            raise AdmissionRejected(503, "Server busy, chat queue is full", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (PRIORITIES[priority], next(self._seq), future))
+        self._waiting[priority] += 1
+        QUEUE_DEPTH.set(self._waiting[priority], priority=priority)
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted a slot at the same moment: hand it on
+                self._release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            REJECTED.inc(reason="queue_timeout", priority=priority)
+            raise AdmissionRejected(503, "Server busy, timed out waiting in the chat queue", self._retry_after())
+        finally:
+            self._waiting[priority] -= 1
+            QUEUE_DEPTH.set(self._waiting[priority], priority=priority)
+
+        # _release() already counted this request as in flight
+        WAIT_SECONDS.observe(time.perf_counter() - queued_at, priority=priority)
+
+    def _start(self, priority: str, waited: float):
+        self._in_flight += 1
+        IN_FLIGHT.set(self._in_flight)
+        WAIT_SECONDS.observe(waited, priority=priority)
+
+    def _release(self):
+        self._in_flight -= 1
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                self._in_flight += 1
+                future.set_result(None)
+                break
+        IN_FLIGHT.set(self._in_flight)
@@ -0,0 +1,89 @@
+# backend/core/batch.py
+"""
+Tool-result sharing for Chat.run_batch.
+
+The queries of one batch run with separate histories but talk to the MCP
+servers through SharedToolCache, so identical read-only tool calls are
+made once (concurrent duplicates wait on the same call) and the number of
+MCP calls in flight is bounded.
+"""
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from backend.core.prefetch import READ_ONLY_TOOLS
+from backend.mcp.tool_manager import ToolManager
+from backend.utils.metrics import Counter
+
+BATCH_QUERIES = Counter(
+    "chat_batch_queries_total",
+    "Queries run through Chat.run_batch",
+    ("status",),
+)
+BATCH_TOOL_CACHE = Counter(
+    "chat_batch_tool_cache_total",
+    "Tool calls of batch queries answered from the shared cache (hit) or the MCP server (miss)",
+    ("tool", "result"),
+)
+
+
+class SharedToolCache:
+    """
+    Read-only tool results of one batch, keyed by client and
+    ToolManager.call_key(). Any other tool call clears the cache, since it
+    may have changed the data.
+    """
+
+    def __init__(self, max_concurrent_calls: int = 8):
+        self._entries: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._limit = asyncio.Semaphore(max(1, max_concurrent_calls))
+
+    def wrap(self, client: Any) -> "_CachedClient":
+        return _CachedClient(client, self)
+
+    async def _call(self, client: Any, name: str, args: Dict[str, Any], progress_callback=None):
+        async with self._limit:
+            return await client.call_tool(name, args, progress_callback=progress_callback)
+
+    async def call_tool(self, client: Any, name: str, args: Dict[str, Any], progress_callback=None):
+        if name not in READ_ONLY_TOOLS:
+            self._entries.clear()
+            return await self._call(client, name, args, progress_callback)
+
+        if args.get("cursor"):
+            # Each call on a run_sql cursor returns its next page
+            return await self._call(client, name, args, progress_callback)
+
+        key = (id(client), ToolManager.call_key(name, args))
+        task = self._entries.get(key)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            BATCH_TOOL_CACHE.inc(tool=name, result="miss")
+            task = asyncio.create_task(self._call(client, name, args, progress_callback))
+            self._entries[key] = task
+        else:
+            BATCH_TOOL_CACHE.inc(tool=name, result="hit")
+
+        # Shielded: one query giving up must not cancel a call others wait on
+        return await asyncio.shield(task)
+
+    def close(self):
+        for task in self._entries.values():
+            if not task.done():
+                task.cancel()
+        self._entries.clear()
+
+
+class _CachedClient:
+    """
+    MCP client stand-in whose call_tool goes through the shared cache;
+    everything else is delegated to the wrapped client.
+    """
+
+    def __init__(self, client: Any, cache: SharedToolCache):
+        self._client = client
+        self._cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def call_tool(self, name: str, input_data: dict, progress_callback: Optional[Any] = None):
+        return await self._cache.call_tool(self._client, name, input_data, progress_callback)
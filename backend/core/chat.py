@@ -1,15 +1,30 @@
 # backend/core/chat.py
-from typing import Dict, List, Any
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Sequence
+import asyncio
+import copy
 import json
+import time
+import uuid
 
+from backend.core.batch import BATCH_QUERIES, SharedToolCache
+from backend.core.prefetch import ToolPrefetcher
 from backend.services.gemini_service import GeminiService
+from backend.services.usage_tracker import TurnUsage, usage_tracker
 from backend.mcp.mcp_client import MCPExcelClient  # and/or other MCP clients later
 from backend.mcp.tool_manager import ToolManager   # will be implemented next
-from backend.utils.logger import get_logger
+from backend.utils.logger import get_logger, truncated
+from backend.utils.metrics import Counter
+from backend.utils.tracing import current_trace, span, start_trace
 
 
 logger = get_logger(__name__)
 
+TOOL_LOOP_CUTOFFS = Counter(
+    "chat_tool_loop_cutoffs_total",
+    "Chat turns stopped at the tool-loop iteration cap",
+)
+
 
 class Chat:
     """
@@ -27,22 +42,37 @@ class Chat:
         self,
         gemini_service: GeminiService,
         mcp_clients: Dict[str, MCPExcelClient],
+        max_tool_iterations: int = 8,
     ):
         self.gemini_service = gemini_service
         self.mcp_clients = mcp_clients  # e.g. {"excel": MCPExcelClient(...)}
         self.messages: List[Dict[str, Any]] = []
+        # Rounds of tool calls per turn before the loop is cut off
+        self.max_tool_iterations = max_tool_iterations
 
     # ---------------------------------------
     # Internal helpers
     # ---------------------------------------
 
-    async def _process_user_query(self, query: str):
+    async def _process_user_query(self, query: str, prefetch: ToolPrefetcher):
         """
         Add user query into history. Higher layers (UI/HTTP)
         call .run(query) which uses this.
+
+        Subclasses may start predicted tool calls on `prefetch`; they run
+        while Gemini produces its first response.
         """
         self.messages.append({"role": "user", "content": query})
 
+    def _fork(self, mcp_clients: Dict[str, Any]) -> "Chat":
+        """
+        Same chat with its own empty history, talking to `mcp_clients`.
+        """
+        fork = copy.copy(self)
+        fork.messages = []
+        fork.mcp_clients = mcp_clients
+        return fork
+
     # ---------------------------------------
     # Main public entry point
     # ---------------------------------------
@@ -56,18 +86,48 @@ class Chat:
         4. Resume chat with tool results
         5. Repeat until final text reply
         """
-        await self._process_user_query(query)
+        trace = current_trace()
+        turn = TurnUsage(
+            session_id=(trace.session_id if trace else None) or "default",
+            turn_id=trace.trace_id if trace else uuid.uuid4().hex,
+            query=query,
+        )
+
+        try:
+            with span("chat_run"):
+                reply = await self._run(query, turn)
+        finally:
+            usage_tracker.record_turn(turn)
+
+        if trace is not None:
+            logger.info("Chat trace %s: %s", trace.trace_id, trace.summary())
+        return reply
+
+    async def _run(self, query: str, turn: TurnUsage) -> str:
+        prefetch = ToolPrefetcher()
+        try:
+            return await self._run_turn(query, turn, prefetch)
+        finally:
+            prefetch.close()
+
+    async def _run_turn(self, query: str, turn: TurnUsage, prefetch: ToolPrefetcher) -> str:
+        with span("context_injection"):
+            await self._process_user_query(query, prefetch)
 
         # 1) Collect all available tools
-        tools_schema = await ToolManager.get_all_tools_schema(self.mcp_clients)
+        with span("schema_fetch"):
+            tools_schema = await ToolManager.get_all_tools_schema(self.mcp_clients)
         
         # 2) Call Gemini with history + tool schemas
-        response = await self.gemini_service.chat(
-            messages=self.messages,
-            tools_schema=tools_schema,
-        )
+        with span("gemini_call"):
+            response = await self.gemini_service.chat(
+                messages=self.messages,
+                tools_schema=tools_schema,
+                usage=turn,
+            )
         
-        # 3) Loop until we get a final text response
+        # 3) Loop until we get a final text response (or hit the cap)
+        iterations = 0
         while True:
             # Inspect Gemini response for tool calls
             tool_calls = ToolManager.extract_tool_calls(response)
@@ -81,17 +141,85 @@ class Chat:
                 else:
                     return "Task completed successfully."
 
-            logger.info(f"Gemini requested tools: {tool_calls}")
+            if iterations >= self.max_tool_iterations:
+                logger.warning(f"Tool loop cut off after {iterations} iterations")
+                TOOL_LOOP_CUTOFFS.inc()
+                reply = f"Stopped after {iterations} rounds of tool calls without reaching an answer."
+                self.messages.append({"role": "model", "content": reply})
+                return reply
+            iterations += 1
+
+            logger.info("Gemini requested tools: %s", truncated(tool_calls))
 
             # 4) Execute tools with MCP clients
-            tool_results = await ToolManager.execute_tool_calls(
-                self.mcp_clients,
-                tool_calls,
-            )
+            with span("tool_loop"):
+                tool_results = await ToolManager.execute_tool_calls(
+                    self.mcp_clients,
+                    tool_calls,
+                    prefetch,
+                )
             
             # 5) Resume with tool results (this becomes the new response)
-            response = await self.gemini_service.resume_with_tool_results(
-                messages=self.messages,
-                tool_response=tool_results,
-                tools_schema=tools_schema,
-            )
\ No newline at end of file
+            with span("gemini_call"):
+                response = await self.gemini_service.resume_with_tool_results(
+                    messages=self.messages,
+                    tool_response=tool_results,
+                    tools_schema=tools_schema,
+                    usage=turn,
+                )
+
+    # ---------------------------------------
+    # Batch entry point
+    # ---------------------------------------
+
+    async def run_batch(
+        self,
+        queries: Sequence[str],
+        concurrency: int = 4,
+        max_tool_calls: int = 8,
+        slot: Optional[Callable[[], Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run independent queries concurrently, yielding each result as
+        soon as it is ready:
+            {"index": i, "query": ..., "reply": ... | "error": ..., "seconds": ...}
+
+        - every query gets its own empty history (this chat's is untouched)
+        - read-only tool results are shared across the batch (SharedToolCache)
+        - at most `concurrency` queries run at once, and at most
+          `max_tool_calls` MCP calls are in flight
+        - `slot`, when given, is entered around each query (e.g. an
+          admission-control slot)
+        """
+        cache = SharedToolCache(max_tool_calls)
+        clients = {name: cache.wrap(c) for name, c in self.mcp_clients.items()}
+        limit = asyncio.Semaphore(max(1, concurrency))
+        parent = current_trace()
+
+        async def run_one(index: int, query: str) -> Dict[str, Any]:
+            result: Dict[str, Any] = {"index": index, "query": query}
+            async with limit:
+                started = time.perf_counter()
+                with start_trace(
+                    f"{parent.trace_id}-{index}" if parent else None,
+                    name="chat_batch",
+                    session_id=parent.session_id if parent else None,
+                ):
+                    try:
+                        async with slot() if slot else nullcontext():
+                            result["reply"] = await self._fork(clients).run(query)
+                    except Exception as e:
+                        logger.error(f"Batch query {index} failed: {e}")
+                        result["error"] = str(e)
+                result["seconds"] = round(time.perf_counter() - started, 3)
+            BATCH_QUERIES.inc(status="error" if "error" in result else "ok")
+            return result
+
+        tasks = [asyncio.create_task(run_one(i, q)) for i, q in enumerate(queries)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+            cache.close()
@@ -0,0 +1,138 @@
+# backend/core/prefetch.py
+"""
+Speculative MCP tool calls for one chat turn.
+
+Calls the model is likely to make (e.g. on @mentioned files) are started
+before the first Gemini response arrives; when the model then asks for the
+same tool with the same arguments, ToolManager gets the in-flight or
+finished result instead of a new round trip.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.mcp.tool_manager import ToolManager
+from backend.utils.logger import get_logger
+from backend.utils.metrics import Counter
+
+logger = get_logger(__name__)
+
+PREFETCH = Counter(
+    "chat_prefetch_total",
+    "Tool calls by prefetch outcome: hit (served from a prefetch), "
+    "miss (not prefetched) or wasted (prefetched but never asked for)",
+    ("tool", "result"),
+)
+
+# Tools that never modify a workbook. Any other call in the turn may have
+# changed what the prefetched reads returned, so it drops them.
+READ_ONLY_TOOLS = frozenset({
+    "list_excel_files", "list_sheets", "read_sheet", "read_workbook", "read_range",
+    "changes_since", "join_sheets", "aggregate_sheet", "search_cells", "run_sql",
+})
+
+
+class ToolPrefetcher:
+    """
+    Prefetched calls of one turn, matched by ToolManager.call_key().
+    Each result is handed to the model at most once. Only turns that
+    prefetched something count hits and misses.
+    """
+
+    def __init__(self):
+        self._tasks: List[Tuple[str, Dict[str, Any], Any, asyncio.Task]] = []
+        self._used = set()
+        self._active = False
+
+    def _find(self, name: str, args: Dict[str, Any]) -> Optional[int]:
+        # Keys are compared at lookup time: schema defaults may only have
+        # been learned after the call was started
+        key = ToolManager.call_key(name, args)
+        for i, (n, a, _, _) in enumerate(self._tasks):
+            if ToolManager.call_key(n, a) == key:
+                return i
+        return None
+
+    def start(self, client: Any, name: str, args: Dict[str, Any]) -> asyncio.Task:
+        """
+        Start `name(args)` on `client` unless the same call is already running.
+        """
+        self._active = True
+        i = self._find(name, args)
+        if i is not None:
+            return self._tasks[i][3]
+
+        task = asyncio.create_task(client.call_tool(name, args))
+        task.add_done_callback(_log_failure)
+        self._tasks.append((name, args, client, task))
+        return task
+
+    async def result(self, name: str, args: Dict[str, Any]) -> Any:
+        """
+        Result of a prefetched call for our own use (e.g. context
+        injection); does not count as a hit. A failed prefetch is
+        retried as a live call. KeyError if the call was not started.
+        """
+        i = self._find(name, args)
+        if i is None:
+            raise KeyError(f"{name} was not prefetched with these arguments")
+        _, _, client, task = self._tasks[i]
+        self._used.add(task)
+        try:
+            return await task
+        except Exception:
+            return await client.call_tool(name, args)
+
+    def ready(self, name: str, args: Dict[str, Any]) -> Any:
+        """
+        Result of a prefetched call that has already finished without
+        error, for our own use like result(); None otherwise. Never waits.
+        """
+        i = self._find(name, args)
+        if i is None:
+            return None
+        task = self._tasks[i][3]
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        self._used.add(task)
+        return task.result()
+
+    async def take(self, name: str, args: Dict[str, Any]) -> Any:
+        """
+        CallToolResult of the matching prefetched call, None if there is none.
+        """
+        if not self._active:
+            return None
+
+        i = self._find(name, args)
+        if i is None:
+            PREFETCH.inc(tool=name, result="miss")
+            if name not in READ_ONLY_TOOLS:
+                # Misses are still counted for the rest of the turn
+                self.close()
+            return None
+        _, _, _, task = self._tasks.pop(i)
+        try:
+            res = await task
+        except Exception:
+            # A speculative failure is not the model's; the caller makes the live call
+            PREFETCH.inc(tool=name, result="miss")
+            return None
+        PREFETCH.inc(tool=name, result="hit")
+        return res
+
+    def close(self):
+        """
+        Drop the remaining prefetches (end of turn, or after a write):
+        cancel what is still running and count the waste.
+        """
+        for name, _, _, task in self._tasks:
+            if task not in self._used:
+                PREFETCH.inc(tool=name, result="wasted")
+            if not task.done():
+                task.cancel()
+        self._tasks.clear()
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Prefetch failed: {task.exception()}")
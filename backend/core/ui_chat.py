@@ -2,11 +2,16 @@
 from typing import Dict, List, Any, Tuple
 
 from backend.core.chat import Chat
+from backend.core.prefetch import ToolPrefetcher
 from backend.mcp.mcp_client import MCPExcelClient
 from backend.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Calls started for every @mentioned file, with the arguments the model
+# itself uses: its data, sheet schema/row counts, and the multi-sheet read
+# the tool descriptions steer towards
+PREFETCH_TOOLS = ("read_sheet", "list_sheets", "read_workbook")
 
 class UIChat(Chat):
     """
@@ -16,23 +21,39 @@ class UIChat(Chat):
     - @file.xlsx mentions
     - contextual document injection
     - prompt formatting
+    - speculative prefetch of tool calls on mentioned files
     """
 
     def __init__(
         self,
         gemini_service,
         mcp_clients: Dict[str, MCPExcelClient],
+        max_tool_iterations: int = 8,
+        mention_rows: int = 50,
     ):
-        super().__init__(gemini_service, mcp_clients)
+        super().__init__(gemini_service, mcp_clients, max_tool_iterations)
         self.excel_client: MCPExcelClient = mcp_clients.get("excel")
+        # Rows of a prefetched first sheet injected as context
+        self.mention_rows = mention_rows
+
+    def _fork(self, mcp_clients: Dict[str, MCPExcelClient]) -> "UIChat":
+        fork = super()._fork(mcp_clients)
+        fork.excel_client = mcp_clients.get("excel")
+        return fork
 
     # ----------------------------------------------------
     # Extract context via @mentions
     # ----------------------------------------------------
-    async def _extract_resources(self, query: str) -> str:
+    async def _extract_resources(self, query: str, prefetch: ToolPrefetcher) -> str:
         """
         If user types: "Compare @accounts.xlsx with @opportunities.xlsx"
         We detect file names and load their content.
+
+        The model's first move on a mentioned file is nearly always to read
+        it, so those calls are started here and keep running during the
+        first Gemini call, which serves them from the prefetcher. Nothing is
+        awaited: a read_sheet that has already finished is injected (its
+        first `mention_rows` rows), any other file is only named.
         """
 
         if not self.excel_client:
@@ -47,31 +68,36 @@ class UIChat(Chat):
         if not mentioned:
             return ""
 
-        found = []
         file_list = await self.excel_client.list_excel_files()
+        found = [file for file in file_list if file in mentioned]
 
-        for file in file_list:
-            if file in mentioned:
-                sheet_data = await self.excel_client.read_sheet(file)
-                found.append((file, sheet_data))
+        for file in found:
+            for tool in PREFETCH_TOOLS:
+                prefetch.start(self.excel_client, tool, {"file_name": file})
 
         # Format for LLM-friendly context
         blocks = []
-        for file, data in found:
+        for file in found:
+            res = prefetch.ready("read_sheet", {"file_name": file})
+            if res is None or res.isError:
+                blocks.append(f'<excel file="{file}" loaded="false" />')
+                continue
+            data = self.excel_client.rows(res)
+            more = f' truncated="true" rows="{len(data)}"' if len(data) > self.mention_rows else ""
             blocks.append(
-                f'<excel file="{file}">\n{data}\n</excel>'
+                f'<excel file="{file}"{more}>\n{data[:self.mention_rows]}\n</excel>'
             )
         return "\n".join(blocks)
 
     # ----------------------------------------------------
     # Override: preprocessing user messages
     # ----------------------------------------------------
-    async def _process_user_query(self, query: str):
+    async def _process_user_query(self, query: str, prefetch: ToolPrefetcher):
         """
         Inject contextual sheet data automatically,
         then treat the whole thing as a single user prompt.
         """
-        context = await self._extract_resources(query)
+        context = await self._extract_resources(query, prefetch)
 
         prompt = f"""
 You are a Salesforce CRM and Excel analysis assistant.
@@ -91,6 +117,8 @@ Rules:
 - NEVER mention having a context field.
 - Answer clearly and professionally.
 - Do not hallucinate missing sheet names.
+- An <excel> block marked truncated or loaded="false" is incomplete; use the tools when its data matters.
 """
 
-        self.messages.append({"role": "user", "content": prompt})
+        # context_chars lets usage accounting split injected data from the query
+        self.messages.append({"role": "user", "content": prompt, "context_chars": len(context)})
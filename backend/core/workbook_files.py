@@ -0,0 +1,243 @@
+# backend/core/workbook_files.py
+"""
+Workbook uploads and query exports for the /files and /export routes.
+
+Uploads are streamed chunk by chunk into a hidden temp file in the data
+directory, checked to really be the format their suffix claims, fsynced
+and renamed into place, so the MCP server never sees a partial workbook.
+Exports page through one run_sql cursor, so all pages read the same
+snapshot, and write each page out before fetching the next one, so memory
+stays bounded by the page size.
+"""
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+import anyio
+
+from backend.utils.metrics import Counter
+
+UPLOAD_SUFFIXES = (".xlsx", ".xlsm", ".xls", ".ods", ".csv")
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Zip containers may not inflate to more than this multiple of the upload limit
+MAX_INFLATE_RATIO = 10
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_ZIP_MEMBERS = {".xlsx": "xl/workbook.xml", ".xlsm": "xl/workbook.xml", ".ods": "content.xml"}
+
+UPLOADS = Counter(
+    "excel_uploads_total",
+    "Workbook uploads by result (ok, invalid, too_large, exists)",
+    ("result",),
+)
+EXPORT_ROWS = Counter(
+    "excel_export_rows_total",
+    "Query result rows streamed by /api/export",
+    ("format",),
+)
+
+
+class UploadError(Exception):
+    """
+    Raised for a rejected upload; routes turn it into an HTTP error.
+    """
+
+    def __init__(self, status_code: int, detail: str, result: str = "invalid"):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.result = result
+
+
+def check_file_name(file_name: str) -> str:
+    """
+    A plain, visible file name with a supported suffix.
+    """
+    if Path(file_name).name != file_name or file_name.startswith((".", "~$")):
+        raise UploadError(400, f"Invalid file name '{file_name}'")
+    if Path(file_name).suffix.lower() not in UPLOAD_SUFFIXES:
+        raise UploadError(400, f"Unsupported file type '{file_name}'. Supported: {', '.join(UPLOAD_SUFFIXES)}")
+    return file_name
+
+
+# ------------------------------
+# Uploads
+# ------------------------------
+
+def validate_workbook(path: Path, suffix: str, max_bytes: int):
+    """
+    Cheap structural check of an uploaded file (runs in a worker thread):
+    zip-based formats must hold their workbook part and pass the CRC
+    check, .xls must be an OLE2 file, CSV must be text.
+    """
+    if path.stat().st_size == 0:
+        raise UploadError(400, "Empty file")
+
+    if suffix in _ZIP_MEMBERS:
+        if not zipfile.is_zipfile(path):
+            raise UploadError(400, f"Not a valid {suffix} file (not a zip container)")
+        with zipfile.ZipFile(path) as zf:
+            if _ZIP_MEMBERS[suffix] not in zf.namelist():
+                raise UploadError(400, f"Not a valid {suffix} file ({_ZIP_MEMBERS[suffix]} missing)")
+            if sum(i.file_size for i in zf.infolist()) > max_bytes * MAX_INFLATE_RATIO:
+                raise UploadError(413, "Workbook expands beyond the upload limit", "too_large")
+            bad = zf.testzip()
+            if bad is not None:
+                raise UploadError(400, f"Corrupt workbook: member '{bad}' fails its CRC check")
+    elif suffix == ".xls":
+        with open(path, "rb") as fh:
+            if fh.read(len(_OLE_MAGIC)) != _OLE_MAGIC:
+                raise UploadError(400, "Not a valid .xls file")
+    else:
+        with open(path, "rb") as fh:
+            if b"\x00" in fh.read(64 * 1024):
+                raise UploadError(400, "Not a text CSV file")
+
+
+def _install(tmp: Path, dest: Path, overwrite: bool):
+    if overwrite:
+        os.replace(tmp, dest)
+    else:
+        # link() refuses to replace an existing file, atomically
+        try:
+            os.link(tmp, dest)
+        except FileExistsError:
+            raise UploadError(409, f"'{dest.name}' already exists; set overwrite to replace it", "exists")
+        except OSError:
+            if dest.exists():
+                raise UploadError(409, f"'{dest.name}' already exists; set overwrite to replace it", "exists")
+            os.replace(tmp, dest)
+        with contextlib.suppress(FileNotFoundError):
+            tmp.unlink()
+
+    if sys.platform != "win32":
+        dir_fd = os.open(dest.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+async def receive_upload(
+    chunks: AsyncIterator[bytes],
+    directory: Path,
+    file_name: str,
+    max_bytes: int,
+    overwrite: bool = False,
+) -> int:
+    """
+    Stream `chunks` to a temp file next to the destination, validate it and
+    move it to `directory / file_name`. Returns the size in bytes.
+    """
+    check_file_name(file_name)
+    tmp = directory / f".upload.{uuid.uuid4().hex}.tmp"
+    size = 0
+    try:
+        with open(tmp, "wb") as fh:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(413, f"Upload exceeds {max_bytes // (1024 * 1024)} MB", "too_large")
+                await anyio.to_thread.run_sync(fh.write, chunk)
+            await anyio.to_thread.run_sync(os.fsync, fh.fileno())
+
+        await anyio.to_thread.run_sync(validate_workbook, tmp, Path(file_name).suffix.lower(), max_bytes)
+        await anyio.to_thread.run_sync(_install, tmp, directory / file_name, overwrite)
+    except BaseException as e:
+        with contextlib.suppress(OSError):
+            tmp.unlink()
+        if isinstance(e, UploadError):
+            UPLOADS.inc(result=e.result)
+        raise
+
+    UPLOADS.inc(result="ok")
+    return size
+
+
+# ------------------------------
+# Exports
+# ------------------------------
+
+async def sql_pages(client: Any, first: Dict[str, Any], page_rows: int, max_rows: int) -> AsyncIterator[List[dict]]:
+    """
+    Rows of a paginated run_sql result page by page, starting with the
+    already fetched `first` page and following its cursor, up to
+    `max_rows` in total. A cursor left open is closed at the end.
+    """
+    page, sent = first, 0
+    try:
+        while True:
+            rows = page["rows"][:max_rows - sent]
+            if rows:
+                yield rows
+            sent += len(rows)
+            if not page.get("cursor") or sent >= max_rows:
+                return
+            page = await client.run_sql(cursor=page["cursor"], limit=page_rows)
+    finally:
+        if page.get("cursor"):
+            # The server also closes idle cursors; this only frees it sooner
+            with contextlib.suppress(Exception):
+                await client.run_sql(cursor=page["cursor"], limit=0)
+
+
+async def csv_chunks(columns: List[str], pages: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for rows in pages:
+        writer.writerows([row.get(c) for c in columns] for row in rows)
+        EXPORT_ROWS.inc(len(rows), format="csv")
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+async def write_xlsx(columns: List[str], pages: AsyncIterator[List[dict]]) -> Path:
+    """
+    Write the pages to a temp .xlsx file through openpyxl's write-only
+    mode, which keeps rows on disk rather than in memory. The caller
+    deletes the file.
+    """
+    # Kept out of the backend's import path; only exports need it
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Export")
+    ws.append(columns)
+    async for rows in pages:
+        for row in rows:
+            ws.append([_xlsx_value(ws, row.get(c)) for c in columns])
+        EXPORT_ROWS.inc(len(rows), format="xlsx")
+
+    fd, name = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await anyio.to_thread.run_sync(wb.save, name)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return Path(name)
+
+
+def _xlsx_value(ws, value: Any) -> Any:
+    from openpyxl.cell import WriteOnlyCell
+
+    if isinstance(value, str) and value.startswith("="):
+        # Data, not a formula
+        cell = WriteOnlyCell(ws, value)
+        cell.data_type = "s"
+        return cell
+    return value
@@ -1,12 +1,20 @@
 # backend/main.py
 import asyncio
-from fastapi import FastAPI
+import time
+
+# Start of the backend import phase, reported as backend_startup_seconds
+_IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.config import get_settings
+from backend.core.admission import AdmissionController
 from backend.core.ui_chat import UIChat
 from backend.services.gemini_service import GeminiService
 from backend.utils.logger import get_logger
+from backend.utils.metrics import Gauge, Histogram
+from backend.utils.tracing import start_trace
 
 from backend.mcp.mcp_client import MCPExcelClient
 from backend.api.routes import router
@@ -15,9 +23,37 @@ logger = get_logger(__name__)
 settings = get_settings()
 
 # global singletons
-excel_mcp_client = MCPExcelClient()
+excel_mcp_client = MCPExcelClient(
+    url=settings.EXCEL_MCP_URL,
+    pool_size=settings.EXCEL_MCP_POOL_SIZE,
+    standby=settings.EXCEL_MCP_STANDBY,
+    data_dir=settings.EXCEL_DATA_DIR,
+)
 gemini = GeminiService()
-chat_agent = UIChat(gemini_service=gemini, mcp_clients={"excel": excel_mcp_client})
+chat_agent = UIChat(
+    gemini_service=gemini,
+    mcp_clients={"excel": excel_mcp_client},
+    max_tool_iterations=settings.CHAT_MAX_TOOL_ITERATIONS,
+    mention_rows=settings.CHAT_MENTION_ROWS,
+)
+admission = AdmissionController(
+    max_in_flight=settings.CHAT_MAX_IN_FLIGHT,
+    max_queue=settings.CHAT_MAX_QUEUE,
+    queue_timeout=settings.CHAT_QUEUE_TIMEOUT_S,
+    rate_per_minute=settings.CHAT_RATE_PER_MINUTE,
+    burst=settings.CHAT_RATE_BURST,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("route", "status"),
+)
+STARTUP_SECONDS = Gauge(
+    "backend_startup_seconds",
+    "Backend startup phases (import, gemini, mcp_connect, ready = import start to serving)",
+    ("phase",),
+)
 
 
 def create_app() -> FastAPI:
@@ -44,6 +80,27 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # ---------------------------
+    # Per-request trace
+    # ---------------------------
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        with start_trace(
+            request.headers.get("X-Trace-ID"),
+            name=request.url.path,
+            session_id=request.headers.get("X-Session-ID"),
+        ) as trace:
+            response = await call_next(request)
+
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - trace.started,
+            route=getattr(route, "path", "unmatched"),
+            status=str(response.status_code),
+        )
+        response.headers["X-Trace-ID"] = trace.trace_id
+        return response
+
     # ---------------------------
     # REST routes
     # ---------------------------
@@ -57,7 +114,11 @@ def create_app() -> FastAPI:
     async def startup_event():
         logger.info("Starting application...")
         app.state.chat_agent = chat_agent
-        await _connect_mcp()
+        app.state.admission = admission
+        app.state.excel_client = excel_mcp_client
+        # The Gemini SDK import overlaps with the MCP server's cold start
+        await asyncio.gather(_connect_mcp(), _warm_up_gemini())
+        STARTUP_SECONDS.set(time.perf_counter() - _IMPORT_START, phase="ready")
 
     @app.on_event("shutdown")
     async def shutdown_event():
@@ -69,14 +130,26 @@ def create_app() -> FastAPI:
 
 async def _connect_mcp():
     """
-    Spawns MCP Excel server over stdio.
+    Spawns MCP Excel server over stdio, or connects to the shared one
+    when EXCEL_MCP_URL is set.
     """
+    start = time.perf_counter()
     try:
         logger.info("Connecting MCP Excel server...")
         await excel_mcp_client.connect()
         logger.info("Excel MCP connected")
     except Exception as e:
         logger.error(f"Failed to start MCP server: {e}")
+    STARTUP_SECONDS.set(time.perf_counter() - start, phase="mcp_connect")
+
+
+async def _warm_up_gemini():
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(gemini.warm_up)
+    except Exception as e:
+        logger.error(f"Failed to set up Gemini client: {e}")
+    STARTUP_SECONDS.set(time.perf_counter() - start, phase="gemini")
 
 
 async def _close_mcp():
@@ -91,6 +164,7 @@ async def _close_mcp():
 
 
 app = create_app()
+STARTUP_SECONDS.set(time.perf_counter() - _IMPORT_START, phase="import")
 
 
 if __name__ == "__main__":
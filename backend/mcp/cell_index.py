@@ -0,0 +1,469 @@
+# backend/mcp/cell_index.py
+"""
+Inverted index over the cells of every workbook, for search_cells.
+
+Cell text is split into casefolded word tokens and each token maps to the
+(sheet, row, col) cells of a file that contain it. A background task keeps
+the index current: small commits of the write tools are applied cell by
+cell, larger ones are re-indexed from the committed snapshot (no re-parse),
+and files whose mtime/size changed on disk are read again, one at a time.
+Files above a size cap are not indexed. The index is saved as JSON next to
+the workbooks (the cell texts; postings are rebuilt on load), so a restart
+only re-reads the files that changed in the meantime.
+"""
+import asyncio
+import contextlib
+import functools
+import heapq
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import anyio
+import pandas as pd
+
+from backend.mcp import excel_readers
+from backend.mcp.excel_store import Change, Snapshot
+from backend.utils.metrics import REGISTRY, Counter, Registry
+
+logger = logging.getLogger("ExcelMCP")
+
+# (sheet, row, col) with 0-based data rows, as in read_range/write_cell
+CellRef = Tuple[str, int, int]
+Stat = Tuple[int, int]
+
+FORMAT = 2
+# Characters of a cell's text returned with a hit
+MAX_TEXT = 200
+# Commits touching more cells are re-indexed in the background
+DIRECT_APPLY_CELLS = 1000
+
+_TOKEN = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=65536)
+def tokenize(text: str) -> FrozenSet[str]:
+    return frozenset(_TOKEN.findall(text.casefold()))
+
+
+def cell_text(value: Any) -> Optional[str]:
+    """
+    Text of a cell as it is indexed; None for empty cells.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+class FileIndex:
+    """
+    Postings of one file. The text of every indexed cell is kept too, to
+    drop its old tokens when the cell changes.
+    """
+
+    def __init__(self, stat: Stat, version: Optional[int] = None):
+        self.stat = stat
+        # Store version the postings reflect (None when read from disk)
+        self.version = version
+        self.columns: Dict[str, List[str]] = {}
+        self.cells: Dict[CellRef, str] = {}
+        self.postings: Dict[str, Set[CellRef]] = {}
+        self._vocab: Optional[List[str]] = None
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "FileIndex":
+        """
+        Rebuild from the saved form (see CellIndex._write).
+        """
+        mtime_ns, size = state["stat"]
+        index = cls((int(mtime_ns), int(size)))
+        index.columns = {str(k): [str(c) for c in v] for k, v in state["columns"].items()}
+        for sheet, row, col, text in state["cells"]:
+            index._add((str(sheet), int(row), int(col)), str(text))
+        return index
+
+    @classmethod
+    def from_sheets(cls, sheets: Dict[str, pd.DataFrame], stat: Stat, version: Optional[int] = None) -> "FileIndex":
+        index = cls(stat, version)
+        for name, df in sheets.items():
+            index.set_sheet(name, df)
+        return index
+
+    def _add(self, cell: CellRef, text: str):
+        self.cells[cell] = text
+        for token in tokenize(text):
+            refs = self.postings.get(token)
+            if refs is None:
+                refs = self.postings[token] = set()
+                self._vocab = None
+            refs.add(cell)
+
+    def set_cell(self, cell: CellRef, value: Any):
+        old = self.cells.pop(cell, None)
+        if old is not None:
+            for token in tokenize(old):
+                refs = self.postings.get(token)
+                if refs is not None:
+                    refs.discard(cell)
+                    if not refs:
+                        del self.postings[token]
+                        self._vocab = None
+        text = cell_text(value)
+        if text is not None:
+            self._add(cell, text)
+
+    def set_sheet(self, name: str, df: pd.DataFrame):
+        for cell in [c for c in self.cells if c[0] == name]:
+            self.set_cell(cell, None)
+        self.columns[name] = [str(c) for c in df.columns]
+        for col in range(df.shape[1]):
+            for row, value in enumerate(df.iloc[:, col].tolist()):
+                text = cell_text(value)
+                if text is not None:
+                    self._add((name, row, col), text)
+
+    def lookup(self, token: str, prefix: bool = False) -> Set[CellRef]:
+        """
+        Cells containing `token` (any token starting with it if `prefix`).
+        The set may be shared with the index and must not be modified.
+        """
+        if not prefix:
+            return self.postings.get(token, set())
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        vocab = self._vocab
+        out: Set[CellRef] = set()
+        i = bisect_left(vocab, token)
+        while i < len(vocab) and vocab[i].startswith(token):
+            out |= self.postings[vocab[i]]
+            i += 1
+        return out
+
+
+def _parse_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    (token, prefix) terms of a query. A word ending in "*" is a prefix;
+    words with punctuation ("acme-corp") become several required tokens.
+    """
+    terms = []
+    for word in query.split():
+        tokens = _TOKEN.findall(word.rstrip("*").casefold())
+        for i, token in enumerate(tokens):
+            term = (token, word.endswith("*") and i == len(tokens) - 1)
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+class CellIndex:
+    """
+    Index of every supported file in `directory` up to `max_file_bytes`,
+    persisted to `index_path`. start() launches the background task, on
+    first use; notify() is the WorkbookStore commit listener.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        index_path: Path,
+        refresh_interval: float = 30.0,
+        save_interval: float = 10.0,
+        max_file_bytes: Optional[int] = None,
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.directory = directory
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+        self.save_interval = save_interval
+        self.max_file_bytes = max_file_bytes
+        self._files: Dict[str, FileIndex] = {}
+        # Files left out for their size
+        self._skipped: Set[str] = set()
+        # Commits waiting to be indexed from their snapshot, latest per file
+        self._pending: Dict[str, Snapshot] = {}
+        self._building: Set[str] = set()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._wake = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self._updates = Counter(
+            "excel_mcp_search_index_updates_total",
+            "Search index updates by source (cells: commit applied in place, "
+            "snapshot: file re-indexed after a commit, disk: file changed on disk)",
+            ("source",),
+            registry=registry,
+        )
+
+    def start(self):
+        """
+        Start the background task once; later calls do nothing.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def _too_large(self, size: int) -> bool:
+        return self.max_file_bytes is not None and size > self.max_file_bytes
+
+    async def wait_ready(self, timeout: float):
+        """
+        Wait (at most `timeout` seconds) for the first full pass over the files.
+        """
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._ready.wait(), timeout)
+
+    # ------------------------------
+    # Updates
+    # ------------------------------
+
+    def notify(self, snap: Snapshot, changes: List[Change]):
+        # Before start() the first pass compares every file with the disk anyway
+        if self._task is None or snap.path.parent.resolve() != self.directory.resolve():
+            return
+        name = snap.path.name
+        if self._too_large(snap.size):
+            if self._files.pop(name, None) is not None:
+                self._dirty = True
+            self._skipped.add(name)
+            self._pending.pop(name, None)
+            return
+        index = self._files.get(name)
+
+        cells = 0
+        for change in changes:
+            if change["op"] == "reset":
+                cells = DIRECT_APPLY_CELLS + 1
+                break
+            if change["op"] == "column":
+                cells += len(snap.sheets[change["sheet"]])
+            else:
+                cells += snap.sheets[change["sheet"]].shape[1] if change["op"] == "insert" else 1
+
+        # In place only on top of the previous commit: the store may have
+        # re-read the file (changed on disk) since the index last saw it
+        in_place = index is not None and index.version is not None and snap.version == index.version + 1
+        if not in_place or name in self._building or name in self._pending or cells > DIRECT_APPLY_CELLS:
+            self._pending[name] = snap
+            self._wake.set()
+            return
+
+        for change in changes:
+            sheet = change["sheet"]
+            if change["op"] == "update":
+                index.set_cell((sheet, change["row"], change["col"]), change["value"])
+            elif change["op"] == "column":
+                col = change["col"]
+                for row, value in enumerate(snap.sheets[sheet].iloc[:, col].tolist()):
+                    index.set_cell((sheet, row, col), value)
+            else:
+                row = change["row"]
+                for col, value in enumerate(snap.sheets[sheet].iloc[row].tolist()):
+                    index.set_cell((sheet, row, col), value)
+        for sheet in {c["sheet"] for c in changes}:
+            index.columns[sheet] = [str(c) for c in snap.sheets[sheet].columns]
+        index.stat = (snap.mtime_ns, snap.size)
+        index.version = snap.version
+        self._dirty = True
+        self._updates.inc(source="cells")
+
+    def _scan(self) -> Dict[str, Stat]:
+        stats = {}
+        for f in self.directory.iterdir():
+            if f.name.startswith((".", "~$")) or f.suffix.lower() not in excel_readers.SUPPORTED_SUFFIXES:
+                continue
+            with contextlib.suppress(OSError):
+                st = f.stat()
+                stats[f.name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _read_file(self, name: str, stat: Stat) -> FileIndex:
+        try:
+            sheets = excel_readers.read_sheets(self.directory / name)
+        except Exception as e:
+            # Indexed as empty until the file changes again
+            logger.warning(f"Search index: cannot read '{name}': {e}")
+            sheets = {}
+        return FileIndex.from_sheets(sheets, stat)
+
+    async def _build(self, name: str, build, source: str):
+        self._building.add(name)
+        try:
+            index = await anyio.to_thread.run_sync(build)
+        finally:
+            self._building.discard(name)
+        # A commit arrived meanwhile: it is indexed from its snapshot instead
+        if name not in self._pending:
+            self._files[name] = index
+            self._dirty = True
+            self._updates.inc(source=source)
+
+    async def _sync(self):
+        while self._pending:
+            name, snap = self._pending.popitem()
+            await self._build(
+                name, functools.partial(FileIndex.from_sheets, snap.sheets, (snap.mtime_ns, snap.size), snap.version),
+                "snapshot",
+            )
+
+        stats = await anyio.to_thread.run_sync(self._scan)
+        self._skipped = {name for name, (_, size) in stats.items() if self._too_large(size)}
+        for name in [n for n in self._files if n not in stats or n in self._skipped]:
+            del self._files[name]
+            self._dirty = True
+        for name, stat in stats.items():
+            if name in self._skipped:
+                continue
+            index = self._files.get(name)
+            if name not in self._pending and (index is None or index.stat != stat):
+                await self._build(name, functools.partial(self._read_file, name, stat), "disk")
+
+    async def _run(self):
+        saved = await anyio.to_thread.run_sync(self._load)
+        for name, index in saved.items():
+            self._files.setdefault(name, index)
+
+        while True:
+            try:
+                await self._sync()
+                if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+                    await self._save()
+            except Exception as e:
+                logger.warning(f"Search index update failed: {e}")
+            self._ready.set()
+
+            timeout = self.refresh_interval
+            if self._dirty:
+                timeout = min(timeout, max(0.0, self._saved_at + self.save_interval - time.monotonic()))
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            self._wake.clear()
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+
+    def _load(self) -> Dict[str, FileIndex]:
+        try:
+            with open(self.index_path, "rb") as fh:
+                saved = json.load(fh)
+            if saved.get("format") != FORMAT:
+                return {}
+            return {str(name): FileIndex.from_state(state) for name, state in saved["files"].items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Search index: ignoring unreadable {self.index_path}: {e}")
+            return {}
+
+    async def _save(self):
+        # Copied on the loop, where the indexes only change between updates
+        # (plain dict copies); encoded and written in a worker thread
+        files = {
+            name: (index.stat, {k: list(v) for k, v in index.columns.items()}, dict(index.cells))
+            for name, index in self._files.items()
+        }
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        await anyio.to_thread.run_sync(self._write, files)
+
+    def _write(self, files: Dict[str, Tuple[Stat, Dict[str, List[str]], Dict[CellRef, str]]]):
+        state = {
+            name: {
+                "stat": list(stat),
+                "columns": columns,
+                "cells": [[sheet, row, col, text] for (sheet, row, col), text in cells.items()],
+            }
+            for name, (stat, columns, cells) in files.items()
+        }
+        data = json.dumps({"format": FORMAT, "files": state}, ensure_ascii=False).encode("utf-8")
+
+        tmp = self.index_path.with_name(f"{self.index_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, self.index_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                tmp.unlink()
+            raise
+
+    # ------------------------------
+    # Queries
+    # ------------------------------
+
+    def stale(self) -> List[str]:
+        """
+        Files whose latest content is not indexed yet; wakes the task if any.
+        """
+        stats = self._scan()
+        stale = sorted(
+            name for name, stat in stats.items()
+            if not self._too_large(stat[1])
+            and (name in self._pending or name not in self._files or self._files[name].stat != stat)
+        )
+        if stale:
+            self._wake.set()
+        return stale
+
+    def search(self, query: str, limit: int = 50, file_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Cells containing every term of `query`, in file, sheet, row, column
+        order. Terms ending in "*" match as prefixes.
+        """
+        terms = _parse_query(query)
+        if not terms:
+            raise ValueError("The query has no searchable words")
+
+        hits: List[Dict[str, Any]] = []
+        per_file: Dict[str, int] = {}
+        for name in sorted(self._files):
+            if file_names and name not in file_names:
+                continue
+            index = self._files[name]
+            sets = sorted((index.lookup(t, p) for t, p in terms), key=len)
+            if not sets[0]:
+                continue
+            cells = sets[0].intersection(*sets[1:])
+            if not cells:
+                continue
+            per_file[name] = len(cells)
+
+            room = limit - len(hits)
+            if room <= 0:
+                continue
+            order = {sheet: i for i, sheet in enumerate(index.columns)}
+            for sheet, row, col in heapq.nsmallest(room, cells, key=lambda c: (order.get(c[0], 0), c[1], c[2])):
+                columns = index.columns.get(sheet, [])
+                hits.append({
+                    "file_name": name,
+                    "sheet_name": sheet,
+                    "row": row,
+                    "col": col,
+                    "column": columns[col] if col < len(columns) else None,
+                    "value": index.cells[(sheet, row, col)][:MAX_TEXT],
+                })
+
+        total = sum(per_file.values())
+        return {
+            "query": query,
+            "total": total,
+            "truncated": total > len(hits),
+            "matches_per_file": per_file,
+            "hits": hits,
+            # Over the size cap, not searched
+            "skipped": sorted(n for n in self._skipped if not file_names or n in file_names),
+        }
@@ -0,0 +1,170 @@
+# backend/mcp/column_expr.py
+"""
+Restricted column expressions for add_computed_column.
+
+An expression is arithmetic over the columns of one sheet, e.g.
+"Amount * Probability / 100" or "(`Close Value` - Cost) * (Stage == 'Won')".
+It is checked against a whitelist of Python AST nodes before pandas.eval
+sees it: column names, number/string/bool literals, arithmetic, comparison
+operators, & | ~ over comparisons, and a few math functions. String
+literals may only be compared, and text columns may not be multiplied
+(both would repeat strings). and/or/not are rejected: pandas.eval gives
+them bitwise meaning on numbers. Attribute access, subscripts, lambdas,
+comprehensions and any other call are rejected.
+
+pandas.eval runs on numexpr when it is installed and every referenced
+column is numeric, otherwise on pandas' own (still restricted) evaluator.
+"""
+import ast
+import importlib.util
+import re
+from typing import Dict, Sequence, Set, Tuple
+
+import pandas as pd
+
+MAX_LENGTH = 500
+MAX_POWER = 16
+
+FUNCTIONS = frozenset({"abs", "sqrt", "exp", "log", "log10", "floor", "ceil"})
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare,
+    ast.Name, ast.Load, ast.Constant, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Invert, ast.BitAnd, ast.BitOr,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+# Operators that repeat or format strings
+_REPEATING_OPS = {ast.Mult: "*", ast.Pow: "**", ast.Mod: "%"}
+
+# Placeholder prefix for columns; reserved in user expressions
+_PREFIX = "__col_"
+
+_BACKTICKED = re.compile(r"`([^`]+)`")
+
+_NUMEXPR = importlib.util.find_spec("numexpr") is not None
+
+
+def compile_expression(expression: str, columns: Sequence[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Validate `expression` against the sheet's `columns`.
+
+    Returns the expression with every column replaced by a placeholder
+    name, and the {placeholder: column} mapping. Raises ValueError.
+    """
+    if len(expression) > MAX_LENGTH:
+        raise ValueError(f"Expression longer than {MAX_LENGTH} characters")
+
+    if _PREFIX in expression:
+        raise ValueError(f"Names starting with '{_PREFIX}' are reserved")
+
+    columns = [str(c) for c in columns]
+    names: Dict[str, str] = {}
+
+    def placeholder(column: str) -> str:
+        if column not in columns:
+            raise ValueError(f"Unknown column '{column}'. Available: {columns}")
+        name = f"{_PREFIX}{columns.index(column)}"
+        names[name] = column
+        return name
+
+    # `Column with spaces` -> placeholder, before Python parses the rest
+    text = _BACKTICKED.sub(lambda m: placeholder(m.group(1)), expression)
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.BoolOp, ast.Not)):
+            raise ValueError("Use & | ~ instead of and/or/not, e.g. (Amount > 0) & (Stage == 'Won')")
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"'{type(node).__name__}' is not allowed in column expressions")
+        if isinstance(node, ast.BinOp) and any(
+            isinstance(side, ast.Constant) and isinstance(side.value, str) for side in (node.left, node.right)
+        ):
+            raise ValueError("String literals can only be compared, e.g. Stage == 'Won'")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)) or (
+            isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert)
+        ):
+            operands = (node.left, node.right) if isinstance(node, ast.BinOp) else (node.operand,)
+            if not all(_is_condition(side) for side in operands):
+                raise ValueError("& | ~ combine comparisons only, e.g. (Amount > 0) & ~(Stage == 'Lost')")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ValueError(f"Only these functions are allowed: {sorted(FUNCTIONS)}")
+            if len(node.args) != 1:
+                raise ValueError(f"'{node.func.id}' takes exactly one argument")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str, bool)):
+            raise ValueError(f"Literal {node.value!r} is not allowed")
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            # Keep 10 ** 10 ** 10 from running forever on Python ints
+            exponent = node.right
+            if not (
+                isinstance(exponent, ast.Constant)
+                and isinstance(exponent.value, (int, float))
+                and abs(exponent.value) <= MAX_POWER
+            ):
+                raise ValueError(f"Exponents must be number literals up to {MAX_POWER}")
+
+    functions = {id(n.func) for n in ast.walk(tree) if isinstance(n, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and id(node) not in functions and node.id not in names:
+            node.id = placeholder(node.id)
+
+    return ast.unparse(tree), names
+
+
+def _is_condition(node: ast.AST) -> bool:
+    """
+    Whether `node` is boolean by construction (not a bitwise number).
+    """
+    if isinstance(node, ast.Compare):
+        return True
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, bool)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+        return _is_condition(node.left) and _is_condition(node.right)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+        return _is_condition(node.operand)
+    return False
+
+
+def _is_text(node: ast.AST, text_names: Set[str]) -> bool:
+    """
+    Whether `node` may evaluate to strings: a text column, or text added to something.
+    """
+    if isinstance(node, ast.Name):
+        return node.id in text_names
+    if isinstance(node, ast.BinOp):
+        return _is_text(node.left, text_names) or _is_text(node.right, text_names)
+    return False
+
+
+def evaluate(df: pd.DataFrame, expression: str) -> pd.Series:
+    """
+    Evaluate a restricted expression over `df`, vectorized over all rows.
+    """
+    text, names = compile_expression(expression, df.columns)
+    local_dict = {name: df.iloc[:, int(name[len(_PREFIX):])] for name in names}
+
+    text_names = {name for name, s in local_dict.items() if not pd.api.types.is_numeric_dtype(s)}
+    for node in ast.walk(ast.parse(text, mode="eval")):
+        if isinstance(node, ast.BinOp) and type(node.op) in _REPEATING_OPS:
+            if _is_text(node.left, text_names) or _is_text(node.right, text_names):
+                raise ValueError(f"'{_REPEATING_OPS[type(node.op)]}' needs numeric columns, not text")
+
+    numeric = all(pd.api.types.is_numeric_dtype(s) for s in local_dict.values())
+    engine = "numexpr" if _NUMEXPR and numeric else "python"
+    try:
+        result = pd.eval(text, engine=engine, parser="pandas", local_dict=local_dict, global_dict={})
+    except Exception as e:
+        shown = text
+        for name in sorted(names, key=len, reverse=True):
+            shown = shown.replace(name, f"`{names[name]}`")
+        raise ValueError(f"Cannot evaluate '{shown}': {e}")
+
+    if not isinstance(result, pd.Series):
+        result = pd.Series(result, index=df.index)
+    return result
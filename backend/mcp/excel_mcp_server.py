@@ -1,15 +1,102 @@
 # backend/mcp/excel_mcp_server.py
-from typing import List, Optional
+# Run as a module from the repo root: python -m backend.mcp.excel_mcp_server
+# Shared HTTP server: python -m backend.mcp.excel_mcp_server --transport streamable-http --port 8765
+import time
+
+# Start of the import phase, reported as excel_mcp_server_startup_seconds
+_IMPORT_START = time.perf_counter()
+
+import argparse
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import os
+from typing import Dict, List, Optional
 from pathlib import Path
+from urllib.parse import unquote
+import anyio
 import pandas as pd
 from pydantic import Field
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.fastmcp.prompts import base
+from mcp.server.transport_security import TransportSecuritySettings
+
+from backend.mcp import column_expr, excel_readers, formula_engine
+from backend.mcp.cell_index import CellIndex
+from backend.mcp.excel_store import WorkbookStore
+from backend.mcp.sql_mirror import SqlMirror, parse_indexes
+from backend.mcp.excel_streaming import AGG_FUNCS, StreamingAggregator, open_frame_stream, open_row_stream
+from backend.utils.metrics import Counter, Gauge, Histogram, Registry
+from backend.utils.tracing import current_trace, span, start_trace
+
+# The backend's EXCEL_DATA_DIR, passed by the client, so uploads and tools see one tree
+EXCEL_DIR = Path(os.environ.get("EXCEL_DATA_DIR", "excel_data"))
+
+# Streaming aggregation limits (EXCEL_* env vars are passed through by the client)
+AGG_MEMORY_LIMIT_MB = int(os.environ.get("EXCEL_AGG_MEMORY_LIMIT_MB", "256"))
+AGG_CHUNK_ROWS = int(os.environ.get("EXCEL_AGG_CHUNK_ROWS", "5000"))
+
+# Workbooks kept parsed in memory for reads, changes remembered per sheet
+CACHE_MAX_FILES = int(os.environ.get("EXCEL_CACHE_MAX_FILES", "32"))
+CHANGE_LOG_SIZE = int(os.environ.get("EXCEL_CHANGE_LOG_SIZE", "1000"))
+
+# Full-text cell index, persisted next to the workbooks; built on the first search
+SEARCH_INDEX_PATH = Path(os.environ.get("EXCEL_SEARCH_INDEX_PATH", str(EXCEL_DIR / ".search_index.json")))
+SEARCH_REFRESH_S = float(os.environ.get("EXCEL_SEARCH_REFRESH_S", "30"))
+# Larger files are left out of the search index and the SQL mirror
+INDEX_MAX_FILE_MB = float(os.environ.get("EXCEL_INDEX_MAX_FILE_MB", "20"))
+# How long a search waits for the initial index build
+SEARCH_READY_TIMEOUT_S = 5.0
+
+# SQLite mirror for run_sql, built on the first query; indexes as "table.column[+column],..."
+SQL_MIRROR_PATH = Path(os.environ.get("EXCEL_SQL_MIRROR_PATH", str(EXCEL_DIR / ".mirror.sqlite")))
+SQL_INDEXES = os.environ.get("EXCEL_SQL_INDEXES", "")
+SQL_MAX_ROWS = int(os.environ.get("EXCEL_SQL_MAX_ROWS", "1000"))
+SQL_TIMEOUT_S = float(os.environ.get("EXCEL_SQL_TIMEOUT_S", "5"))
 
-EXCEL_DIR = Path("excel_data")
 
 mcp = FastMCP("ExcelMCP", log_level="INFO")
+logger = logging.getLogger("ExcelMCP")
+
+# Separate registry: scraped by the backend through the metrics:// resource
+SERVER_REGISTRY = Registry()
+SERVER_STAGE_SECONDS = Histogram(
+    "excel_mcp_stage_duration_seconds",
+    "Time spent per stage inside Excel MCP tools",
+    ("stage", "tool"),
+    registry=SERVER_REGISTRY,
+)
+SERVER_TOOL_CALLS = Counter(
+    "excel_mcp_tool_calls_total",
+    "Excel MCP tool invocations",
+    ("tool", "status"),
+    registry=SERVER_REGISTRY,
+)
+SERVER_STARTUP_SECONDS = Gauge(
+    "excel_mcp_server_startup_seconds",
+    "Server process startup phases (import)",
+    ("phase",),
+    registry=SERVER_REGISTRY,
+)
+
+# Reads are served from committed snapshots; writes are atomic and locked per file
+STORE = WorkbookStore(max_files=CACHE_MAX_FILES, change_log_size=CHANGE_LOG_SIZE, registry=SERVER_REGISTRY)
+
+SEARCH = CellIndex(
+    EXCEL_DIR, SEARCH_INDEX_PATH, refresh_interval=SEARCH_REFRESH_S,
+    max_file_bytes=int(INDEX_MAX_FILE_MB * 1024 * 1024), registry=SERVER_REGISTRY,
+)
+STORE.subscribe(SEARCH.notify)
+
+MIRROR = SqlMirror(
+    EXCEL_DIR, SQL_MIRROR_PATH, parse_indexes(SQL_INDEXES),
+    max_rows=SQL_MAX_ROWS, timeout=SQL_TIMEOUT_S,
+    max_file_bytes=int(INDEX_MAX_FILE_MB * 1024 * 1024), registry=SERVER_REGISTRY,
+)
+STORE.subscribe(lambda snap, changes: MIRROR.schedule(STORE))
 
 
 # ------------------------------
@@ -27,86 +114,686 @@ def _resolve_file(file_name: str) -> Path:
     return file_path
 
 
+# Saves stream a fresh write-only workbook, which would drop an .xlsm's
+# VBA project, so macro-enabled files stay read-only
+WRITABLE_SUFFIXES = (".xlsx",)
+
+
+def _resolve_writable(file_name: str, create: bool = False) -> Path:
+    """
+    Write tools save through openpyxl, so only .xlsx files qualify.
+    With `create` the file may not exist yet, but must be a plain name.
+    """
+    if create and not (EXCEL_DIR / file_name).exists():
+        if Path(file_name).name != file_name:
+            raise ValueError(f"New files must be created directly in {EXCEL_DIR}, got '{file_name}'.")
+        file_path = EXCEL_DIR / file_name
+    else:
+        file_path = _resolve_file(file_name)
+    if file_path.suffix.lower() not in WRITABLE_SUFFIXES:
+        raise ValueError(f"'{file_name}' is read-only: writes support {', '.join(WRITABLE_SUFFIXES)} files.")
+    return file_path
+
+
+# Excel's rules for sheet names
+SHEET_NAME_MAX = 31
+SHEET_NAME_INVALID = set("[]:*?/\\")
+
+
+def _check_sheet_name(name: str):
+    if not name or len(name) > SHEET_NAME_MAX or SHEET_NAME_INVALID & set(name):
+        raise ValueError(
+            f"Invalid sheet name '{name}': use 1-{SHEET_NAME_MAX} characters without {''.join(sorted(SHEET_NAME_INVALID))}"
+        )
+
+
+def _cell_value(column: pd.Series, value: str):
+    """
+    `value` converted to a number for numeric columns when it parses as
+    one, so writing "42" keeps the column numeric.
+    """
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        number = pd.to_numeric(pd.Series([value]), errors="coerce").iloc[0]
+        if not pd.isna(number):
+            return number.item()
+    return value
+
+
+def _json_records(df: pd.DataFrame) -> List[dict]:
+    """
+    Records with NaN/NaT (e.g. unmatched rows of a left join) as None.
+    """
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _propagated_trace_id() -> Optional[str]:
+    """
+    trace_id sent by the backend in the request _meta, if any.
+    """
+    try:
+        meta = mcp.get_context().request_context.meta
+    except (LookupError, ValueError):
+        return None
+    return getattr(meta, "trace_id", None) if meta else None
+
+
+def _span(stage: str):
+    """
+    Span inside the currently executing tool.
+    """
+    trace = current_trace()
+    return span(stage, histogram=SERVER_STAGE_SECONDS, tool=trace.name if trace else "")
+
+
+def _instrumented(fn):
+    """
+    Run a tool inside a trace carrying the backend's trace_id and record
+    its total time, outcome and inner (parse/serialize/save) spans.
+    """
+    name = fn.__name__
+
+    @contextlib.contextmanager
+    def _tool_trace():
+        with start_trace(_propagated_trace_id(), name=name) as trace:
+            status = "ok"
+            try:
+                with _span("tool"):
+                    yield
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                SERVER_TOOL_CALLS.inc(tool=name, status=status)
+                logger.debug(f"trace={trace.trace_id} tool={name} {trace.summary()}")
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _tool_trace():
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tool_trace():
+                return fn(*args, **kwargs)
+
+    return wrapper
+
+
 # ------------------------------
 # MCP TOOLS
 # ------------------------------
 
 @mcp.tool(
     name="list_excel_files",
-    description="Returns list of available Excel file names in excel_data/"
+    description="Returns list of available spreadsheet file names (xlsx, xls, ods, csv, ...) in excel_data/"
 )
+@_instrumented
 def list_excel_files() -> List[str]:
-    return [f.name for f in EXCEL_DIR.glob("*.xlsx")]
+    return sorted(
+        f.name for f in EXCEL_DIR.iterdir()
+        if f.suffix.lower() in excel_readers.SUPPORTED_SUFFIXES
+    )
 
 
 @mcp.tool(
     name="read_sheet",
     description="Reads entire sheet from an Excel file and returns table data."
 )
-def read_sheet(
+@_instrumented
+async def read_sheet(
     file_name: str = Field(description="Excel file name"),
     sheet_name: Optional[str] = Field(
         default=None, description="Sheet to read, default first sheet"
     ),
 ) -> List[dict]:
     file_path = _resolve_file(file_name)
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
-    return df.to_dict(orient="records")
+    with _span("parse"):
+        df = (await STORE.snapshot(file_path)).sheet(sheet_name)
+    with _span("serialize"):
+        return df.to_dict(orient="records")
+
+
+@mcp.tool(
+    name="list_sheets",
+    description="Lists the sheets of an Excel file with their row and column counts."
+)
+@_instrumented
+def list_sheets(
+    file_name: str = Field(description="Excel file name"),
+) -> List[dict]:
+    file_path = _resolve_file(file_name)
+    with _span("parse"):
+        return excel_readers.sheet_info(file_path)
+
+
+@mcp.tool(
+    name="read_workbook",
+    description=(
+        "Reads several (or all) sheets of one Excel file in a single call. "
+        "Prefer this over repeated read_sheet calls on the same file."
+    ),
+)
+@_instrumented
+async def read_workbook(
+    file_name: str = Field(description="Excel file name"),
+    sheet_names: Optional[List[str]] = Field(
+        default=None, description="Sheets to read, default all sheets"
+    ),
+    max_rows: Optional[int] = Field(
+        default=100, description="Max rows returned per sheet, null for all rows"
+    ),
+    row_limits: Optional[Dict[str, int]] = Field(
+        default=None, description="Per-sheet overrides of max_rows, {sheetName: rows}"
+    ),
+) -> dict:
+    file_path = _resolve_file(file_name)
+    row_limits = row_limits or {}
+
+    with _span("parse"):
+        snap = await STORE.snapshot(file_path)
+        names = sheet_names or snap.sheet_names
+        frames = {n: snap.sheet(n) for n in names}
+
+    with _span("serialize"):
+        sheets = {}
+        for name, df in frames.items():
+            limit = row_limits.get(name, max_rows)
+            truncated = limit is not None and len(df) > limit
+            if truncated:
+                df = df.head(limit)
+            sheets[name] = {
+                "rows": df.to_dict(orient="records"),
+                "truncated": truncated,
+            }
+        return {"file_name": file_name, "version": snap.version, "sheets": sheets}
 
 
 @mcp.tool(
     name="read_range",
     description="Reads specified rows from a sheet"
 )
-def read_range(
+@_instrumented
+async def read_range(
     file_name: str = Field(description="Excel file name"),
     sheet_name: str = Field(description="Sheet name"),
     start_row: int = Field(description="Start row index (0-based)"),
     end_row: int = Field(description="End row index (inclusive)"),
 ) -> List[dict]:
     file_path = _resolve_file(file_name)
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    with _span("parse"):
+        df = (await STORE.snapshot(file_path)).sheet(sheet_name)
 
     sliced = df.iloc[start_row : end_row + 1]
-    return sliced.to_dict(orient="records")
+    with _span("serialize"):
+        return sliced.to_dict(orient="records")
 
 
 @mcp.tool(
     name="write_cell",
-    description="Write value into specific cell in Excel sheet"
+    description=(
+        "Write value into specific cell in Excel sheet. A value starting with "
+        "'=' is stored as a formula (e.g. '=SUM(B2:B10)'); dependent formulas "
+        "are recalculated."
+    ),
 )
-def write_cell(
+@_instrumented
+async def write_cell(
     file_name: str = Field(description="Excel file"),
     sheet_name: str = Field(description="Sheet name"),
     row: int = Field(description="Row index (0-based)"),
     col: int = Field(description="Column index (0-based)"),
     value: str = Field(description="Updated value"),
 ):
-    file_path = _resolve_file(file_name)
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    file_path = _resolve_writable(file_name)
 
-    df.iat[row, col] = value
-    df.to_excel(file_path, sheet_name=sheet_name, index=False)
+    def mutate(sheets):
+        if sheet_name not in sheets:
+            raise ValueError(f"Sheet '{sheet_name}' not found. Available: {list(sheets)}")
+        df = sheets[sheet_name].copy()
+        cell = _cell_value(df.iloc[:, col], value)
+        try:
+            df.iat[row, col] = cell
+        except (TypeError, ValueError):
+            # pandas refuses values of another type: widen the column
+            df[df.columns[col]] = df.iloc[:, col].astype(object)
+            df.iat[row, col] = cell
+        sheets[sheet_name] = df
+        return [{"sheet": sheet_name, "op": "update", "row": row, "col": col, "column": str(df.columns[col]), "value": cell}]
 
-    return f"Cell [{row}, {col}] updated in '{file_name}'."
+    with _span("save"):
+        snap = await STORE.write(file_path, mutate)
+
+    return f"Cell [{row}, {col}] updated in '{file_name}' (version {snap.version})."
 
 
 @mcp.tool(
     name="append_row",
     description="Append a new row (as dict) to sheet"
 )
-def append_row(
+@_instrumented
+async def append_row(
     file_name: str = Field(description="Excel file"),
     sheet_name: str = Field(description="Sheet"),
     row_data: dict = Field(description="New row as {colName: value}")
 ):
+    file_path = _resolve_writable(file_name)
+
+    def mutate(sheets):
+        if sheet_name not in sheets:
+            raise ValueError(f"Sheet '{sheet_name}' not found. Available: {list(sheets)}")
+        row = len(sheets[sheet_name])
+        sheets[sheet_name] = pd.concat([sheets[sheet_name], pd.DataFrame([row_data])], ignore_index=True)
+        return [{"sheet": sheet_name, "op": "insert", "row": row, "values": row_data}]
+
+    with _span("save"):
+        snap = await STORE.write(file_path, mutate)
+
+    return f"Row added to '{file_name}' (version {snap.version})."
+
+
+@mcp.tool(
+    name="add_computed_column",
+    description=(
+        "Adds a column computed for every row from an expression over the sheet's "
+        "columns, in one write (use instead of write_cell per row). Expressions may "
+        "use column names (`backticks` around names with spaces), numbers, 'strings' "
+        "(in comparisons only), + - * / // % ** on numbers, comparisons, & | ~ over "
+        "comparisons (not and/or/not) and abs/sqrt/exp/log/log10/floor/ceil, "
+        "e.g. \"Amount * Probability / 100\". Set overwrite to replace an existing column."
+    ),
+)
+@_instrumented
+async def add_computed_column(
+    file_name: str = Field(description="Excel file"),
+    sheet_name: str = Field(description="Sheet"),
+    column: str = Field(description="Name of the column to add"),
+    expression: str = Field(description="Expression over existing columns"),
+    overwrite: bool = Field(default=False, description="Replace the column if it already exists"),
+):
+    file_path = _resolve_writable(file_name)
+    rows = 0
+
+    def mutate(sheets):
+        nonlocal rows
+        if sheet_name not in sheets:
+            raise ValueError(f"Sheet '{sheet_name}' not found. Available: {list(sheets)}")
+        df = sheets[sheet_name]
+        existing = [c for c in df.columns if str(c) == column]
+        if existing and not overwrite:
+            raise ValueError(f"Column '{column}' already exists; set overwrite to replace it")
+
+        with _span("compute"):
+            values = column_expr.evaluate(df, expression)
+
+        df = df.copy()
+        label = existing[0] if existing else column
+        df[label] = values.to_numpy()
+        sheets[sheet_name] = df
+
+        rows = len(df)
+        # One change for the whole column; formulas reading it are
+        # recalculated from its cells
+        return [{"sheet": sheet_name, "op": "column", "col": df.columns.get_loc(label), "column": column}]
+
+    with _span("save"):
+        snap = await STORE.write(file_path, mutate)
+
+    return f"Column '{column}' computed for {rows} rows in '{file_name}' (version {snap.version})."
+
+
+@mcp.tool(
+    name="search_cells",
+    description=(
+        "Full-text search over every cell of every workbook in excel_data/. "
+        "Returns the cells containing all query words (case-insensitive; a word "
+        "ending in * matches as a prefix, e.g. 'acme corp*') with file, sheet, "
+        "row, column and value. Use to find which file or rows mention something "
+        "instead of reading files."
+    ),
+)
+@_instrumented
+async def search_cells(
+    query: str = Field(description="Words to find, all must occur in the same cell"),
+    file_names: Optional[List[str]] = Field(default=None, description="Only search these files, default all"),
+    limit: int = Field(default=50, description="Max cells returned"),
+) -> dict:
+    SEARCH.start()
+    await SEARCH.wait_ready(SEARCH_READY_TIMEOUT_S)
+    with _span("search"):
+        result = SEARCH.search(query, limit, file_names)
+    # Files changed since they were indexed; results for them may be stale
+    result["indexing"] = SEARCH.stale()
+    return result
+
+
+@mcp.tool(
+    name="changes_since",
+    description=(
+        "Returns the cell updates, row inserts and whole-column rewrites "
+        "(op 'column': re-read that column) made to a sheet after a "
+        "given version (from read_workbook or a write result). If 'resync' "
+        "is true the delta is unavailable and the sheet must be re-read."
+    ),
+)
+@_instrumented
+async def changes_since(
+    file_name: str = Field(description="Excel file name"),
+    sheet_name: Optional[str] = Field(
+        default=None, description="Sheet, default first sheet"
+    ),
+    version: int = Field(description="Last version the caller has seen"),
+) -> dict:
     file_path = _resolve_file(file_name)
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    with _span("parse"):
+        delta = await STORE.changes_since(file_path, sheet_name, version)
+    return {"file_name": file_name, **delta}
+
+
+JOIN_TYPES = ("inner", "left")
 
-    df = pd.concat([df, pd.DataFrame([row_data])], ignore_index=True)
-    df.to_excel(file_path, sheet_name=sheet_name, index=False)
 
-    return f"Row added to '{file_name}'."
+async def _join_frame(
+    left_file: str,
+    left_sheet: Optional[str],
+    right_file: str,
+    right_sheet: Optional[str],
+    left_on: List[str],
+    right_on: Optional[List[str]] = None,
+    how: str = "inner",
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Joined rows of two sheets, shared by join_sheets and write_sheet.
+    """
+    right_on = right_on or left_on
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type '{how}'. Supported: {list(JOIN_TYPES)}")
+    if len(left_on) != len(right_on):
+        raise ValueError("left_on and right_on must name the same number of columns")
+
+    with _span("parse"):
+        left_snap = await STORE.snapshot(_resolve_file(left_file))
+        right_snap = await STORE.snapshot(_resolve_file(right_file))
+        left_sheet = left_snap.sheet_name(left_sheet)
+        right_sheet = right_snap.sheet_name(right_sheet)
+
+    def run_join():
+        left = left_snap.sheet(left_sheet)
+        missing = [k for k in left_on if k not in left.columns]
+        if missing:
+            raise ValueError(f"Unknown column(s) {missing} in '{left_sheet}'. Available: {list(left.columns)}")
+        right = STORE.keyed(right_snap, right_sheet, right_on)
+        # Probe the right sheet's (cached) key index with the left keys
+        joined = left.join(right, on=left_on if len(left_on) > 1 else left_on[0], how=how, rsuffix="_right")
+        if columns:
+            unknown = [c for c in columns if c not in joined.columns]
+            if unknown:
+                raise ValueError(f"Unknown output column(s) {unknown}. Available: {list(joined.columns)}")
+            joined = joined[columns]
+        return joined
+
+    with _span("join"):
+        joined = await anyio.to_thread.run_sync(run_join)
+    return joined
+
+
+@mcp.tool(
+    name="join_sheets",
+    description=(
+        "Joins two sheets (same or different files) on key columns and "
+        "returns only the joined rows. Use instead of reading both sheets, "
+        "e.g. opportunities with their account details."
+    ),
+)
+@_instrumented
+async def join_sheets(
+    left_file: str = Field(description="Excel file of the left sheet"),
+    left_sheet: Optional[str] = Field(default=None, description="Left sheet, default first sheet"),
+    right_file: str = Field(description="Excel file of the right sheet"),
+    right_sheet: Optional[str] = Field(default=None, description="Right sheet, default first sheet"),
+    left_on: List[str] = Field(description="Key column(s) of the left sheet"),
+    right_on: Optional[List[str]] = Field(
+        default=None, description="Key column(s) of the right sheet, default same as left_on"
+    ),
+    how: str = Field(default="inner", description="inner or left"),
+    columns: Optional[List[str]] = Field(
+        default=None,
+        description="Output columns to return, default all (right columns clashing with left ones get a '_right' suffix)",
+    ),
+    limit: int = Field(default=100, description="Max rows returned"),
+) -> dict:
+    joined = await _join_frame(left_file, left_sheet, right_file, right_sheet, left_on, right_on, how, columns)
+
+    with _span("serialize"):
+        return {
+            "columns": [str(c) for c in joined.columns],
+            "row_count": len(joined),
+            "truncated": len(joined) > limit,
+            "rows": _json_records(joined.head(limit)),
+        }
+
+
+JOIN_EXPORT_KEYS = ("left_file", "left_sheet", "right_file", "right_sheet", "left_on", "right_on", "how", "columns")
+
+
+@mcp.tool(
+    name="write_sheet",
+    description=(
+        "Creates or replaces a whole sheet, keeping the workbook's other sheets; "
+        "creates the .xlsx file if it does not exist. Pass either rows, or join "
+        "(the arguments of join_sheets, without limit) to export a full join "
+        "result without returning it first. Set overwrite to replace an existing sheet."
+    ),
+)
+@_instrumented
+async def write_sheet(
+    file_name: str = Field(description="Excel file (.xlsx), created if missing"),
+    sheet_name: str = Field(description="Sheet to create or replace"),
+    rows: Optional[List[dict]] = Field(default=None, description="Rows as {colName: value}"),
+    columns: Optional[List[str]] = Field(
+        default=None, description="Column order for rows, default the keys in order of appearance"
+    ),
+    join: Optional[dict] = Field(
+        default=None,
+        description="Export a join instead of rows: {left_file, left_sheet, right_file, right_sheet, left_on, right_on, how, columns}",
+    ),
+    overwrite: bool = Field(default=False, description="Replace the sheet if it already exists"),
+):
+    _check_sheet_name(sheet_name)
+    if (rows is None) == (join is None):
+        raise ValueError("Pass exactly one of rows or join")
+    file_path = _resolve_writable(file_name, create=True)
+
+    if join is not None:
+        unknown = [k for k in join if k not in JOIN_EXPORT_KEYS]
+        missing = [k for k in ("left_file", "right_file", "left_on") if k not in join]
+        if unknown or missing:
+            raise ValueError(f"Invalid join: unknown {unknown}, missing {missing}. Keys: {list(JOIN_EXPORT_KEYS)}")
+        spec = {k: join.get(k) for k in JOIN_EXPORT_KEYS}
+        spec["how"] = spec["how"] or "inner"
+        df = await _join_frame(**spec)
+        df = df.reset_index(drop=True)
+    else:
+        df = pd.DataFrame(rows, columns=columns)
+
+    def mutate(sheets):
+        # Excel sheet names are case-insensitive: keep the existing spelling
+        existing = [n for n in sheets if n.casefold() == sheet_name.casefold()]
+        if existing and not overwrite:
+            raise ValueError(f"Sheet '{existing[0]}' already exists; set overwrite to replace it")
+        name = existing[0] if existing else sheet_name
+        sheets[name] = df
+        return [{"sheet": name, "op": "reset"}]
+
+    with _span("save"):
+        snap = await STORE.write(file_path, mutate, create=True)
+
+    return f"Sheet '{sheet_name}' written with {len(df)} rows to '{file_name}' (version {snap.version})."
+
+
+@mcp.tool(
+    name="run_sql",
+    description=(
+        "Runs one read-only SQLite SELECT over a mirror of every sheet in excel_data/, "
+        "for filters, joins and aggregations across sheets. Each sheet is a table named "
+        "after its file (plus _<sheet> when the sheet name differs), lowercase with "
+        "non-alphanumerics as '_'; column names are the sheet headers (quote them: "
+        "\"Close Value\"). Dates are 'YYYY-MM-DD HH:MM:SS' text. "
+        "SELECT * FROM mirror_tables lists the tables and their columns. "
+        "With paginate, a truncated result returns a cursor; pass it back "
+        "(without query) for the next rows of the same snapshot."
+    ),
+)
+@_instrumented
+async def run_sql(
+    query: str = Field(default="", description="One SELECT statement"),
+    limit: int = Field(default=100, description=f"Max rows returned (at most {SQL_MAX_ROWS}; 0 closes a cursor)"),
+    offset: int = Field(default=0, description="Result rows to skip, for paging"),
+    paginate: bool = Field(default=False, description="Keep a truncated result open and return its cursor"),
+    cursor: Optional[str] = Field(default=None, description="Cursor of a paginated result, for its next rows"),
+) -> dict:
+    if cursor:
+        with _span("fetch"):
+            return await anyio.to_thread.run_sync(MIRROR.fetch, cursor, limit)
+    if not query.strip():
+        raise ValueError("query is required")
+    with _span("sync"):
+        await MIRROR.sync(STORE)
+    with _span("query"):
+        result = await anyio.to_thread.run_sync(MIRROR.query, query, limit, None, offset, paginate)
+    # Over the size cap, not mirrored
+    result["skipped"] = sorted(MIRROR.skipped)
+    return result
+
+
+@mcp.tool(
+    name="aggregate_sheet",
+    description=(
+        "Computes count/sum/mean/min/max over columns of a sheet, optionally "
+        "grouped, by streaming rows in chunks. Use for large sheets instead "
+        "of reading them whole."
+    ),
+)
+@_instrumented
+async def aggregate_sheet(
+    file_name: str = Field(description="Excel file name"),
+    sheet_name: Optional[str] = Field(
+        default=None, description="Sheet to aggregate, default first sheet"
+    ),
+    columns: List[str] = Field(
+        default_factory=list, description="Columns to aggregate (empty: row counts only)"
+    ),
+    aggregates: List[str] = Field(
+        default_factory=lambda: list(AGG_FUNCS),
+        description="Any of count, sum, mean, min, max",
+    ),
+    group_by: List[str] = Field(
+        default_factory=list, description="Columns to group by (empty: whole sheet)"
+    ),
+    chunk_rows: int = Field(default=AGG_CHUNK_ROWS, description="Rows per chunk"),
+    memory_limit_mb: Optional[int] = Field(
+        default=None, description="Memory budget for this call, capped by the server limit"
+    ),
+    limit: int = Field(default=100, description="Max groups returned, largest first"),
+    ctx: Context = None,
+) -> dict:
+    file_path = _resolve_file(file_name)
+    limit_mb = min(memory_limit_mb or AGG_MEMORY_LIMIT_MB, AGG_MEMORY_LIMIT_MB)
+
+    formula_cols = await anyio.to_thread.run_sync(formula_engine.formula_columns, file_path, sheet_name)
+    # Opening the workbook and reading the header is blocking file I/O
+    source, header, rows, total = await anyio.to_thread.run_sync(open_row_stream, file_path, sheet_name)
+    needed = {*columns, *group_by}
+    if any(h is not None and str(h) in needed for i, h in enumerate(header) if i in formula_cols):
+        # Saved formula cells carry no cached value, so the file's data_only
+        # view would be empty there: aggregate the evaluated snapshot instead.
+        # Only then is the sheet held in memory; otherwise it is streamed.
+        source.close()
+        snap = await STORE.snapshot(file_path)
+        source, header, rows, total = open_frame_stream(snap.sheet(sheet_name))
+    try:
+        agg = StreamingAggregator(
+            header,
+            columns,
+            aggregates,
+            group_by,
+            chunk_rows=chunk_rows,
+            memory_limit_bytes=limit_mb * 1024 * 1024,
+        )
+        # Parsing is CPU-bound: run each chunk in a worker thread so the
+        # server keeps answering other requests, report progress in between.
+        with _span("parse"):
+            while await anyio.to_thread.run_sync(agg.consume_chunk, rows):
+                if ctx is not None:
+                    await ctx.report_progress(agg.rows, total, f"{agg.rows} rows aggregated")
+    finally:
+        source.close()
+
+    with _span("serialize"):
+        return agg.result(limit)
+
+
+# ------------------------------
+# MCP RESOURCES
+# ------------------------------
+
+@mcp.resource(
+    "metrics://excel",
+    name="server_metrics",
+    description="Prometheus metrics of this server process",
+    mime_type="text/plain",
+)
+def server_metrics() -> str:
+    return SERVER_REGISTRY.render()
+
+
+@mcp.resource(
+    "warmup://excel/{file_name}",
+    name="warm_file",
+    description="Loads a workbook's snapshot and refreshes the search index and SQL mirror (read by the backend after uploads)",
+    mime_type="application/json",
+)
+async def warm_file(file_name: str) -> str:
+    file_path = _resolve_file(unquote(file_name))
+    snap = await STORE.snapshot(file_path)
+    if SEARCH.started:
+        SEARCH.stale()
+    MIRROR.schedule(STORE)
+    return json.dumps({
+        "file_name": file_path.name,
+        "version": snap.version,
+        "sheets": {name: len(df) for name, df in snap.sheets.items()},
+    })
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Excel MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "streamable-http", "sse"),
+        default="stdio",
+        help="stdio: child process of one backend; streamable-http/sse: shared network service",
+    )
+    parser.add_argument("--host", default=os.environ.get("EXCEL_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("EXCEL_MCP_PORT", "8765")))
+    return parser.parse_args()
+
+
+SERVER_STARTUP_SECONDS.set(time.perf_counter() - _IMPORT_START, phase="import")
+
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    args = _parse_args()
+    if os.environ.get("EXCEL_READER_AUTOBENCH") == "1":
+        excel_readers.autobench(EXCEL_DIR)
+
+    if args.transport != "stdio":
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        if args.host not in ("127.0.0.1", "localhost", "::1"):
+            # FastMCP only allows localhost Host headers by default; a server
+            # bound for other nodes must accept their requests
+            mcp.settings.transport_security = TransportSecuritySettings(enable_dns_rebinding_protection=False)
+        logger.info(f"Excel MCP server listening on {args.transport} {args.host}:{args.port}")
+    mcp.run(transport=args.transport)
\ No newline at end of file
@@ -0,0 +1,239 @@
+# backend/mcp/excel_readers.py
+"""
+Reader backends for the Excel MCP server.
+
+Each engine reads one file format family into DataFrames. The fastest
+installed engine is picked per file suffix; individual files can be pinned
+to an engine with EXCEL_READER_OVERRIDES ("pattern=engine,...", fnmatch
+patterns on the file name), and EXCEL_READER_AUTOBENCH=1 re-orders the
+preference at startup by timing the engines on files in excel_data/.
+"""
+import importlib.util
+import logging
+import os
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+logger = logging.getLogger("ExcelMCP")
+
+NRows = Union[None, int, Dict[str, Optional[int]]]
+
+
+class ReaderEngine:
+    """
+    Reads sheets of one file family through pandas.
+    """
+
+    def __init__(self, name: str, suffixes: Sequence[str], module: str, pandas_engine: Optional[str] = None):
+        self.name = name
+        self.suffixes = tuple(suffixes)
+        self.module = module
+        self.pandas_engine = pandas_engine or name
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def sheet_names(self, path: Path) -> List[str]:
+        with pd.ExcelFile(path, engine=self.pandas_engine) as xls:
+            return list(xls.sheet_names)
+
+    def read_sheets(self, path: Path, sheets: Optional[Sequence[str]] = None, nrows: NRows = None) -> Dict[str, pd.DataFrame]:
+        """
+        Read `sheets` (default all) with a single open of the file.
+        `nrows` is one limit for every sheet or a {sheet: limit} mapping.
+        """
+        with pd.ExcelFile(path, engine=self.pandas_engine) as xls:
+            names = list(sheets) if sheets else list(xls.sheet_names)
+            missing = [n for n in names if n not in xls.sheet_names]
+            if missing:
+                raise ValueError(f"Sheet(s) {missing} not found. Available: {xls.sheet_names}")
+            return {n: xls.parse(n, nrows=_limit_for(nrows, n)) for n in names}
+
+    def sheet_info(self, path: Path) -> List[dict]:
+        """
+        Row (excluding header) and column counts of what read_sheets returns.
+        """
+        return [
+            {"name": name, "rows": len(df), "columns": len(df.columns)}
+            for name, df in self.read_sheets(path).items()
+        ]
+
+
+class CalamineEngine(ReaderEngine):
+    """
+    calamine trims each sheet's range to the cells that hold data, so the
+    counts come from the range without building DataFrames. Formatted
+    empty cells, which openpyxl's max_row/max_column include, do not count.
+    """
+
+    def __init__(self):
+        super().__init__("calamine", (".xlsx", ".xlsm", ".xlsb", ".xls", ".ods"), "python_calamine")
+
+    def sheet_info(self, path: Path) -> List[dict]:
+        from python_calamine import CalamineWorkbook
+
+        wb = CalamineWorkbook.from_path(str(path))
+        try:
+            info = []
+            for name in wb.sheet_names:
+                ws = wb.get_sheet_by_name(name)
+                if ws.start is None:
+                    info.append({"name": name, "rows": 0, "columns": 0})
+                    continue
+                # Reads start at A1 (blank leading rows and columns included),
+                # row 1 being the header
+                info.append({"name": name, "rows": ws.end[0], "columns": ws.end[1] + 1})
+            return info
+        finally:
+            wb.close()
+
+
+class CsvEngine(ReaderEngine):
+    """
+    A CSV file is a workbook with one sheet named after the file.
+    """
+
+    def __init__(self):
+        super().__init__("csv", (".csv",), "pandas")
+
+    def sheet_names(self, path: Path) -> List[str]:
+        return [path.stem]
+
+    def read_sheets(self, path: Path, sheets: Optional[Sequence[str]] = None, nrows: NRows = None) -> Dict[str, pd.DataFrame]:
+        name = path.stem
+        if sheets and list(sheets) != [name]:
+            raise ValueError(f"Sheet(s) {list(sheets)} not found. Available: [{name!r}]")
+        return {name: pd.read_csv(path, nrows=_limit_for(nrows, name))}
+
+
+def _limit_for(nrows: NRows, sheet: str) -> Optional[int]:
+    return nrows.get(sheet) if isinstance(nrows, dict) else nrows
+
+
+ENGINES: Dict[str, ReaderEngine] = {
+    e.name: e
+    for e in (
+        CalamineEngine(),
+        ReaderEngine("openpyxl", (".xlsx", ".xlsm"), "openpyxl"),
+        ReaderEngine("xlrd", (".xls",), "xlrd"),
+        ReaderEngine("odf", (".ods",), "odf"),
+        ReaderEngine("pyxlsb", (".xlsb",), "pyxlsb"),
+        CsvEngine(),
+    )
+}
+
+_DEFAULT_ORDER = ("calamine", "openpyxl", "xlrd", "odf", "pyxlsb", "csv")
+
+# suffix -> installed engines, fastest first (refined by autobench())
+_preference: Dict[str, List[str]] = {}
+for _name in _DEFAULT_ORDER:
+    if ENGINES[_name].available():
+        for _suffix in ENGINES[_name].suffixes:
+            _preference.setdefault(_suffix, []).append(_name)
+
+
+def _parse_overrides(raw: str) -> List[tuple]:
+    pairs = []
+    for item in filter(None, (p.strip() for p in raw.split(","))):
+        pattern, _, engine = item.partition("=")
+        if engine.strip() not in ENGINES:
+            raise ValueError(f"EXCEL_READER_OVERRIDES: unknown engine '{engine}' for '{pattern}'")
+        pairs.append((pattern.strip(), engine.strip()))
+    return pairs
+
+
+_overrides = _parse_overrides(os.environ.get("EXCEL_READER_OVERRIDES", ""))
+
+SUPPORTED_SUFFIXES = tuple(sorted(_preference))
+
+
+def engine_for(path: Path) -> ReaderEngine:
+    """
+    Per-file override first, then the fastest available engine for the suffix.
+    """
+    for pattern, name in _overrides:
+        if fnmatch(path.name, pattern):
+            return ENGINES[name]
+
+    suffix = path.suffix.lower()
+    if not _preference.get(suffix):
+        raise ValueError(f"No installed reader supports '{suffix}' files ({path.name})")
+    return ENGINES[_preference[suffix][0]]
+
+
+# ------------------------------
+# Public helpers used by the tools
+# ------------------------------
+
+def read_sheets(path: Path, sheets: Optional[Sequence[str]] = None, nrows: NRows = None) -> Dict[str, pd.DataFrame]:
+    return engine_for(path).read_sheets(path, sheets, nrows)
+
+
+def read_sheet(path: Path, sheet: Optional[str] = None, nrows: Optional[int] = None) -> pd.DataFrame:
+    """
+    One sheet; the first one when `sheet` is None.
+    """
+    engine = engine_for(path)
+    name = sheet if sheet is not None else engine.sheet_names(path)[0]
+    return engine.read_sheets(path, [name], nrows)[name]
+
+
+def sheet_info(path: Path) -> List[dict]:
+    """
+    Sheet names with row (excluding header) and column counts, as the
+    engine that reads the file sees them.
+    """
+    return engine_for(path).sheet_info(path)
+
+
+# ------------------------------
+# Self-benchmark
+# ------------------------------
+
+def benchmark(path: Path, engines: Optional[Sequence[str]] = None, repeat: int = 3) -> Dict[str, float]:
+    """
+    Median seconds to read every sheet of `path`, per available engine.
+    """
+    suffix = path.suffix.lower()
+    names = engines or [n for n, e in ENGINES.items() if suffix in e.suffixes and e.available()]
+    results = {}
+    for name in names:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ENGINES[name].read_sheets(path)
+            timings.append(time.perf_counter() - start)
+        results[name] = sorted(timings)[len(timings) // 2]
+    return results
+
+
+def autobench(sample_dir: Path, repeat: int = 1):
+    """
+    Re-rank the engines of each suffix by timing them on the largest file
+    of that type in `sample_dir`. Engines that fail on it go last.
+    """
+    largest: Dict[str, Path] = {}
+    for f in sample_dir.iterdir():
+        s = f.suffix.lower()
+        if s in _preference and (s not in largest or f.stat().st_size > largest[s].stat().st_size):
+            largest[s] = f
+
+    for suffix, sample in largest.items():
+        candidates = _preference[suffix]
+        if len(candidates) < 2:
+            continue
+
+        timings: Dict[str, float] = {}
+        for name in candidates:
+            try:
+                timings[name] = benchmark(sample, [name], repeat)[name]
+            except Exception as e:
+                logger.warning(f"Reader '{name}' failed on {sample.name}: {e}")
+                timings[name] = float("inf")
+
+        _preference[suffix] = sorted(candidates, key=timings.get)
+        logger.info(f"Reader benchmark {sample.name}: {timings} -> {_preference[suffix]}")
@@ -0,0 +1,558 @@
+# backend/mcp/excel_store.py
+"""
+Versioned, in-memory snapshots of workbooks with atomic saves.
+
+Readers get the last committed Snapshot of a file and never wait for a
+writer. Writers are serialized per file by an asyncio.Lock (this process)
+plus an advisory lock on a hidden ".<name>.lock" file (other processes),
+build the new sheets copy-on-write, save them to a temp file in the same
+directory and os.replace() it over the original, so the workbook on disk
+is always either the old or the new complete file.
+
+Every commit gets a new file version. Each sheet remembers the version
+that last changed it and a bounded log of its row inserts and cell
+updates, so clients can fetch the delta since a version they have seen.
+
+Formulas are evaluated by formula_engine when a workbook is loaded and
+only the downstream formulas are recomputed on each write; saves keep
+the formula text in the file.
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import anyio
+import pandas as pd
+
+from backend.mcp import excel_readers, formula_engine
+from backend.mcp.formula_engine import Cell, FormulaGraph
+from backend.utils.metrics import REGISTRY, Counter, Histogram, Registry
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+Sheets = Dict[str, pd.DataFrame]
+
+# A write's description of what it did to one sheet (a value starting
+# with "=" is a formula; recalculated cells are added as "recalc" updates):
+#   {"sheet": name, "op": "update", "row": i, "col": j, "column": name, "value": v}
+#   {"sheet": name, "op": "insert", "row": i, "values": {column: v}}
+#   {"sheet": name, "op": "column", "col": j, "column": name}   (every row of a column rewritten)
+#   {"sheet": name, "op": "reset"}   (sheet replaced; readers must resync)
+Change = Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    One committed version of a workbook. The frames are shared between
+    readers and must not be modified in place.
+    """
+
+    path: Path
+    version: int
+    mtime_ns: int
+    size: int
+    sheets: Sheets
+    sheet_versions: Dict[str, int]
+    formulas: Optional[FormulaGraph] = None
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self.sheets)
+
+    def sheet(self, name: Optional[str] = None) -> pd.DataFrame:
+        """
+        One sheet; the first one when `name` is None.
+        """
+        if name is None:
+            return next(iter(self.sheets.values()))
+        if name not in self.sheets:
+            raise ValueError(f"Sheet '{name}' not found. Available: {self.sheet_names}")
+        return self.sheets[name]
+
+    def sheet_name(self, name: Optional[str] = None) -> str:
+        self.sheet(name)
+        return name if name is not None else self.sheet_names[0]
+
+
+class ChangeLog:
+    """
+    The last `maxlen` changes of one sheet. Changes at or before `floor`
+    are no longer (or were never) recorded: asking for them means resync.
+    """
+
+    def __init__(self, version: int, maxlen: int):
+        self.maxlen = maxlen
+        self.version = version
+        self.floor = version
+        self._entries: Deque[Change] = deque()
+
+    def reset(self, version: int):
+        self.version = self.floor = version
+        self._entries.clear()
+
+    def record(self, version: int, change: Change):
+        self.version = version
+        if change["op"] == "reset":
+            self.reset(version)
+            return
+        if len(self._entries) >= self.maxlen:
+            self.floor = max(self.floor, self._entries.popleft()["version"])
+        entry = {k: v for k, v in change.items() if k != "sheet"}
+        self._entries.append({"version": version, **entry})
+
+    def since(self, version: int) -> Optional[List[Change]]:
+        """
+        Changes after `version`, or None when they are not all available.
+        """
+        if version < self.floor:
+            return None
+        return [e for e in self._entries if e["version"] > version]
+
+
+# ------------------------------
+# File helpers (run in worker threads)
+# ------------------------------
+
+def _lock_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.lock")
+
+
+def _acquire_os_lock(path: Path) -> int:
+    fd = os.open(_lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if sys.platform == "win32":
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _release_os_lock(fd: int):
+    try:
+        if sys.platform == "win32":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _read_workbook(path: Path) -> Tuple[Sheets, Optional[FormulaGraph]]:
+    sheets = excel_readers.read_sheets(path)
+    return sheets, formula_engine.build_graph(sheets, formula_engine.load_formulas(path))
+
+
+# Rows converted to Python values at a time while streaming a sheet out
+SAVE_CHUNK_ROWS = 5000
+
+
+def _sheet_rows(
+    df: pd.DataFrame,
+    formulas: Dict[Tuple[int, int], str],
+    text_cell: Callable[[str], Any],
+) -> Iterable[List[Any]]:
+    """
+    Header plus data rows of `df` as lists of plain values (None for
+    NaN/NaT), with formula cells replaced by their formula text. Other
+    strings starting with "=" are data, not formulas: they are passed
+    through `text_cell` so they are saved as text. Only one chunk is
+    converted at a time.
+    """
+    yield [text_cell(h) if h.startswith("=") else h for h in map(str, df.columns)]
+    # Formula rows are 1-based over the data rows (0 is the header)
+    by_row: Dict[int, List[Tuple[int, str]]] = {}
+    for (row, col), text in formulas.items():
+        if col < df.shape[1]:
+            by_row.setdefault(row, []).append((col, text))
+
+    # Only object columns can hold strings
+    text_cols = [i for i, dtype in enumerate(df.dtypes) if not pd.api.types.is_numeric_dtype(dtype)]
+
+    for start in range(0, len(df), SAVE_CHUNK_ROWS):
+        chunk = df.iloc[start:start + SAVE_CHUNK_ROWS]
+        values = chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist()
+        for offset, row in enumerate(values):
+            for col in text_cols:
+                value = row[col]
+                if isinstance(value, str) and value.startswith("="):
+                    row[col] = text_cell(value)
+            for col, text in by_row.get(start + offset + 1, ()):
+                row[col] = text
+            yield row
+
+
+def _atomic_save(path: Path, sheets: Sheets, formulas: Optional[FormulaGraph] = None) -> os.stat_result:
+    """
+    Write every sheet to a temp file next to `path`, fsync it and rename it
+    over `path`. Rows are streamed through openpyxl's write-only mode, so
+    the writer holds one chunk of rows instead of a cell object per value.
+    Formula cells are written as their formula text (Excel recalculates
+    them on open). Returns the stat of the new file.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    by_sheet = formulas.by_sheet() if formulas is not None else {}
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        wb = Workbook(write_only=True)
+        # No cached values are written for formulas; spreadsheet apps recompute
+        wb.calculation.fullCalcOnLoad = True
+        for name, df in sheets.items():
+            ws = wb.create_sheet(name)
+
+            def text_cell(value: str, ws=ws) -> WriteOnlyCell:
+                cell = WriteOnlyCell(ws, value)
+                cell.data_type = "s"
+                return cell
+
+            for row in _sheet_rows(df, by_sheet.get(name, {}), text_cell):
+                ws.append(row)
+        wb.save(tmp)
+        with open(tmp, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp.unlink()
+        raise
+
+    if sys.platform != "win32":
+        # Persist the rename itself
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return path.stat()
+
+
+# ------------------------------
+# Store
+# ------------------------------
+
+class WorkbookStore:
+    """
+    Snapshot cache (LRU, `max_files` workbooks) plus the per-file write
+    path. A cached snapshot is reused while the file's mtime and size are
+    unchanged, so edits made by other processes are picked up on the next
+    read (and reset the change logs of that file).
+
+    Versions are per file and only ever increase. The first version a
+    process assigns to a file is the current time in milliseconds, so a
+    version from before a restart is always older than any after it.
+    """
+
+    def __init__(self, max_files: int = 32, change_log_size: int = 1000, registry: Optional[Registry] = REGISTRY):
+        self.max_files = max_files
+        self.change_log_size = change_log_size
+        self._snapshots: "OrderedDict[Path, Snapshot]" = OrderedDict()
+        self._versions: Dict[Path, int] = {}
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._logs: Dict[Path, Dict[str, ChangeLog]] = {}
+        # path -> (sheet, key columns) -> (sheet version, frame indexed by the keys)
+        self._indexes: Dict[Path, Dict[Tuple[str, Tuple[str, ...]], Tuple[int, pd.DataFrame]]] = {}
+        self._load_locks: Dict[Path, asyncio.Lock] = {}
+        self._write_locks: Dict[Path, asyncio.Lock] = {}
+        self._listeners: List[Callable[[Snapshot, List[Change]], None]] = []
+
+        self._requests = Counter(
+            "excel_mcp_snapshot_requests_total",
+            "Snapshot lookups by result (hit: served from memory, load: file parsed)",
+            ("result",),
+            registry=registry,
+        )
+        self._index_requests = Counter(
+            "excel_mcp_key_index_requests_total",
+            "Keyed sheet lookups for joins by result (hit: cached index, build: set_index)",
+            ("result",),
+            registry=registry,
+        )
+        self._recalculated = Counter(
+            "excel_mcp_recalculated_cells_total",
+            "Formula cells recomputed after writes",
+            registry=registry,
+        )
+        self._save_seconds = Histogram(
+            "excel_mcp_save_duration_seconds",
+            "Atomic workbook saves (temp file write, fsync and rename)",
+            registry=registry,
+        )
+
+    def subscribe(self, listener: Callable[[Snapshot, List[Change]], None]):
+        """
+        Call `listener(snapshot, changes)` after every commit, in commit
+        order and while the file is still locked. Listeners must be quick
+        and must not raise; heavy work belongs in a task of their own.
+        """
+        self._listeners.append(listener)
+
+    def _fresh(self, path: Path, st: os.stat_result) -> Optional[Snapshot]:
+        snap = self._snapshots.get(path)
+        if snap is not None and (snap.mtime_ns, snap.size) == (st.st_mtime_ns, st.st_size):
+            self._snapshots.move_to_end(path)
+            return snap
+        return None
+
+    def _next_version(self, path: Path) -> int:
+        previous = self._versions.get(path)
+        version = previous + 1 if previous is not None else time.time_ns() // 1_000_000
+        self._versions[path] = version
+        return version
+
+    def _install(
+        self,
+        path: Path,
+        sheets: Sheets,
+        st: os.stat_result,
+        changes: Optional[Iterable[Change]] = None,
+        formulas: Optional[FormulaGraph] = None,
+    ) -> Snapshot:
+        """
+        Make `sheets` the committed snapshot. `changes` is None when they
+        were parsed from disk: unless this is a file we committed or loaded
+        ourselves (snapshot evicted and re-read), its history is unknown and
+        every sheet's log starts over.
+        """
+        stat_key = (st.st_mtime_ns, st.st_size)
+        logs = self._logs.setdefault(path, {})
+
+        if changes is None and self._stats.get(path) == stat_key:
+            version = self._versions[path]
+        else:
+            version = self._next_version(path)
+            if changes is None:
+                logs.clear()
+            for change in changes or ():
+                logs.setdefault(change["sheet"], ChangeLog(version, self.change_log_size)).record(version, change)
+
+        for name in list(logs):
+            if name not in sheets:
+                del logs[name]
+        for name in sheets:
+            logs.setdefault(name, ChangeLog(version, self.change_log_size))
+
+        self._stats[path] = stat_key
+        snap = Snapshot(
+            path, version, st.st_mtime_ns, st.st_size, sheets,
+            {name: log.version for name, log in logs.items()},
+            formulas,
+        )
+        self._snapshots[path] = snap
+        self._snapshots.move_to_end(path)
+        while len(self._snapshots) > self.max_files:
+            evicted, _ = self._snapshots.popitem(last=False)
+            self._indexes.pop(evicted, None)
+        return snap
+
+    async def snapshot(self, path: Path) -> Snapshot:
+        """
+        Last committed snapshot of `path`, parsing the file (in a worker
+        thread, once for concurrent callers) if it is not cached or changed
+        on disk.
+        """
+        lock = self._write_locks.get(path)
+        if lock is not None and lock.locked() and path in self._snapshots:
+            # A save of ours is in flight: the file may already be renamed
+            # but its snapshot is installed only once the save returns
+            self._requests.inc(result="hit")
+            self._snapshots.move_to_end(path)
+            return self._snapshots[path]
+        return await self._load(path)
+
+    async def _load(self, path: Path) -> Snapshot:
+        snap = self._fresh(path, path.stat())
+        if snap is not None:
+            self._requests.inc(result="hit")
+            return snap
+
+        async with self._load_locks.setdefault(path, asyncio.Lock()):
+            # Stat before parsing: a change made during the parse leaves the
+            # snapshot stale and triggers another load next time
+            st = path.stat()
+            snap = self._fresh(path, st)
+            if snap is not None:
+                self._requests.inc(result="hit")
+                return snap
+
+            self._requests.inc(result="load")
+            sheets, formulas = await anyio.to_thread.run_sync(_read_workbook, path)
+            return self._install(path, sheets, st, formulas=formulas)
+
+    def keyed(self, snap: Snapshot, sheet: str, keys: Sequence[str]) -> pd.DataFrame:
+        """
+        `sheet` of `snap` indexed by `keys`, cached until the sheet changes.
+        pandas builds the index's hash table on the first lookup and keeps
+        it on the index, so repeated joins against the same keys skip both
+        the set_index and the hashing.
+        """
+        df = snap.sheet(sheet)
+        missing = [k for k in keys if k not in df.columns]
+        if missing:
+            raise ValueError(f"Unknown column(s) {missing} in '{sheet}'. Available: {list(df.columns)}")
+
+        cache = self._indexes.setdefault(snap.path, {})
+        version = snap.sheet_versions[sheet]
+        cached = cache.get((sheet, tuple(keys)))
+        if cached is not None and cached[0] == version:
+            self._index_requests.inc(result="hit")
+            return cached[1]
+
+        self._index_requests.inc(result="build")
+        indexed = df.set_index(list(keys))
+        cache[(sheet, tuple(keys))] = (version, indexed)
+        return indexed
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, path: Path):
+        async with self._write_locks.setdefault(path, asyncio.Lock()):
+            fd = await anyio.to_thread.run_sync(_acquire_os_lock, path)
+            try:
+                yield
+            finally:
+                _release_os_lock(fd)
+
+    async def write(self, path: Path, mutate: Callable[[Sheets], Iterable[Change]], create: bool = False) -> Snapshot:
+        """
+        Apply `mutate` to the latest sheets and commit them atomically.
+
+        `mutate` gets a new dict of the current frames and must replace the
+        frames it changes (copy-on-write) instead of modifying them, since
+        readers may still hold the previous snapshot. It returns the changes
+        it made, which go into the sheets' change logs. With `create`, a
+        missing file starts out as a workbook without sheets.
+        """
+        async with self._locked(path):
+            if create and not path.exists():
+                base = Snapshot(path, 0, 0, 0, {}, {})
+            else:
+                base = await self._load(path)
+            sheets = dict(base.sheets)
+            changes = list(mutate(sheets))
+
+            undo: List[Tuple[Cell, Optional[str]]] = []
+            try:
+                formulas = await anyio.to_thread.run_sync(self._recalculate, base, sheets, changes, undo)
+                with self._save_seconds.time():
+                    st = await anyio.to_thread.run_sync(_atomic_save, path, sheets, formulas)
+            except BaseException:
+                # The graph is shared with the base snapshot: put back the
+                # edits made so far, whether recalculation or the save failed.
+                # A graph created for this write is simply dropped.
+                if base.formulas is not None:
+                    for cell, text in reversed(undo):
+                        base.formulas.set_formula(cell, text)
+                raise
+            snap = self._install(path, sheets, st, changes, formulas)
+            for listener in self._listeners:
+                listener(snap, changes)
+            return snap
+
+    def _recalculate(
+        self, base: Snapshot, sheets: Sheets, changes: List[Change], undo: List[Tuple[Cell, Optional[str]]]
+    ) -> Optional[FormulaGraph]:
+        """
+        Apply the formulas written by `changes` (values starting with "=")
+        to the base graph and recompute everything downstream of the
+        changed cells into `sheets`, copying frames before writing to them.
+        Recomputed cells are appended to `changes`. Returns the graph; the
+        (cell, previous formula) pairs needed to undo the edits are appended
+        to `undo` as they are made, so they are there even if this raises.
+        """
+        formulas = base.formulas
+        touched: Optional[List[Cell]] = []
+        written: Dict[Cell, Change] = {}
+
+        for change in changes:
+            name, op = change["sheet"], change["op"]
+            if op == "reset":
+                # The sheet was replaced: its old formulas no longer apply
+                if formulas is not None:
+                    for cell in formulas.cells():
+                        if cell[0] == name:
+                            undo.append((cell, formulas.set_formula(cell, None)))
+                touched = None
+            elif op == "insert" and touched is not None:
+                touched.extend((name, change["row"] + 1, c) for c in range(sheets[name].shape[1]))
+            elif op == "column":
+                # Values replace the column's formulas
+                col = change["col"]
+                if formulas is not None:
+                    for cell in formulas.cells():
+                        if cell[0] == name and cell[2] == col:
+                            undo.append((cell, formulas.set_formula(cell, None)))
+                if touched is not None:
+                    touched.extend((name, row + 1, col) for row in range(len(sheets[name])))
+            elif op == "update":
+                cell = (name, change["row"] + 1, change["col"])
+                value = change["value"]
+                text = value if isinstance(value, str) and len(value) > 1 and value.startswith("=") else None
+                if text and formulas is None:
+                    formulas = FormulaGraph()
+                if formulas is not None:
+                    undo.append((cell, formulas.set_formula(cell, text)))
+                if text:
+                    change["formula"] = text
+                written[cell] = change
+                if touched is not None:
+                    touched.append(cell)
+
+        if formulas is None or not len(formulas):
+            return formulas
+
+        dirty = formulas.cells() if touched is None else formulas.downstream(touched)
+        for name in {cell[0] for cell in dirty}:
+            if name in sheets and sheets[name] is base.sheets.get(name):
+                sheets[name] = sheets[name].copy()
+
+        results = formulas.recalculate(sheets, dirty)
+        self._recalculated.inc(len(results))
+        for cell, value in results.items():
+            if cell in written:
+                written[cell]["value"] = value
+            else:
+                name, row, col = cell
+                changes.append({
+                    "sheet": name,
+                    "op": "update",
+                    "row": row - 1,
+                    "col": col,
+                    "column": str(sheets[name].columns[col]),
+                    "value": value,
+                    "recalc": True,
+                })
+        return formulas
+
+    async def changes_since(self, path: Path, sheet: Optional[str], version: int) -> Dict[str, Any]:
+        """
+        Changes to one sheet committed after `version`. "resync" is set when
+        they are not all in the log (truncated, file changed outside this
+        server, or a version this store never issued); the caller should
+        then re-read the sheet.
+        """
+        snap = await self.snapshot(path)
+        name = snap.sheet_name(sheet)
+        changes = self._logs[path][name].since(version) if version <= snap.version else None
+        return {
+            "sheet_name": name,
+            "since": version,
+            "version": snap.version,
+            "sheet_version": snap.sheet_versions[name],
+            "resync": changes is None,
+            "changes": changes or [],
+        }
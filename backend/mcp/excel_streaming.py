@@ -0,0 +1,242 @@
+# backend/mcp/excel_streaming.py
+"""
+Row-streaming helpers for sheets too large for pd.read_excel.
+
+Rows come from openpyxl in read-only mode (the sheet XML is parsed
+incrementally), a csv.reader or an already loaded sheet, are consumed in
+fixed-size chunks, and only the aggregate state is kept in memory.
+"""
+import csv
+import math
+from itertools import islice
+from numbers import Number
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+AGG_FUNCS = ("count", "sum", "mean", "min", "max")
+
+# Rough per-object costs used for the memory budget (CPython, 64-bit)
+_BYTES_PER_CELL = 64
+_BYTES_PER_ACCUMULATOR = 200
+_BYTES_PER_GROUP = 240
+
+
+class MemoryLimitExceeded(ValueError):
+    pass
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool) and not (
+        isinstance(value, float) and math.isnan(value)
+    )
+
+
+class _Accumulator:
+    __slots__ = ("count", "numeric", "total", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.numeric = 0
+        self.total = 0.0
+        self.low = None
+        self.high = None
+
+    def add(self, value: Any):
+        if value is None or value == "":
+            return
+        self.count += 1
+        if _is_number(value):
+            self.numeric += 1
+            self.total += value
+            self.low = value if self.low is None or value < self.low else self.low
+            self.high = value if self.high is None or value > self.high else self.high
+
+    def result(self, funcs: Sequence[str]) -> Dict[str, Any]:
+        values = {
+            "count": self.count,
+            "sum": self.total if self.numeric else None,
+            "mean": self.total / self.numeric if self.numeric else None,
+            "min": self.low,
+            "max": self.high,
+        }
+        return {f: values[f] for f in funcs}
+
+
+class StreamingAggregator:
+    """
+    Incremental count/sum/mean/min/max, optionally grouped, over a row
+    stream. Memory is bounded by `memory_limit_bytes`: the chunk size is
+    capped so a chunk fits in a quarter of it, and the number of groups is
+    capped so the aggregate state fits in the rest.
+    """
+
+    def __init__(
+        self,
+        header: Sequence[Any],
+        columns: Sequence[str],
+        funcs: Sequence[str],
+        group_by: Sequence[str],
+        chunk_rows: int,
+        memory_limit_bytes: int,
+    ):
+        header = [str(h) if h is not None else "" for h in header]
+        missing = [c for c in [*columns, *group_by] if c not in header]
+        if missing:
+            raise ValueError(f"Unknown column(s) {missing}. Available: {header}")
+        bad = [f for f in funcs if f not in AGG_FUNCS]
+        if bad:
+            raise ValueError(f"Unknown aggregate(s) {bad}. Supported: {list(AGG_FUNCS)}")
+
+        self.columns = list(columns)
+        self.funcs = list(funcs)
+        self.group_by = list(group_by)
+        self._col_idx = [header.index(c) for c in self.columns]
+        self._group_idx = [header.index(c) for c in self.group_by]
+
+        max_chunk = max(1, (memory_limit_bytes // 4) // (_BYTES_PER_CELL * max(1, len(header))))
+        self.chunk_rows = max(1, min(chunk_rows, max_chunk))
+
+        per_group = _BYTES_PER_GROUP + _BYTES_PER_ACCUMULATOR * len(self.columns)
+        self.max_groups = max(1, (memory_limit_bytes * 3 // 4) // per_group)
+
+        self.rows = 0
+        self.chunks = 0
+        self._groups: Dict[Tuple[Any, ...], Tuple[List[int], List[_Accumulator]]] = {}
+
+    def consume_chunk(self, rows: Iterator[Sequence[Any]]) -> int:
+        """
+        Pull up to chunk_rows rows from `rows` and fold them into the state.
+        Returns the number of rows consumed (0 when the stream is exhausted).
+        """
+        chunk = list(islice(rows, self.chunk_rows))
+        for row in chunk:
+            key = tuple(row[i] if i < len(row) else None for i in self._group_idx)
+            state = self._groups.get(key)
+            if state is None:
+                if len(self._groups) >= self.max_groups:
+                    raise MemoryLimitExceeded(
+                        f"More than {self.max_groups} groups for {self.group_by}; "
+                        f"raise the memory limit or group by fewer columns."
+                    )
+                state = ([0], [_Accumulator() for _ in self._col_idx])
+                self._groups[key] = state
+
+            state[0][0] += 1
+            for acc, i in zip(state[1], self._col_idx):
+                acc.add(row[i] if i < len(row) else None)
+
+        self.rows += len(chunk)
+        if chunk:
+            self.chunks += 1
+        return len(chunk)
+
+    def result(self, limit: int) -> Dict[str, Any]:
+        groups = sorted(self._groups.items(), key=lambda kv: kv[1][0][0], reverse=True)
+        out = []
+        for key, (row_count, accs) in groups[:limit]:
+            entry: Dict[str, Any] = {"row_count": row_count[0]}
+            if self.group_by:
+                entry["group"] = dict(zip(self.group_by, key))
+            for col, acc in zip(self.columns, accs):
+                entry[col] = acc.result(self.funcs)
+            out.append(entry)
+
+        return {
+            "rows_scanned": self.rows,
+            "chunks": self.chunks,
+            "chunk_rows": self.chunk_rows,
+            "group_count": len(self._groups),
+            "groups_truncated": len(groups) > limit,
+            "results": out,
+        }
+
+
+class _CsvSource:
+    """
+    Same close() contract as a read-only openpyxl workbook.
+    """
+
+    def __init__(self, path: Path):
+        self._fh = open(path, newline="", encoding="utf-8-sig")
+
+    def rows(self):
+        for row in csv.reader(self._fh):
+            yield tuple(_coerce(v) for v in row)
+
+    def close(self):
+        self._fh.close()
+
+
+class _FrameSource:
+    """
+    Rows of a sheet that is already in memory (a store snapshot).
+    """
+
+    def __init__(self, df, chunk_rows: int = 5000):
+        self._df = df
+        self._chunk_rows = chunk_rows
+
+    def rows(self):
+        df = self._df
+        for start in range(0, len(df), self._chunk_rows):
+            chunk = df.iloc[start:start + self._chunk_rows]
+            yield from chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+
+    def close(self):
+        pass
+
+
+def _coerce(value: str) -> Any:
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def open_frame_stream(df):
+    """
+    Same return value as open_row_stream, over a loaded DataFrame.
+    """
+    source = _FrameSource(df)
+    return source, tuple(df.columns), source.rows(), len(df)
+
+
+def open_row_stream(path: Path, sheet_name: Optional[str] = None):
+    """
+    Open a sheet (xlsx/xlsm in read-only mode, or a CSV file) for streaming.
+
+    Returns (source, header, rows iterator, estimated data rows or None);
+    the caller must close the source.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        source = _CsvSource(path)
+        rows = source.rows()
+        return source, next(rows, ()), rows, None
+    if suffix not in (".xlsx", ".xlsm"):
+        raise ValueError(f"Streaming is supported for xlsx, xlsm and csv files, not '{suffix}'")
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name is None:
+            ws = wb.worksheets[0]
+        elif sheet_name in wb.sheetnames:
+            ws = wb[sheet_name]
+        else:
+            raise ValueError(f"Sheet '{sheet_name}' not found. Available: {wb.sheetnames}")
+
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        total = ws.max_row - 1 if ws.max_row else None
+        return wb, header, rows, total
+    except Exception:
+        wb.close()
+        raise
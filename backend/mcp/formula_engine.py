@@ -0,0 +1,1123 @@
+# backend/mcp/formula_engine.py
+"""
+Excel formula evaluation for workbooks held as DataFrames.
+
+Formulas are parsed once per workbook into ASTs plus a reverse dependency
+index (cell -> formulas reading it). After an edit only the formulas
+downstream of the edited cells are re-evaluated, in dependency order, so
+recalculation cost follows the edit's fan-out rather than workbook size.
+
+Cells are (sheet, row, col), 0-based sheet coordinates: row 0 is the
+header row, so DataFrame row i is sheet row i + 1 (Excel row i + 2).
+"""
+import math
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import date, datetime
+from numbers import Number
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+Cell = Tuple[str, int, int]
+
+MAX_ROWS = 1_048_576
+
+# Ranges up to this many cells are indexed cell by cell; larger ones
+# (whole columns, long SUMs) are kept per formula and checked on lookup
+EXPAND_LIMIT = 4096
+
+ERROR_CODES = ("#DIV/0!", "#N/A", "#NAME?", "#NULL!", "#NUM!", "#REF!", "#VALUE!", "#CYCLE!")
+
+
+class FormulaError(Exception):
+    """
+    An Excel error value (#DIV/0!, #REF!, ...) raised during evaluation.
+    """
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+# ------------------------------
+# Parsing
+# ------------------------------
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<str>"(?:[^"]|"")*")
+  | (?P<err>\#(?:DIV/0!|N/A|NAME\?|NULL!|NUM!|REF!|VALUE!))
+  | (?P<func>[A-Za-z_][\w.]*(?=\s*\())
+  | (?P<ref>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?
+        (?:\$?[A-Za-z]{1,3}\$?\d+(?::\$?[A-Za-z]{1,3}\$?\d+)?|\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3})
+        (?![\w(!]))
+  | (?P<bool>(?:TRUE|FALSE)\b)
+  | (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%(),;])
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+_CELL_RE = re.compile(r"\$?([A-Za-z]{1,3})\$?(\d*)")
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            raise FormulaError("#NAME?")
+        pos = m.end()
+        if m.lastgroup != "ws":
+            tokens.append((m.lastgroup, m.group()))
+    return tokens
+
+
+def _column_index(letters: str) -> int:
+    """
+    1-based index of column letters (A -> 1, AA -> 27); saves importing
+    openpyxl just for this.
+    """
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def _parse_cell(text: str) -> Tuple[Optional[int], int]:
+    m = _CELL_RE.fullmatch(text)
+    col = _column_index(m.group(1).upper()) - 1
+    row = int(m.group(2)) - 1 if m.group(2) else None
+    return row, col
+
+
+def _parse_ref(text: str, sheet: str) -> tuple:
+    if "!" in text:
+        prefix, text = text.rsplit("!", 1)
+        sheet = prefix[1:-1].replace("''", "'") if prefix.startswith("'") else prefix
+
+    cells = [_parse_cell(p) for p in text.split(":")]
+    if len(cells) == 1:
+        row, col = cells[0]
+        return ("ref", sheet, row, col)
+
+    (r1, c1), (r2, c2) = cells
+    if r1 is None:
+        r1, r2 = 0, MAX_ROWS - 1
+    return ("range", sheet, min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2))
+
+
+class _Parser:
+    """
+    Recursive descent over Excel's operator precedence:
+    comparison < & < + - < * / < ^ < unary - < %.
+    """
+
+    def __init__(self, text: str, sheet: str):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.sheet = sheet
+
+    def parse(self) -> tuple:
+        node = self._comparison()
+        if self.pos != len(self.tokens):
+            raise FormulaError("#NAME?")
+        return node
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self) -> Tuple[Optional[str], Optional[str]]:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, op: str):
+        if self._take() != ("op", op):
+            raise FormulaError("#NAME?")
+
+    def _binary(self, ops: Tuple[str, ...], operand: Callable[[], tuple]) -> tuple:
+        node = operand()
+        while self._peek()[0] == "op" and self._peek()[1] in ops:
+            op = self._take()[1]
+            node = ("bin", op, node, operand())
+        return node
+
+    def _comparison(self):
+        return self._binary(("=", "<>", "<", ">", "<=", ">="), self._concat)
+
+    def _concat(self):
+        return self._binary(("&",), self._additive)
+
+    def _additive(self):
+        return self._binary(("+", "-"), self._term)
+
+    def _term(self):
+        return self._binary(("*", "/"), self._power)
+
+    def _power(self):
+        return self._binary(("^",), self._unary)
+
+    def _unary(self):
+        if self._peek() in (("op", "-"), ("op", "+")):
+            op = self._take()[1]
+            operand = self._unary()
+            return ("neg", operand) if op == "-" else operand
+
+        node = self._primary()
+        while self._peek() == ("op", "%"):
+            self._take()
+            node = ("bin", "/", node, ("num", 100))
+        return node
+
+    def _primary(self):
+        kind, value = self._take()
+        if kind == "num":
+            return ("num", int(value) if value.isdigit() else float(value))
+        if kind == "str":
+            return ("str", value[1:-1].replace('""', '"'))
+        if kind == "bool":
+            return ("bool", value.upper() == "TRUE")
+        if kind == "err":
+            return ("err", value.upper())
+        if kind == "ref":
+            return _parse_ref(value, self.sheet)
+        if kind == "func":
+            return self._call(value.upper().replace("_XLFN.", ""))
+        if (kind, value) == ("op", "("):
+            node = self._comparison()
+            self._expect(")")
+            return node
+        raise FormulaError("#NAME?")
+
+    def _call(self, name: str):
+        self._expect("(")
+        args = []
+        if self._peek() != ("op", ")"):
+            while True:
+                if self._peek()[1] in (",", ";", ")"):
+                    args.append(("blank",))
+                else:
+                    args.append(self._comparison())
+                if self._peek()[1] not in (",", ";"):
+                    break
+                self._take()
+        self._expect(")")
+        return ("call", name, args)
+
+
+def _references(node: tuple) -> Iterator[tuple]:
+    kind = node[0]
+    if kind in ("ref", "range"):
+        yield node
+    elif kind == "bin":
+        yield from _references(node[2])
+        yield from _references(node[3])
+    elif kind == "neg":
+        yield from _references(node[1])
+    elif kind == "call":
+        for arg in node[2]:
+            yield from _references(arg)
+
+
+# ------------------------------
+# Values and coercion
+# ------------------------------
+
+_EPOCH = datetime(1899, 12, 30)
+
+
+def _py(value: Any) -> Any:
+    """
+    DataFrame cell -> plain Python value, empty cells as None.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        return value
+    return value.item() if hasattr(value, "item") else value
+
+
+def _check(value: Any) -> Any:
+    if isinstance(value, str) and value in ERROR_CODES:
+        raise FormulaError(value)
+    return value
+
+
+def _tidy(value: Any) -> Any:
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise FormulaError("#NUM!")
+        if value.is_integer() and abs(value) < 1e15:
+            return int(value)
+    return value
+
+
+def _num(value: Any) -> float:
+    _check(value)
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, Number):
+        return value
+    if isinstance(value, datetime):
+        return (value - _EPOCH).total_seconds() / 86400
+    if isinstance(value, date):
+        return (value - _EPOCH.date()).days
+    if isinstance(value, str):
+        try:
+            return _tidy(float(value.strip()))
+        except ValueError:
+            pass
+    raise FormulaError("#VALUE!")
+
+
+def _text(value: Any) -> str:
+    _check(value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(_tidy(value))
+
+
+def _bool(value: Any) -> bool:
+    _check(value)
+    if value is None:
+        return False
+    if isinstance(value, str):
+        if value.upper() in ("TRUE", "FALSE"):
+            return value.upper() == "TRUE"
+        raise FormulaError("#VALUE!")
+    return bool(_num(value))
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (Number, date)) and not isinstance(value, bool)
+
+
+def _compare(a: Any, b: Any) -> int:
+    """
+    Excel ordering: numbers < text < booleans, text case-insensitive,
+    empty equal to 0, "" or FALSE depending on the other side.
+    """
+    _check(a)
+    _check(b)
+    if a is None:
+        a = "" if isinstance(b, str) else False if isinstance(b, bool) else 0
+    if b is None:
+        b = "" if isinstance(a, str) else False if isinstance(a, bool) else 0
+
+    def rank(v):
+        return 2 if isinstance(v, bool) else 1 if isinstance(v, str) else 0
+
+    ra, rb = rank(a), rank(b)
+    if ra != rb:
+        return (ra > rb) - (ra < rb)
+    if ra == 1:
+        a, b = a.casefold(), b.casefold()
+    elif ra == 0:
+        a, b = _num(a), _num(b)
+    return (a > b) - (a < b)
+
+
+_COMPARISONS = {
+    "=": lambda c: c == 0,
+    "<>": lambda c: c != 0,
+    "<": lambda c: c < 0,
+    ">": lambda c: c > 0,
+    "<=": lambda c: c <= 0,
+    ">=": lambda c: c >= 0,
+}
+
+
+def _binary(op: str, a: Any, b: Any) -> Any:
+    if op == "&":
+        return _text(a) + _text(b)
+    if op in _COMPARISONS:
+        return _COMPARISONS[op](_compare(a, b))
+
+    x, y = _num(a), _num(b)
+    if op == "+":
+        return _tidy(x + y)
+    if op == "-":
+        return _tidy(x - y)
+    if op == "*":
+        return _tidy(x * y)
+    if op == "/":
+        if y == 0:
+            raise FormulaError("#DIV/0!")
+        return _tidy(x / y)
+    try:
+        result = x ** y
+    except (OverflowError, ZeroDivisionError):
+        raise FormulaError("#NUM!")
+    if isinstance(result, complex):
+        raise FormulaError("#NUM!")
+    return _tidy(result)
+
+
+class _Range:
+    """
+    Evaluated range: rows of plain values, clipped to the sheet's data.
+    """
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: List[List[Any]]):
+        self.rows = rows
+
+    def values(self) -> Iterator[Any]:
+        for row in self.rows:
+            yield from row
+
+
+# ------------------------------
+# Functions
+# ------------------------------
+
+def _flatten(args: Iterable[Any]) -> Iterator[Tuple[Any, bool]]:
+    """
+    (value, came_from_range) for every argument value.
+    """
+    for arg in args:
+        if isinstance(arg, _Range):
+            for v in arg.values():
+                yield v, True
+        else:
+            yield arg, False
+
+
+def _numbers(args: Iterable[Any]) -> List[float]:
+    """
+    Numbers of a SUM-like call: range cells that are not numbers are
+    skipped, direct arguments are coerced.
+    """
+    out = []
+    for value, in_range in _flatten(args):
+        _check(value)
+        if in_range:
+            if _is_number(value):
+                out.append(_num(value))
+        elif value is not None:
+            out.append(_num(value))
+    return out
+
+
+def _count(*args) -> int:
+    n = 0
+    for value, in_range in _flatten(args):
+        if _is_number(value):
+            n += 1
+        elif not in_range and value is not None:
+            try:
+                _num(value)
+                n += 1
+            except FormulaError:
+                pass
+    return n
+
+
+def _average(*args):
+    values = _numbers(args)
+    if not values:
+        raise FormulaError("#DIV/0!")
+    return _tidy(math.fsum(values) / len(values))
+
+
+def _round(value, digits=0, mode="half"):
+    x, digits = _num(value), int(_num(digits))
+    factor = 10.0 ** digits
+    # Scrub binary noise first so 2.675 rounds like Excel does
+    scaled = round(abs(x) * factor, 9)
+    if mode == "half":
+        rounded = math.floor(scaled + 0.5)
+    elif mode == "up":
+        rounded = math.ceil(scaled)
+    else:
+        rounded = math.floor(scaled)
+    return _tidy(math.copysign(rounded / factor, x) if rounded else 0.0)
+
+
+def _mod(a, b):
+    x, y = _num(a), _num(b)
+    if y == 0:
+        raise FormulaError("#DIV/0!")
+    return _tidy(x - y * math.floor(x / y))
+
+
+def _sqrt(value):
+    x = _num(value)
+    if x < 0:
+        raise FormulaError("#NUM!")
+    return _tidy(math.sqrt(x))
+
+
+def _concat(*args) -> str:
+    return "".join(_text(v) for v, _ in _flatten(args))
+
+
+def _mid(value, start, length):
+    start, length = int(_num(start)), int(_num(length))
+    if start < 1 or length < 0:
+        raise FormulaError("#VALUE!")
+    return _text(value)[start - 1 : start - 1 + length]
+
+
+def _logical(args, combine):
+    values = [
+        _bool(v) for v, in_range in _flatten(args)
+        if not (in_range and (v is None or isinstance(v, str)))
+    ]
+    if not values:
+        raise FormulaError("#VALUE!")
+    return combine(values)
+
+
+_CRITERIA_RE = re.compile(r"(<=|>=|<>|<|>|=)?(.*)", re.S)
+
+
+def _criteria(criteria: Any) -> Callable[[Any], bool]:
+    """
+    SUMIF/COUNTIF criteria: a value, or text like ">10", "<>done", "A*".
+    """
+    if not isinstance(criteria, str):
+        return lambda v: v is not None and _compare(v, criteria) == 0
+
+    op, operand = _CRITERIA_RE.fullmatch(criteria).groups()
+    op = op or "="
+    try:
+        target: Any = _tidy(float(operand))
+    except ValueError:
+        target = operand
+
+    if isinstance(target, str) and op in ("=", "<>") and any(ch in target for ch in "*?"):
+        pattern = re.compile(
+            "".join(".*" if ch == "*" else "." if ch == "?" else re.escape(ch) for ch in target),
+            re.IGNORECASE | re.S,
+        )
+        hit = lambda v: isinstance(v, str) and pattern.fullmatch(v) is not None
+        return hit if op == "=" else (lambda v: not hit(v))
+
+    test = _COMPARISONS[op]
+
+    def matches(v):
+        if target == "":
+            return (v is None or v == "") == (op == "=")
+        if v is None or isinstance(target, str) != isinstance(v, str) or isinstance(v, bool):
+            return op == "<>"
+        try:
+            return test(_compare(v, target))
+        except FormulaError:
+            return False
+
+    return matches
+
+
+def _conditional(rng, criteria, values=None) -> List[float]:
+    if not isinstance(rng, _Range):
+        raise FormulaError("#VALUE!")
+    target = values if isinstance(values, _Range) else rng
+    match = _criteria(criteria)
+    out = []
+    for crit_row, value_row in zip(rng.rows, target.rows):
+        for c, v in zip(crit_row, value_row):
+            if match(c) and _is_number(v):
+                out.append(_num(v))
+    return out
+
+
+def _sumif(rng, criteria, values=None):
+    return _tidy(math.fsum(_conditional(rng, criteria, values)))
+
+
+def _countif(rng, criteria):
+    if not isinstance(rng, _Range):
+        raise FormulaError("#VALUE!")
+    match = _criteria(criteria)
+    return sum(1 for v in rng.values() if match(v))
+
+
+def _averageif(rng, criteria, values=None):
+    matched = _conditional(rng, criteria, values)
+    if not matched:
+        raise FormulaError("#DIV/0!")
+    return _tidy(math.fsum(matched) / len(matched))
+
+
+def _vlookup(value, table, col, approximate=True):
+    if not isinstance(table, _Range):
+        raise FormulaError("#VALUE!")
+    col = int(_num(col))
+    if col < 1:
+        raise FormulaError("#VALUE!")
+    if any(len(row) < col for row in table.rows):
+        raise FormulaError("#REF!")
+
+    # Approximate match: last row whose key is <= value (keys sorted)
+    approximate = _bool(approximate)
+    found = None
+    for row in table.rows:
+        if row[0] is None:
+            continue
+        order = _compare(row[0], value)
+        if not approximate:
+            if order == 0:
+                found = row
+                break
+        elif order > 0:
+            break
+        else:
+            found = row
+    if found is None:
+        raise FormulaError("#N/A")
+    result = _check(found[col - 1])
+    return 0 if result is None else result
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "SUM": lambda *a: _tidy(math.fsum(_numbers(a))),
+    "PRODUCT": lambda *a: _tidy(math.prod(_numbers(a))),
+    "AVERAGE": _average,
+    "MIN": lambda *a: min(_numbers(a), default=0),
+    "MAX": lambda *a: max(_numbers(a), default=0),
+    "COUNT": _count,
+    "COUNTA": lambda *a: sum(1 for v, _ in _flatten(a) if v is not None and v != ""),
+    "COUNTBLANK": lambda *a: sum(1 for v, _ in _flatten(a) if v is None or v == ""),
+    "ROUND": lambda v, d=0: _round(v, d, "half"),
+    "ROUNDUP": lambda v, d=0: _round(v, d, "up"),
+    "ROUNDDOWN": lambda v, d=0: _round(v, d, "down"),
+    "INT": lambda v: math.floor(_num(v)),
+    "ABS": lambda v: _tidy(abs(_num(v))),
+    "MOD": _mod,
+    "POWER": lambda a, b: _binary("^", a, b),
+    "SQRT": _sqrt,
+    "CONCAT": _concat,
+    "CONCATENATE": _concat,
+    "LEN": lambda v: len(_text(v)),
+    "UPPER": lambda v: _text(v).upper(),
+    "LOWER": lambda v: _text(v).lower(),
+    "TRIM": lambda v: " ".join(_text(v).split()),
+    "LEFT": lambda v, n=1: _text(v)[: int(_num(n))],
+    "RIGHT": lambda v, n=1: _text(v)[-int(_num(n)):] if int(_num(n)) else "",
+    "MID": _mid,
+    "AND": lambda *a: _logical(a, all),
+    "OR": lambda *a: _logical(a, any),
+    "NOT": lambda v: not _bool(v),
+    "SUMIF": _sumif,
+    "COUNTIF": _countif,
+    "AVERAGEIF": _averageif,
+    "VLOOKUP": _vlookup,
+    "ISBLANK": lambda v: v is None,
+    "ISNUMBER": lambda v: _is_number(v),
+    "ISTEXT": lambda v: isinstance(v, str),
+}
+
+
+def _if(ev: "_Evaluator", args: List[tuple]):
+    if not 1 <= len(args) <= 3:
+        raise FormulaError("#VALUE!")
+    if _bool(ev.scalar(args[0])):
+        return ev.scalar(args[1]) if len(args) > 1 else True
+    return ev.scalar(args[2]) if len(args) > 2 else False
+
+
+def _iferror(ev: "_Evaluator", args: List[tuple]):
+    if len(args) != 2:
+        raise FormulaError("#VALUE!")
+    try:
+        return ev.scalar(args[0])
+    except FormulaError:
+        return ev.scalar(args[1])
+
+
+def _iserror(ev: "_Evaluator", args: List[tuple]):
+    if len(args) != 1:
+        raise FormulaError("#VALUE!")
+    try:
+        ev.scalar(args[0])
+        return False
+    except FormulaError:
+        return True
+
+
+# Functions that decide themselves which arguments to evaluate
+_LAZY: Dict[str, Callable[["_Evaluator", List[tuple]], Any]] = {
+    "IF": _if,
+    "IFERROR": _iferror,
+    "ISERROR": _iserror,
+}
+
+
+# ------------------------------
+# Evaluation
+# ------------------------------
+
+class _Evaluator:
+    """
+    Reads cells of `frames` through per-column Python lists (pandas scalar
+    access costs tens of microseconds a cell), built on first use and kept
+    in step with write().
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        self._names = {name.casefold(): name for name in frames}
+        self._columns: Dict[Tuple[str, int], List[Any]] = {}
+
+    def _frame(self, sheet: str) -> Tuple[str, pd.DataFrame]:
+        name = self._names.get(sheet.casefold())
+        if name is None:
+            raise FormulaError("#REF!")
+        return name, self.frames[name]
+
+    def _column(self, name: str, df: pd.DataFrame, col: int) -> List[Any]:
+        values = self._columns.get((name, col))
+        if values is None:
+            values = self._columns[(name, col)] = df.iloc[:, col].tolist()
+        return values
+
+    def cell(self, sheet: str, row: int, col: int) -> Any:
+        name, df = self._frame(sheet)
+        if col >= df.shape[1]:
+            return None
+        if row == 0:
+            return _py(df.columns[col])
+        if row > len(df):
+            return None
+        return _py(self._column(name, df, col)[row - 1])
+
+    def range(self, sheet: str, r1: int, c1: int, r2: int, c2: int) -> _Range:
+        name, df = self._frame(sheet)
+        c2 = min(c2, df.shape[1] - 1)
+        rows: List[List[Any]] = []
+        if c1 > c2:
+            return _Range(rows)
+        if r1 == 0:
+            rows.append([_py(v) for v in df.columns[c1 : c2 + 1]])
+            r1 = 1
+        columns = [self._column(name, df, c)[r1 - 1 : r2] for c in range(c1, c2 + 1)]
+        rows.extend([_py(v) for v in row] for row in zip(*columns))
+        return _Range(rows)
+
+    def write(self, cell: Cell, value: Any):
+        name, row, col = cell
+        set_cell(self.frames[name], row - 1, col, value)
+        values = self._columns.get((name, col))
+        if values is not None:
+            values[row - 1] = value
+
+    def eval(self, node: tuple) -> Any:
+        kind = node[0]
+        if kind in ("num", "str", "bool"):
+            return node[1]
+        if kind == "blank":
+            return None
+        if kind == "err":
+            raise FormulaError(node[1])
+        if kind == "ref":
+            return _check(self.cell(node[1], node[2], node[3]))
+        if kind == "range":
+            return self.range(*node[1:])
+        if kind == "neg":
+            return _tidy(-_num(self.scalar(node[1])))
+        if kind == "bin":
+            return _binary(node[1], self.scalar(node[2]), self.scalar(node[3]))
+
+        name, args = node[1], node[2]
+        if name in _LAZY:
+            return _LAZY[name](self, args)
+        fn = FUNCTIONS.get(name)
+        if fn is None:
+            raise FormulaError("#NAME?")
+        try:
+            return fn(*[self.eval(a) for a in args])
+        except TypeError:
+            # Wrong number of arguments
+            raise FormulaError("#VALUE!")
+
+    def scalar(self, node: tuple) -> Any:
+        value = self.eval(node)
+        if isinstance(value, _Range):
+            if len(value.rows) == 1 and len(value.rows[0]) == 1:
+                return _check(value.rows[0][0])
+            raise FormulaError("#VALUE!")
+        return value
+
+
+# ------------------------------
+# Dependency graph
+# ------------------------------
+
+def _key(sheet: str, row: int, col: int) -> Cell:
+    return (sheet.casefold(), row, col)
+
+
+def _size(rng: tuple) -> int:
+    return (rng[4] - rng[2] + 1) * (rng[5] - rng[3] + 1)
+
+
+def _contains(rng: tuple, key: Cell) -> bool:
+    return rng[1].casefold() == key[0] and rng[2] <= key[1] <= rng[4] and rng[3] <= key[2] <= rng[5]
+
+
+def _calls(node: tuple) -> Iterator[str]:
+    kind = node[0]
+    if kind == "call":
+        yield node[1]
+        for arg in node[2]:
+            yield from _calls(arg)
+    elif kind == "bin":
+        yield from _calls(node[2])
+        yield from _calls(node[3])
+    elif kind == "neg":
+        yield from _calls(node[1])
+
+
+class _Formula:
+    """
+    Parsed formula. `supported` is False when it uses syntax (named ranges,
+    structured references) or functions this engine does not implement.
+    """
+
+    __slots__ = ("text", "ast", "refs", "supported")
+
+    def __init__(self, text: str, sheet: str):
+        self.text = text
+        self.ast, self.refs, self.supported = None, [], False
+        try:
+            self.ast = _Parser(text.lstrip("="), sheet).parse()
+        except FormulaError:
+            return
+        self.refs = list(_references(self.ast))
+        self.supported = all(name in FUNCTIONS or name in _LAZY for name in _calls(self.ast))
+
+
+class FormulaGraph:
+    """
+    The formulas of one workbook and who depends on what.
+
+    Reads (and not formulas) are the common case, so the graph is only
+    consulted by the write path: `downstream()` finds the formulas an edit
+    affects, `recalculate()` evaluates them in dependency order.
+    """
+
+    def __init__(self, formulas: Optional[Dict[Cell, str]] = None):
+        self._formulas: Dict[Cell, _Formula] = {}
+        # casefolded cell -> formula cells reading it
+        self._dependents: Dict[Cell, Set[Cell]] = {}
+        # formula cell -> its ranges too large to index per cell
+        self._large: Dict[Cell, List[tuple]] = {}
+        for cell, text in (formulas or {}).items():
+            self.set_formula(cell, text)
+
+    def __len__(self) -> int:
+        return len(self._formulas)
+
+    def cells(self) -> List[Cell]:
+        return list(self._formulas)
+
+    def formula(self, cell: Cell) -> Optional[str]:
+        f = self._formulas.get(cell)
+        return f.text if f else None
+
+    def by_sheet(self) -> Dict[str, Dict[Tuple[int, int], str]]:
+        out: Dict[str, Dict[Tuple[int, int], str]] = {}
+        for (sheet, row, col), f in self._formulas.items():
+            out.setdefault(sheet, {})[(row, col)] = f.text
+        return out
+
+    def set_formula(self, cell: Cell, text: Optional[str]) -> Optional[str]:
+        """
+        Set (or with None, remove) the formula of `cell`. Returns the
+        previous formula so a failed commit can put it back. A formula that
+        does not parse raises before the graph is touched.
+        """
+        f = _Formula("=" + text.lstrip("="), cell[0]) if text else None
+        old = self._formulas.pop(cell, None)
+        if old is not None:
+            self._index(cell, old, add=False)
+        if f is not None:
+            self._formulas[cell] = f
+            self._index(cell, f, add=True)
+        return old.text if old else None
+
+    def _index(self, cell: Cell, f: _Formula, add: bool):
+        for ref in f.refs:
+            if ref[0] == "ref":
+                keys = [_key(ref[1], ref[2], ref[3])]
+            elif _size(ref) <= EXPAND_LIMIT:
+                keys = [
+                    _key(ref[1], r, c)
+                    for r in range(ref[2], ref[4] + 1)
+                    for c in range(ref[3], ref[5] + 1)
+                ]
+            else:
+                if add:
+                    self._large.setdefault(cell, []).append(ref)
+                else:
+                    self._large.pop(cell, None)
+                continue
+
+            for key in keys:
+                if add:
+                    self._dependents.setdefault(key, set()).add(cell)
+                else:
+                    deps = self._dependents.get(key)
+                    if deps is not None:
+                        deps.discard(cell)
+                        if not deps:
+                            del self._dependents[key]
+
+    def _direct_dependents(self, cell: Cell) -> Iterator[Cell]:
+        key = _key(*cell)
+        yield from self._dependents.get(key, ())
+        for formula_cell, ranges in self._large.items():
+            if any(_contains(rng, key) for rng in ranges):
+                yield formula_cell
+
+    def downstream(self, changed: Iterable[Cell]) -> Set[Cell]:
+        """
+        Formula cells among `changed` plus every formula that (transitively)
+        reads one of them.
+        """
+        dirty: Set[Cell] = set()
+        queue = deque()
+        for cell in changed:
+            if cell in self._formulas:
+                dirty.add(cell)
+            queue.append(cell)
+
+        while queue:
+            for dep in self._direct_dependents(queue.popleft()):
+                if dep not in dirty:
+                    dirty.add(dep)
+                    queue.append(dep)
+        return dirty
+
+    def _precedents(self, cell: Cell, dirty: Dict[Cell, Cell]) -> Iterator[Cell]:
+        """
+        Cells of `dirty` (casefolded key -> cell) that the formula reads.
+        """
+        for ref in self._formulas[cell].refs:
+            if ref[0] == "ref":
+                hit = dirty.get(_key(ref[1], ref[2], ref[3]))
+                if hit is not None:
+                    yield hit
+            elif _size(ref) <= len(dirty):
+                for r in range(ref[2], ref[4] + 1):
+                    for c in range(ref[3], ref[5] + 1):
+                        hit = dirty.get(_key(ref[1], r, c))
+                        if hit is not None:
+                            yield hit
+            else:
+                yield from (c for k, c in dirty.items() if _contains(ref, k))
+
+    def _order(self, cells: Iterable[Cell]) -> Tuple[List[Cell], Set[Cell]]:
+        """
+        Topological order of `cells` (precedents first) and the cells that
+        sit on a reference cycle. Iterative DFS, so long chains are fine.
+        """
+        dirty = {_key(*c): c for c in cells}
+        order: List[Cell] = []
+        cyclic: Set[Cell] = set()
+        state: Dict[Cell, bool] = {}  # False: on the stack, True: done
+
+        for start in dirty.values():
+            if start in state:
+                continue
+            state[start] = False
+            stack = [(start, self._precedents(start, dirty))]
+            while stack:
+                node, pending = stack[-1]
+                nxt = next(pending, None)
+                if nxt is None:
+                    stack.pop()
+                    state[node] = True
+                    order.append(node)
+                elif nxt not in state:
+                    state[nxt] = False
+                    stack.append((nxt, self._precedents(nxt, dirty)))
+                elif state[nxt] is False:
+                    on_stack = [n for n, _ in stack]
+                    cyclic.update(on_stack[on_stack.index(nxt):])
+        return order, cyclic
+
+    def _evaluate(self, ev: _Evaluator, cell: Cell) -> Any:
+        f = self._formulas[cell]
+        if not f.supported:
+            # Keep the value Excel cached, if the file had one
+            current = ev.cell(*cell)
+            return current if current is not None and current != f.text else "#NAME?"
+        try:
+            value = ev.scalar(f.ast)
+        except FormulaError as e:
+            return e.code
+        except (ArithmeticError, ValueError, TypeError):
+            return "#VALUE!"
+        return 0 if value is None else value
+
+    def recalculate(self, frames: Dict[str, pd.DataFrame], cells: Optional[Iterable[Cell]] = None) -> Dict[Cell, Any]:
+        """
+        Evaluate `cells` (formula cells, default all) in dependency order
+        and write the results into `frames`, which are modified in place.
+        Errors become their Excel code ("#DIV/0!"), cycles "#CYCLE!";
+        formulas the engine cannot evaluate keep their cached value.
+        Returns {cell: value}.
+        """
+        order, cyclic = self._order(self._formulas if cells is None else cells)
+        ev = _Evaluator(frames)
+        results: Dict[Cell, Any] = {}
+        for cell in order:
+            df = frames.get(cell[0])
+            if df is None or not 1 <= cell[1] <= len(df) or cell[2] >= df.shape[1]:
+                continue
+            value = "#CYCLE!" if cell in cyclic else self._evaluate(ev, cell)
+            ev.write(cell, value)
+            results[cell] = value
+        return results
+
+
+def set_cell(df: pd.DataFrame, row: int, col: int, value: Any):
+    """
+    df.iat assignment that widens the column to object when pandas refuses
+    the value's type.
+    """
+    try:
+        df.iat[row, col] = value
+    except (TypeError, ValueError):
+        df[df.columns[col]] = df.iloc[:, col].astype(object)
+        df.iat[row, col] = value
+
+
+# ------------------------------
+# Loading
+# ------------------------------
+
+def _has_formula(zf: zipfile.ZipFile, name: str) -> bool:
+    with zf.open(name) as fh:
+        tail = b""
+        while True:
+            chunk = fh.read(1 << 20)
+            if not chunk:
+                return False
+            buf = tail + chunk
+            if b"<f>" in buf or b"<f " in buf:
+                return True
+            tail = buf[-3:]
+
+
+def has_formulas(path: Path) -> bool:
+    """
+    Whether any sheet XML of an xlsx/xlsm workbook holds an <f> element,
+    without parsing cells.
+    """
+    if path.suffix.lower() not in (".xlsx", ".xlsm"):
+        return False
+    with zipfile.ZipFile(path) as zf:
+        sheets = [n for n in zf.namelist() if n.startswith("xl/worksheets/") and n.endswith(".xml")]
+        return any(_has_formula(zf, n) for n in sheets)
+
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _sheet_part(zf: zipfile.ZipFile, sheet: Optional[str]) -> Optional[str]:
+    """
+    Zip member of worksheet `sheet` (default the first worksheet).
+    """
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target", "") for r in rels.iter(f"{_NS_PKG_REL}Relationship")}
+    for el in ET.fromstring(zf.read("xl/workbook.xml")).iter(f"{_NS_MAIN}sheet"):
+        target = targets.get(el.get(f"{_NS_REL}id"), "")
+        if "worksheets/" not in target or (sheet is not None and el.get("name") != sheet):
+            continue
+        return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    return None
+
+
+def formula_columns(path: Path, sheet: Optional[str] = None) -> Set[int]:
+    """
+    0-based columns of `sheet` (default the first) holding a formula cell,
+    from that sheet's XML alone. Lets a caller stream the file's cached
+    values when the columns it needs have no formulas.
+    """
+    if path.suffix.lower() not in (".xlsx", ".xlsm"):
+        return set()
+    with zipfile.ZipFile(path) as zf:
+        part = _sheet_part(zf, sheet)
+        if part is None or not _has_formula(zf, part):
+            return set()
+
+        columns: Set[int] = set()
+        col = -1
+        with zf.open(part) as fh:
+            for _, el in ET.iterparse(fh):
+                if el.tag == f"{_NS_MAIN}c":
+                    ref = el.get("r")
+                    col = _column_index(ref.rstrip("0123456789")) - 1 if ref else col + 1
+                    if el.find(f"{_NS_MAIN}f") is not None:
+                        columns.add(col)
+                    el.clear()
+                elif el.tag == f"{_NS_MAIN}row":
+                    col = -1
+                    el.clear()
+        return columns
+
+
+def load_formulas(path: Path) -> Dict[Cell, str]:
+    """
+    Formula text of every formula cell of an xlsx/xlsm workbook. The sheet
+    XML is scanned for <f> elements first so formula-free workbooks are
+    not parsed a second time.
+    """
+    if not has_formulas(path):
+        return {}
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        formulas = {}
+        for ws in wb.worksheets:
+            for row in ws.iter_rows():
+                for cell in row:
+                    if cell.data_type == "f" and isinstance(cell.value, str):
+                        formulas[(ws.title, cell.row - 1, cell.column - 1)] = cell.value
+        return formulas
+    finally:
+        wb.close()
+
+
+def build_graph(frames: Dict[str, pd.DataFrame], formulas: Dict[Cell, str]) -> Optional[FormulaGraph]:
+    """
+    Graph of `formulas` with every formula evaluated into `frames`, or None
+    for a workbook without formulas. Sheets are padded with empty rows when
+    pandas dropped trailing rows holding only (uncached) formulas; formulas
+    in the header row or outside the read columns are ignored.
+    """
+    kept = {}
+    for (sheet, row, col), text in formulas.items():
+        df = frames.get(sheet)
+        if df is None or row < 1 or col >= df.shape[1]:
+            continue
+        if row > len(df):
+            frames[sheet] = df = df.reindex(range(row))
+        kept[(sheet, row, col)] = text
+
+    if not kept:
+        return None
+    graph = FormulaGraph(kept)
+    graph.recalculate(frames)
+    return graph
@@ -1,86 +1,321 @@
 # backend/mcp/mcp_client.py
 import json
+import os
 import sys
 import asyncio
-from typing import Any, Optional, Dict, List
+import time
+from typing import Any, Awaitable, Callable, Optional, Dict, List
 from contextlib import AsyncExitStack
+from urllib.parse import quote
 
+import anyio
+import httpx
 from pydantic import AnyUrl
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import get_default_environment, stdio_client
+from mcp.client.streamable_http import streamable_http_client
 from mcp import ClientSession, StdioServerParameters, types
+from mcp.shared.exceptions import McpError
 
 from backend.utils.logger import get_logger
+from backend.utils.metrics import Counter, Gauge
+from backend.utils.tracing import span, trace_meta
 
 logger = get_logger(__name__)
 
+MCP_STARTUP_SECONDS = Gauge(
+    "excel_mcp_startup_seconds",
+    "Phases of the last Excel MCP connect (spawn, initialize, first_tool_call)",
+    ("phase",),
+)
+MCP_RESPAWNS = Counter(
+    "excel_mcp_respawns_total",
+    "Reconnects to the Excel MCP server, by whether a warm standby took over",
+    ("standby",),
+)
+
+
+class _Connection:
+    """
+    One initialized MCP session. Its transport contexts are entered and
+    exited inside a task of its own, so a connection can be opened in the
+    background (standby) and closed from whichever task replaces it.
+    """
+
+    def __init__(self, open_session: Callable[[AsyncExitStack], Awaitable[ClientSession]]):
+        self.session: Optional[ClientSession] = None
+        # Seconds per phase: spawn (transport up), initialize
+        self.phases: Dict[str, float] = {}
+        self._ready = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._run(open_session))
+
+    async def _run(self, open_session):
+        try:
+            async with AsyncExitStack() as stack:
+                start = time.perf_counter()
+                session = await open_session(stack)
+                self.phases["spawn"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                await session.initialize()
+                self.phases["initialize"] = time.perf_counter() - start
+
+                self.session = session
+                self._ready.set_result(session)
+                await self._closing.wait()
+        except asyncio.CancelledError:
+            self._ready.cancel()
+            raise
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            else:
+                logger.warning(f"Excel MCP connection ended: {e!r}")
+        finally:
+            self.session = None
+
+    async def wait(self) -> ClientSession:
+        return await asyncio.shield(self._ready)
+
+    @property
+    def ended(self) -> bool:
+        return self._task.done()
+
+    async def close(self):
+        self._closing.set()
+        if not self._ready.done():
+            self._task.cancel()
+        try:
+            await self._task
+        except BaseException:
+            pass
+        if self._ready.done() and not self._ready.cancelled():
+            self._ready.exception()
+
 
 class MCPExcelClient:
     """
     Wrapper for interacting with the Excel MCP server.
 
     Responsibilities:
-    🔹 Start MCP server via stdio
+    🔹 Start MCP server via stdio, or connect to a shared one over HTTP (`url`)
     🔹 Call tools (read_sheet, append_row, etc)
     🔹 Read structured results
+    🔹 Respawn a dead stdio server, from a warm standby when `standby` is set
     🔹 Handle cleanup safely
     """
 
     def __init__(
         self,
         command: str = "python",
-        args: list[str] = ["backend/mcp/excel_mcp_server.py"],
+        args: list[str] = ["-m", "backend.mcp.excel_mcp_server"],
         env: Optional[dict] = None,
+        url: Optional[str] = None,
+        pool_size: int = 10,
+        standby: bool = False,
+        data_dir: Optional[os.PathLike] = None,
     ):
         self._command = command
         self._args = args
         self._env = env
-
-        self._session: Optional[ClientSession] = None
-        self._exit_stack = AsyncExitStack()
+        # Workbook directory of a stdio server (EXCEL_DATA_DIR); a shared
+        # HTTP server has to be started with the same one
+        self._data_dir = data_dir
+        # Streamable HTTP endpoint (e.g. http://127.0.0.1:8765/mcp) of a
+        # server shared with other backend workers; stdio child when unset
+        self._url = url
+        self._pool_size = pool_size
+        # Keep a second, already initialized stdio server around so a
+        # respawn skips the interpreter start, imports and handshake
+        self._standby_enabled = standby and not url
+
+        self._conn: Optional[_Connection] = None
+        self._standby: Optional[_Connection] = None
+        self._first_call_pending = False
+        self._reconnect_lock = asyncio.Lock()
+        # Replaced connections shutting down in the background
+        self._retiring: set = set()
 
     # ------------------------------
     # Init + Connect
     # ------------------------------
+    def _open(self) -> _Connection:
+        return _Connection(self._connect_http if self._url else self._connect_stdio)
+
     async def connect(self):
+        await self._adopt(self._open())
+        logger.info("Excel MCP connected")
+
+    async def _adopt(self, conn: _Connection):
+        start = time.perf_counter()
+        try:
+            await conn.wait()
+        except BaseException:
+            await conn.close()
+            raise
+
+        # An adopted standby reports the phases it paid in the background
+        for phase, seconds in conn.phases.items():
+            MCP_STARTUP_SECONDS.set(seconds, phase=phase)
+        logger.info(
+            "Excel MCP session ready in %.3fs (%s)",
+            time.perf_counter() - start,
+            ", ".join(f"{k} {v:.3f}s" for k, v in conn.phases.items()),
+        )
+        self._conn = conn
+        self._first_call_pending = True
+
+        if self._standby_enabled and self._standby is None:
+            self._standby = self._open()
+
+    async def reconnect(self, stale: Optional[_Connection] = None):
+        """
+        Replace the current session: the standby server takes over when
+        there is one, otherwise a new server is started and waited for.
+        With `stale`, nothing happens if another caller already replaced it.
+        """
+        async with self._reconnect_lock:
+            if stale is not None and self._conn is not stale:
+                return
+            old, self._conn = self._conn, None
+            standby, self._standby = self._standby, None
+            if standby is not None and standby.ended:
+                await standby.close()
+                standby = None
+
+            MCP_RESPAWNS.inc(standby="hit" if standby is not None else "miss")
+            try:
+                await self._adopt(standby or self._open())
+            finally:
+                # Server shutdown takes a while; don't hold up the new session
+                if old is not None:
+                    task = asyncio.create_task(old.close())
+                    self._retiring.add(task)
+                    task.add_done_callback(self._retiring.discard)
+
+    async def _connect_stdio(self, stack: AsyncExitStack) -> ClientSession:
+        env = self._env
+        if env is None:
+            # Server tuning knobs (EXCEL_*) are read from the environment
+            env = {
+                **get_default_environment(),
+                **{k: v for k, v in os.environ.items() if k.startswith("EXCEL_")},
+            }
+            if self._data_dir is not None:
+                # Absolute, so it does not depend on the server's working directory
+                env["EXCEL_DATA_DIR"] = os.path.abspath(self._data_dir)
+
         server_params = StdioServerParameters(
             command=self._command,
             args=self._args,
-            env=self._env,
+            env=env,
         )
 
         logger.info("Starting Excel MCP server...")
-        _stdio, _write = await self._exit_stack.enter_async_context(
+        _stdio, _write = await stack.enter_async_context(
             stdio_client(server_params)
         )
-        self._session = await self._exit_stack.enter_async_context(
+        return await stack.enter_async_context(
             ClientSession(_stdio, _write)
         )
-        await self._session.initialize()
-        print("Initializing MCP session...")
 
-        logger.info("Excel MCP connected")
+    async def _connect_http(self, stack: AsyncExitStack) -> ClientSession:
+        """
+        One MCP session over a pooled httpx client: concurrent tool calls are
+        separate POSTs multiplexed on up to pool_size kept-alive connections.
+        """
+        logger.info(f"Connecting to Excel MCP server at {self._url}...")
+        http_client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                timeout=httpx.Timeout(30, read=300),
+                limits=httpx.Limits(
+                    max_connections=self._pool_size,
+                    max_keepalive_connections=self._pool_size,
+                    keepalive_expiry=60,
+                ),
+            )
+        )
+        _read, _write, _ = await stack.enter_async_context(
+            streamable_http_client(self._url, http_client=http_client)
+        )
+        return await stack.enter_async_context(
+            ClientSession(_read, _write)
+        )
 
     def session(self) -> ClientSession:
-        if not self._session:
+        if not self._conn or not self._conn.session:
             raise RuntimeError("MCP session not initialized")
-        return self._session
+        return self._conn.session
+
+    async def _live_session(self) -> ClientSession:
+        conn = self._conn
+        if conn is not None and conn.ended and not self._url:
+            logger.warning("Excel MCP server exited; respawning")
+            await self.reconnect(stale=conn)
+        return self.session()
 
     # ------------------------------
     # TOOL WRAPPERS
     # ------------------------------
 
     async def list_tools(self):
-        result = await self.session().list_tools()
+        result = await (await self._live_session()).list_tools()
         return result.tools
 
-    async def call_tool(self, name: str, input_data: dict):
-        result = await self.session().call_tool(name, input_data)
+    async def call_tool(self, name: str, input_data: dict, progress_callback=None):
+        # Trace id travels in request _meta so server-side spans can be correlated
+        with span("mcp_call_tool"):
+            start = time.perf_counter()
+            conn = self._conn
+            try:
+                result = await self._call_tool(name, input_data, progress_callback)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                # The server was gone before the request left: respawn, retry once
+                if self._url:
+                    raise
+                logger.warning(f"Excel MCP server is gone; respawning for '{name}'")
+                await self.reconnect(stale=conn)
+                result = await self._call_tool(name, input_data, progress_callback)
+            except McpError as e:
+                # Died mid-call: the tool may have run, so respawn without retrying
+                if e.error.code == types.CONNECTION_CLOSED and not self._url:
+                    logger.warning("Excel MCP server exited during a call; respawning")
+                    await self.reconnect(stale=conn)
+                raise
+
+        if self._first_call_pending:
+            self._first_call_pending = False
+            MCP_STARTUP_SECONDS.set(time.perf_counter() - start, phase="first_tool_call")
         return result
 
+    async def _call_tool(self, name: str, input_data: dict, progress_callback=None):
+        return await (await self._live_session()).call_tool(
+            name,
+            input_data,
+            progress_callback=progress_callback,
+            meta=trace_meta(),
+        )
+
     # ------------------------------
     # EXCEL-SPECIFIC HELPERS
     # ------------------------------
 
+    @staticmethod
+    def rows(res: types.CallToolResult) -> list:
+        """
+        Items of a list-returning tool's result, which sends one JSON text
+        block per item. Raises RuntimeError on a tool error.
+        """
+        if res.isError:
+            raise RuntimeError(res.content[0].text if res.content else "MCP tool error")
+        return [json.loads(c.text) for c in res.content if isinstance(c, types.TextContent)]
+
+    @staticmethod
+    def _json(res: types.CallToolResult) -> Any:
+        if res.isError:
+            raise RuntimeError(res.content[0].text if res.content else "MCP tool error")
+        return json.loads(res.content[0].text)
+
     async def list_excel_files(self) -> List[str]:
         res = await self.call_tool("list_excel_files", {})
         return [c.text for c in res.content if isinstance(c, types.TextContent)]
@@ -91,7 +326,27 @@ class MCPExcelClient:
             payload["sheet_name"] = sheet
 
         res = await self.call_tool("read_sheet", payload)
-        return json.loads(res.content[0].text)
+        return self.rows(res)
+
+    async def list_sheets(self, file_name: str) -> list[dict]:
+        res = await self.call_tool("list_sheets", {"file_name": file_name})
+        return self.rows(res)
+
+    async def read_workbook(
+        self,
+        file_name: str,
+        sheets: Optional[List[str]] = None,
+        max_rows: Optional[int] = 100,
+        row_limits: Optional[Dict[str, int]] = None,
+    ) -> dict:
+        payload = {"file_name": file_name, "max_rows": max_rows}
+        if sheets:
+            payload["sheet_names"] = sheets
+        if row_limits:
+            payload["row_limits"] = row_limits
+
+        res = await self.call_tool("read_workbook", payload)
+        return self._json(res)
 
     async def read_range(
         self,
@@ -108,7 +363,7 @@ class MCPExcelClient:
         }
 
         res = await self.call_tool("read_range", payload)
-        return json.loads(res.content[0].text)
+        return self.rows(res)
 
     async def write_cell(self, file, sheet, row, col, value):
         input_data = {
@@ -131,6 +386,114 @@ class MCPExcelClient:
         res = await self.call_tool("append_row", input_data)
         return res.content[0].text
 
+    async def add_computed_column(self, file, sheet, column, expression, overwrite=False):
+        input_data = {
+            "file_name": file,
+            "sheet_name": sheet,
+            "column": column,
+            "expression": expression,
+            "overwrite": overwrite,
+        }
+        res = await self.call_tool("add_computed_column", input_data)
+        return res.content[0].text
+
+    async def write_sheet(self, file, sheet, rows=None, columns=None, join=None, overwrite=False):
+        input_data = {
+            "file_name": file,
+            "sheet_name": sheet,
+            "overwrite": overwrite,
+        }
+        if rows is not None:
+            input_data["rows"] = rows
+        if columns:
+            input_data["columns"] = columns
+        if join is not None:
+            input_data["join"] = join
+        res = await self.call_tool("write_sheet", input_data)
+        return res.content[0].text
+
+    async def search_cells(self, query: str, file_names: Optional[List[str]] = None, limit: int = 50) -> dict:
+        payload = {"query": query, "limit": limit}
+        if file_names:
+            payload["file_names"] = file_names
+
+        res = await self.call_tool("search_cells", payload)
+        return self._json(res)
+
+    async def run_sql(
+        self, query: str = "", limit: int = 100, offset: int = 0, paginate: bool = False, cursor: Optional[str] = None,
+    ) -> dict:
+        payload = {"query": query, "limit": limit}
+        if offset:
+            payload["offset"] = offset
+        if paginate:
+            payload["paginate"] = True
+        if cursor:
+            payload["cursor"] = cursor
+
+        res = await self.call_tool("run_sql", payload)
+        return self._json(res)
+
+    async def changes_since(self, file: str, sheet: Optional[str], version: int) -> dict:
+        payload = {"file_name": file, "version": version}
+        if sheet:
+            payload["sheet_name"] = sheet
+
+        res = await self.call_tool("changes_since", payload)
+        return self._json(res)
+
+    async def join_sheets(
+        self,
+        left_file: str,
+        right_file: str,
+        left_on: List[str],
+        right_on: Optional[List[str]] = None,
+        left_sheet: Optional[str] = None,
+        right_sheet: Optional[str] = None,
+        how: str = "inner",
+        columns: Optional[List[str]] = None,
+        limit: int = 100,
+    ) -> dict:
+        payload = {
+            "left_file": left_file,
+            "right_file": right_file,
+            "left_on": left_on,
+            "how": how,
+            "limit": limit,
+        }
+        for key, value in (
+            ("right_on", right_on),
+            ("left_sheet", left_sheet),
+            ("right_sheet", right_sheet),
+            ("columns", columns),
+        ):
+            if value:
+                payload[key] = value
+
+        res = await self.call_tool("join_sheets", payload)
+        return self._json(res)
+
+    async def aggregate_sheet(
+        self,
+        file: str,
+        sheet: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        aggregates: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+        on_progress=None,
+    ) -> dict:
+        """
+        on_progress(rows_done, total_rows, message) is called as chunks complete.
+        """
+        payload = {"file_name": file, "columns": columns or [], "group_by": group_by or []}
+        if sheet:
+            payload["sheet_name"] = sheet
+        if aggregates:
+            payload["aggregates"] = aggregates
+
+        res = await self.call_tool("aggregate_sheet", payload, progress_callback=on_progress)
+        return self._json(res)
+
     # ------------------------------
     # Resource Reading (rare)
     # ------------------------------
@@ -142,14 +505,33 @@ class MCPExcelClient:
             return json.loads(resource.text)
         return resource.text
 
+    async def server_metrics(self) -> str:
+        """
+        Prometheus text exposition of the server process' own metrics.
+        """
+        result = await self.session().read_resource(AnyUrl("metrics://excel"))
+        return result.contents[0].text
+
+    async def warm_up(self, file_name: str) -> dict:
+        """
+        Have the server load a new or replaced workbook and refresh its
+        search index and SQL mirror entries.
+        """
+        return await self.read_resource(f"warmup://excel/{quote(file_name, safe='')}")
+
     # ------------------------------
     # Cleanup
     # ------------------------------
 
     async def close(self):
         logger.info("Closing MCP session...")
-        await self._exit_stack.aclose()
-        self._session = None
+        conn, self._conn = self._conn, None
+        standby, self._standby = self._standby, None
+        for c in (standby, conn):
+            if c is not None:
+                await c.close()
+        if self._retiring:
+            await asyncio.gather(*self._retiring)
 
     async def __aenter__(self):
         await self.connect()
@@ -0,0 +1,552 @@
+# backend/mcp/sql_mirror.py
+"""
+SQLite mirror of every sheet in excel_data/, queried by run_sql.
+
+Each sheet is one table with typed columns (INTEGER, REAL, TEXT; dates as
+ISO text) and rowid = data row + 1. Table names come from the file stem,
+plus the sheet name when it differs ("opportunities", "sales_q1"); the
+mirror_tables table lists them with their file, sheet and columns.
+
+The mirror is built on the first sync (the first query) and then follows
+the WorkbookStore: a file whose mtime/size changed is
+brought up to the store's snapshot, replaying that sheet's change log in
+place when it reaches back to the mirrored version and rebuilding the
+table otherwise. Files above a size cap are not mirrored. Queries run on a separate read-only connection with an
+authorizer that only allows reads, a row limit and a time limit; a
+paginated query keeps its cursor open so later pages read the same snapshot.
+"""
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import anyio
+import pandas as pd
+
+from backend.mcp import excel_readers
+from backend.mcp.excel_store import Change, Snapshot, WorkbookStore
+from backend.utils.metrics import REGISTRY, Counter, Registry
+
+logger = logging.getLogger("ExcelMCP")
+
+# (column name, declared type); "" is no type affinity (mixed values)
+Column = Tuple[str, str]
+
+# Sheets with more changed rows than this are rebuilt instead
+MAX_REPLAY_ROWS = 5000
+INSERT_CHUNK_ROWS = 5000
+# Paginated queries left open at once, and how long an idle one stays open
+MAX_CURSORS = 16
+CURSOR_IDLE_S = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mirror_files (
+    file_name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, version INTEGER
+);
+CREATE TABLE IF NOT EXISTS mirror_tables (
+    table_name TEXT PRIMARY KEY, file_name TEXT, sheet_name TEXT, columns TEXT, row_count INTEGER
+);
+"""
+
+_RESERVED = {"mirror_files", "mirror_tables"}
+
+# Authorizer actions a read-only query may perform
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+def parse_indexes(spec: str) -> Dict[str, List[List[str]]]:
+    """
+    "opportunities.Account,accounts.AccountName,orders.Region+Month" ->
+    {table: [[column, ...], ...]}; "+" joins the columns of one index.
+    """
+    indexes: Dict[str, List[List[str]]] = {}
+    for item in filter(None, (i.strip() for i in spec.split(","))):
+        table, sep, columns = item.partition(".")
+        if not sep or not columns:
+            raise ValueError(f"Invalid SQL index '{item}', expected table.column[+column...]")
+        indexes.setdefault(table.lower(), []).append(columns.split("+"))
+    return indexes
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_base(file_name: str, sheet: str) -> str:
+    stem = Path(file_name).stem
+    name = stem if sheet.casefold() == stem.casefold() else f"{stem}_{sheet}"
+    name = re.sub(r"\W+", "_", name).strip("_").lower() or "sheet"
+    return f"t_{name}" if name[0].isdigit() else name
+
+
+def _columns(df: pd.DataFrame) -> List[Column]:
+    """
+    SQL column names (unique ignoring case, as SQLite requires) and types.
+    """
+    out: List[Column] = []
+    seen = set()
+    for label in df.columns:
+        name = base = str(label)
+        n = 1
+        while name.casefold() in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name.casefold())
+
+        s = df[label]
+        if pd.api.types.is_bool_dtype(s) or pd.api.types.is_integer_dtype(s):
+            kind = "INTEGER"
+        elif pd.api.types.is_float_dtype(s):
+            kind = "REAL"
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            kind = "TEXT"
+        else:
+            inferred = pd.api.types.infer_dtype(s, skipna=True)
+            kind = "TEXT" if inferred in ("string", "empty", "date", "datetime") else ""
+        out.append((name, kind))
+    return out
+
+
+def _sql_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, str)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return str(value)
+
+
+def _rows(df: pd.DataFrame, start: int = 0, stop: Optional[int] = None) -> Iterable[List[Any]]:
+    stop = len(df) if stop is None else stop
+    for begin in range(start, stop, INSERT_CHUNK_ROWS):
+        chunk = df.iloc[begin:min(begin + INSERT_CHUNK_ROWS, stop)]
+        for row in chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist():
+            yield [_sql_value(v) for v in row]
+
+
+class SqlMirror:
+    """
+    The mirror database plus the sync that keeps it at the store's
+    snapshots. Writes go through one connection, serialized by `_lock`.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        db_path: Path,
+        indexes: Optional[Dict[str, List[List[str]]]] = None,
+        max_rows: int = 1000,
+        timeout: float = 5.0,
+        max_file_bytes: Optional[int] = None,
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.directory = directory
+        self.db_path = db_path
+        self.indexes = indexes or {}
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.max_file_bytes = max_file_bytes
+        # Files left out for their size
+        self.skipped: set = set()
+        self._synced = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._again = False
+        # Open paginated queries by token
+        self._cursors: Dict[str, "_Cursor"] = {}
+        # Queries and pages run in worker threads
+        self._cursors_lock = threading.Lock()
+
+        self._updates = Counter(
+            "excel_mcp_sql_mirror_updates_total",
+            "Mirrored sheet updates by mode (replay: change log applied, rebuild: table rewritten)",
+            ("mode",),
+            registry=registry,
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------
+    # Sync
+    # ------------------------------
+
+    def schedule(self, store: WorkbookStore):
+        """
+        Sync in the background (coalescing calls made while one runs); does
+        nothing until a query has synced the mirror once.
+        """
+        if not self._synced:
+            return
+        if self._task is not None and not self._task.done():
+            self._again = True
+            return
+
+        async def run():
+            while True:
+                self._again = False
+                try:
+                    await self.sync(store)
+                except Exception as e:
+                    logger.warning(f"SQL mirror sync failed: {e}")
+                if not self._again:
+                    return
+
+        self._task = asyncio.create_task(run())
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        stats = {}
+        for f in self.directory.iterdir():
+            if f.name.startswith((".", "~$")) or f.suffix.lower() not in excel_readers.SUPPORTED_SUFFIXES:
+                continue
+            with contextlib.suppress(OSError):
+                st = f.stat()
+                stats[f.name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _mirrored(self) -> Dict[str, Tuple[int, int, Optional[int]]]:
+        rows = self._db().execute("SELECT file_name, mtime_ns, size, version FROM mirror_files")
+        return {name: (mtime, size, version) for name, mtime, size, version in rows}
+
+    async def sync(self, store: WorkbookStore):
+        """
+        Bring every changed file up to its current snapshot.
+        """
+        async with self._lock:
+            self._synced = True
+            stats = await anyio.to_thread.run_sync(self._scan)
+            mirrored = await anyio.to_thread.run_sync(self._mirrored)
+            self.skipped = {
+                name for name, (_, size) in stats.items()
+                if self.max_file_bytes is not None and size > self.max_file_bytes
+            }
+
+            for name in mirrored:
+                if name not in stats:
+                    await anyio.to_thread.run_sync(self._drop_file, name)
+
+            for name, stat in stats.items():
+                previous = mirrored.get(name)
+                if previous is not None and previous[:2] == stat:
+                    continue
+                if name in self.skipped:
+                    # Kept as an empty entry so it is not reconsidered until it changes
+                    await anyio.to_thread.run_sync(self._drop_file, name, stat)
+                    continue
+                path = self.directory / name
+                try:
+                    snap = await store.snapshot(path)
+                except Exception as e:
+                    logger.warning(f"SQL mirror: cannot read '{name}': {e}")
+                    await anyio.to_thread.run_sync(self._drop_file, name, stat)
+                    continue
+
+                plan: Dict[str, Optional[List[Change]]] = {}
+                version = previous[2] if previous else None
+                for sheet in snap.sheet_names:
+                    plan[sheet] = None
+                    if version is not None and version <= snap.version:
+                        delta = await store.changes_since(path, sheet, version)
+                        if not delta["resync"]:
+                            # The store may have committed past `snap` meanwhile
+                            plan[sheet] = [c for c in delta["changes"] if c["version"] <= snap.version]
+                await anyio.to_thread.run_sync(self._apply, name, snap, plan)
+
+    def _drop_file(self, name: str, stat: Optional[Tuple[int, int]] = None):
+        """
+        Remove a file's tables; with `stat`, remember it as mirrored (empty)
+        so an unreadable file is not retried until it changes.
+        """
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN")
+            tables = conn.execute("SELECT table_name FROM mirror_tables WHERE file_name = ?", (name,)).fetchall()
+            for (table,) in tables:
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+            conn.execute("DELETE FROM mirror_tables WHERE file_name = ?", (name,))
+            conn.execute("DELETE FROM mirror_files WHERE file_name = ?", (name,))
+            if stat is not None:
+                conn.execute("INSERT INTO mirror_files VALUES (?, ?, ?, NULL)", (name, *stat))
+
+    def _apply(self, name: str, snap: Snapshot, plan: Dict[str, Optional[List[Change]]]):
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN")
+            existing = {
+                sheet: (table, [tuple(c) for c in json.loads(columns)], rows)
+                for table, sheet, columns, rows in conn.execute(
+                    "SELECT table_name, sheet_name, columns, row_count FROM mirror_tables WHERE file_name = ?", (name,)
+                )
+            }
+            for sheet, (table, _, _) in existing.items():
+                if sheet not in snap.sheets:
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                    conn.execute("DELETE FROM mirror_tables WHERE table_name = ?", (table,))
+
+            for sheet, changes in plan.items():
+                df = snap.sheets[sheet]
+                columns = _columns(df)
+                entry = existing.get(sheet)
+                if changes is not None and entry is not None and entry[1] == columns:
+                    if self._replay(conn, entry[0], columns, entry[2], df, changes):
+                        if changes:
+                            self._updates.inc(mode="replay")
+                        continue
+                table = entry[0] if entry else self._new_table(conn, name, sheet)
+                self._rebuild(conn, table, columns, df)
+                conn.execute(
+                    "INSERT OR REPLACE INTO mirror_tables VALUES (?, ?, ?, ?, ?)",
+                    (table, name, sheet, json.dumps(columns), len(df)),
+                )
+                self._updates.inc(mode="rebuild")
+
+            conn.execute(
+                "INSERT OR REPLACE INTO mirror_files VALUES (?, ?, ?, ?)",
+                (name, snap.mtime_ns, snap.size, snap.version),
+            )
+
+    def _new_table(self, conn: sqlite3.Connection, name: str, sheet: str) -> str:
+        base = table = _table_base(name, sheet)
+        n = 1
+        while table in _RESERVED or conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE lower(name) = ?", (table,)
+        ).fetchone():
+            n += 1
+            table = f"{base}_{n}"
+        return table
+
+    def _rebuild(self, conn: sqlite3.Connection, table: str, columns: List[Column], df: pd.DataFrame):
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(f"CREATE TABLE {_quote(table)} ({', '.join(f'{_quote(c)} {t}'.rstrip() for c, t in columns)})")
+        if columns:
+            marks = ", ".join("?" * len(columns))
+            conn.executemany(f"INSERT INTO {_quote(table)} VALUES ({marks})", _rows(df))
+
+        names = {c.casefold(): c for c, _ in columns}
+        for key in self.indexes.get(table, []):
+            missing = [c for c in key if c.casefold() not in names]
+            if missing:
+                logger.warning(f"SQL mirror: index on {table} skipped, unknown column(s) {missing}")
+                continue
+            index = re.sub(r"\W+", "_", f"ix_{table}_{'_'.join(key)}")
+            cols = ", ".join(_quote(names[c.casefold()]) for c in key)
+            conn.execute(f"CREATE INDEX {_quote(index)} ON {_quote(table)} ({cols})")
+
+    def _replay(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        columns: List[Column],
+        mirrored_rows: int,
+        df: pd.DataFrame,
+        changes: List[Change],
+    ) -> bool:
+        """
+        Apply logged inserts and updates in place, with the values of the
+        snapshot. False when the sheet should be rebuilt instead.
+        """
+        rows = {c["row"] for c in changes if c["op"] != "column"}
+        if len(rows) > MAX_REPLAY_ROWS or any(c["op"] not in ("update", "insert", "column") for c in changes):
+            return False
+        if len(df) < mirrored_rows:
+            return False
+
+        if len(df) > mirrored_rows:
+            marks = ", ".join("?" * len(columns))
+            conn.executemany(
+                f"INSERT INTO {_quote(table)} (rowid, {', '.join(_quote(c) for c, _ in columns)}) VALUES (?, {marks})",
+                ([mirrored_rows + 1 + i, *row] for i, row in enumerate(_rows(df, mirrored_rows))),
+            )
+
+        # Whole columns in one statement each, then the single cells
+        rewritten = {c["col"] for c in changes if c["op"] == "column"}
+        for col in sorted(rewritten):
+            conn.executemany(
+                f"UPDATE {_quote(table)} SET {_quote(columns[col][0])} = ? WHERE rowid = ?",
+                ((_sql_value(None if pd.isna(v) else v), row + 1)
+                 for row, v in enumerate(df.iloc[:mirrored_rows, col].tolist())),
+            )
+        cells = {
+            (c["row"], c["col"]) for c in changes
+            if c["op"] == "update" and c["row"] < mirrored_rows and c["col"] not in rewritten
+        }
+        for row, col in sorted(cells):
+            value = df.iat[row, col]
+            conn.execute(
+                f"UPDATE {_quote(table)} SET {_quote(columns[col][0])} = ? WHERE rowid = ?",
+                (_sql_value(None if pd.isna(value) else value), row + 1),
+            )
+        conn.execute("UPDATE mirror_tables SET row_count = ? WHERE table_name = ?", (len(df), table))
+        return True
+
+    # ------------------------------
+    # Queries
+    # ------------------------------
+
+    def query(
+        self, sql: str, limit: int = 100, timeout: Optional[float] = None, offset: int = 0, paginate: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Run one read-only statement; at most `limit` rows (capped by
+        max_rows) after skipping `offset`, within `timeout` seconds (capped
+        by the mirror's). With `paginate`, a truncated result keeps its
+        cursor open and returns its token as "cursor" for `fetch`.
+        """
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        cursor = _Cursor(conn)
+        try:
+            conn.execute("PRAGMA query_only = ON")
+            conn.set_authorizer(lambda action, *_: sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY)
+            conn.set_progress_handler(lambda: int(time.monotonic() > cursor.deadline), 1000)
+            with self._errors(cursor, timeout):
+                cur = conn.execute(sql)
+                if cur.description is None:
+                    raise ValueError("Only SELECT queries are allowed")
+                while offset > 0:
+                    skipped = len(cur.fetchmany(min(offset, INSERT_CHUNK_ROWS)))
+                    if not skipped:
+                        break
+                    offset -= skipped
+            cursor.cur = cur
+            cursor.columns = _unique([d[0] for d in cur.description])
+            result = self._page(cursor, limit, timeout)
+        except BaseException:
+            conn.close()
+            raise
+
+        if paginate and result["truncated"]:
+            result["cursor"] = uuid.uuid4().hex
+            self._store(result["cursor"], cursor)
+        else:
+            conn.close()
+        return result
+
+    def fetch(self, token: str, limit: int = 100, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The next page of a paginated query. All pages come from one read
+        transaction, so they see the same snapshot of the mirror. The
+        cursor closes after its last page; `limit` 0 closes it early.
+        """
+        cursor = self._take(token)
+        if cursor is None:
+            raise ValueError("Unknown or expired cursor; run the query again")
+        if limit <= 0:
+            cursor.close()
+            return {"columns": cursor.columns, "row_count": 0, "truncated": False, "rows": []}
+        try:
+            result = self._page(cursor, limit, timeout)
+        except BaseException:
+            cursor.close()
+            raise
+
+        if result["truncated"]:
+            cursor.used = time.monotonic()
+            self._store(token, cursor)
+            result["cursor"] = token
+        else:
+            cursor.close()
+        return result
+
+    def _page(self, cursor: "_Cursor", limit: int, timeout: Optional[float]) -> Dict[str, Any]:
+        limit = max(0, min(limit, self.max_rows))
+        with self._errors(cursor, timeout):
+            # One row read ahead tells whether the result goes on
+            rows = cursor.pending + cursor.cur.fetchmany(limit + 1 - len(cursor.pending))
+        cursor.pending = rows[limit:]
+        columns = cursor.columns
+        return {
+            "columns": columns,
+            "row_count": min(len(rows), limit),
+            "truncated": len(rows) > limit,
+            "rows": [
+                {c: v.hex() if isinstance(v, bytes) else v for c, v in zip(columns, row)}
+                for row in rows[:limit]
+            ],
+        }
+
+    @contextlib.contextmanager
+    def _errors(self, cursor: "_Cursor", timeout: Optional[float]):
+        timeout = min(timeout or self.timeout, self.timeout)
+        cursor.deadline = time.monotonic() + timeout
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if str(e) == "interrupted":
+                raise ValueError(f"Query exceeded the {timeout:g}s time limit")
+            raise ValueError(f"SQL error: {e}")
+        except (sqlite3.DatabaseError, sqlite3.Warning) as e:
+            raise ValueError(f"SQL error: {e}")
+
+    def _store(self, token: str, cursor: "_Cursor"):
+        with self._cursors_lock:
+            closing = self._expired()
+            # Oldest first, to make room for this one
+            excess = len(self._cursors) + 1 - MAX_CURSORS
+            for old, _ in sorted(self._cursors.items(), key=lambda item: item[1].used)[:max(0, excess)]:
+                closing.append(self._cursors.pop(old))
+            self._cursors[token] = cursor
+        for stale in closing:
+            stale.close()
+
+    def _take(self, token: str) -> Optional["_Cursor"]:
+        """
+        Remove and return an open cursor; a page is read from it outside
+        the lock, and other threads cannot see it meanwhile.
+        """
+        with self._cursors_lock:
+            closing = self._expired()
+            cursor = self._cursors.pop(token, None)
+        for stale in closing:
+            stale.close()
+        return cursor
+
+    def _expired(self) -> List["_Cursor"]:
+        # Called with _cursors_lock held; the caller closes them
+        now = time.monotonic()
+        idle = [token for token, cursor in self._cursors.items() if now - cursor.used > CURSOR_IDLE_S]
+        return [self._cursors.pop(token) for token in idle]
+
+
+class _Cursor:
+    """
+    A query's connection and cursor, kept open between pages.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.cur: Optional[sqlite3.Cursor] = None
+        self.columns: List[str] = []
+        # The read-ahead row of the last page
+        self.pending: List[tuple] = []
+        self.deadline = 0.0
+        self.used = time.monotonic()
+
+    def close(self):
+        self.conn.close()
+
+
+def _unique(names: List[str]) -> List[str]:
+    columns: List[str] = []
+    for name in names:
+        base, n = name, 1
+        while name in columns:
+            n += 1
+            name = f"{base}_{n}"
+        columns.append(name)
+    return columns
@@ -1,11 +1,20 @@
 # backend/mcp/tool_manager.py
-from typing import Dict, List, Any
+import json
+from typing import Dict, List, Any, Optional
 from mcp.types import Tool
 from backend.utils.logger import get_logger
+from backend.utils.metrics import Counter
+from backend.utils.tracing import span
 
 
 logger = get_logger(__name__)
 
+TOOL_CALLS = Counter(
+    "tool_calls_total",
+    "Tool calls dispatched to MCP clients",
+    ("tool", "status"),
+)
+
 
 class ToolManager:
     """
@@ -13,6 +22,9 @@ class ToolManager:
     detects Gemini tool calls, and executes them.
     """
 
+    # tool name -> argument defaults from its input schema (see call_key)
+    _defaults: Dict[str, Dict[str, Any]] = {}
+
     # ----------------------------------------
     # 1) DISCOVER TOOLS
     # ----------------------------------------
@@ -56,6 +68,11 @@ class ToolManager:
                 continue
 
             for t in tools:
+                cls._defaults[t.name] = {
+                    k: p["default"]
+                    for k, p in (t.inputSchema.get("properties") or {}).items()
+                    if isinstance(p, dict) and p.get("default") is not None
+                }
                 cleaned = cls._clean_schema(t.inputSchema)
                 schemas.append({
                     "name": t.name,
@@ -65,6 +82,16 @@ class ToolManager:
 
         return schemas
 
+    @classmethod
+    def call_key(cls, name: str, args: Dict[str, Any]) -> str:
+        """
+        Identity of a tool call: schema defaults filled in and null
+        arguments dropped, so equivalent calls compare equal.
+        """
+        merged = dict(cls._defaults.get(name, {}))
+        merged.update((k, v) for k, v in args.items() if v is not None)
+        return name + json.dumps(merged, sort_keys=True, default=str)
+
     # ----------------------------------------
     # 2) EXTRACT GEMINI TOOL CALLS
     # ----------------------------------------
@@ -118,12 +145,17 @@ class ToolManager:
     async def execute_tool_calls(
         cls,
         clients: Dict[str, Any],
-        tool_calls: List[Dict[str, Any]]
+        tool_calls: List[Dict[str, Any]],
+        prefetch: Optional[Any] = None,
     ) -> List[Dict[str, Any]]:
         """
         Executes requested tools against the correct MCP client.
         Returns list of tool result objects.
 
+        prefetch:
+            ToolPrefetcher of the turn; calls it already started are
+            answered from it instead of a new MCP round trip.
+
         Output format example:
         [
           {
@@ -136,49 +168,66 @@ class ToolManager:
         tool_results: List[Dict[str, Any]] = []
 
         for call in tool_calls:
-            name = call["name"]
-            input_args = call["arguments"]
-            
-            client = await cls._find_client_with_tool(clients, name)
-            if not client:
-                logger.error(f"Tool not found: {name}")
-                tool_results.append(
-                    {
-                        "tool_name": name,
-                        "error": f"MCP tool '{name}' not available",
-                    }
-                )
-                continue
-
-            try:
-                res = await client.call_tool(name, input_args)
-
-                # Extract content (usually list-of-dict JSON as text)
-                items = []
-                if res and res.content:
-                    for c in res.content:
-                        if hasattr(c, "text"):
-                            items.append(c.text)
+            with span("tool_dispatch") as attrs:
+                result = await cls._execute_one(clients, call, prefetch)
+                status = "error" if "error" in result else "ok"
+                attrs.update(tool=call["name"], status=status)
+            TOOL_CALLS.inc(tool=call["name"], status=status)
+            tool_results.append(result)
 
-                tool_results.append(
-                    {
-                        "tool_name": name,
-                        "content": items,
-                    }
-                )
-
-            except Exception as e:
-                msg = f"Error executing tool '{name}': {e}"
-                logger.error(msg)
+        return tool_results
 
-                tool_results.append(
-                    {
+    @classmethod
+    async def _execute_one(
+        cls,
+        clients: Dict[str, Any],
+        call: Dict[str, Any],
+        prefetch: Optional[Any] = None,
+    ) -> Dict[str, Any]:
+        name = call["name"]
+        input_args = call["arguments"]
+
+        try:
+            res = await prefetch.take(name, input_args) if prefetch is not None else None
+            if res is None:
+                client = await cls._find_client_with_tool(clients, name)
+                if not client:
+                    logger.error(f"Tool not found: {name}")
+                    return {
                         "tool_name": name,
-                        "error": msg,
+                        "error": f"MCP tool '{name}' not available",
                     }
-                )
+                res = await client.call_tool(name, input_args)
 
-        return tool_results
+            # Extract content (usually list-of-dict JSON as text)
+            items = []
+            if res and res.content:
+                for c in res.content:
+                    if hasattr(c, "text"):
+                        items.append(c.text)
+
+            # The server reports tool failures in the result, not by raising
+            if res is not None and res.isError:
+                msg = "\n".join(items) or f"MCP tool '{name}' failed"
+                logger.error(f"Tool {name} returned an error: {msg}")
+                return {
+                    "tool_name": name,
+                    "error": msg,
+                }
+
+            return {
+                "tool_name": name,
+                "content": items,
+            }
+
+        except Exception as e:
+            msg = f"Error executing tool '{name}': {e}"
+            logger.error(msg)
+
+            return {
+                "tool_name": name,
+                "error": msg,
+            }
 
     # ----------------------------------------
     # Utility: find MCP client for tool
@@ -0,0 +1,250 @@
+# backend/services/fake_gemini.py
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Used when no script file is configured: list files, read one sheet, answer.
+DEFAULT_SCRIPT: Dict[str, Any] = {
+    "scripts": [
+        {
+            "steps": [
+                {"calls": [{"name": "list_excel_files", "args": {}}]},
+                {
+                    "calls": [
+                        {
+                            "name": "read_range",
+                            "args": {
+                                "file_name": "Accounts.xlsx",
+                                "sheet_name": "Accounts",
+                                "start_row": 0,
+                                "end_row": 9,
+                            },
+                        }
+                    ]
+                },
+                {"text": "Here are the first ten accounts."},
+            ]
+        }
+    ]
+}
+
+
+class FakeGeminiError(Exception):
+    """
+    Injected failure; `code` mirrors google.api_core's HTTP status.
+    """
+
+    def __init__(self, code: int = 503, message: str = "Injected fake Gemini error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+# ---------------------------------------------------------
+#  Response objects (same attribute shape as Gemini's)
+# ---------------------------------------------------------
+
+@dataclass
+class FakeFunctionCall:
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class FakePart:
+    text: Optional[str] = None
+    function_call: Optional[FakeFunctionCall] = None
+
+
+@dataclass
+class FakeContent:
+    parts: List[FakePart]
+    role: str = "model"
+
+
+@dataclass
+class FakeCandidate:
+    content: FakeContent
+
+
+@dataclass
+class FakeUsageMetadata:
+    prompt_token_count: int = 0
+    candidates_token_count: int = 0
+    total_token_count: int = 0
+
+
+@dataclass
+class FakeResponse:
+    candidates: List[FakeCandidate]
+    usage_metadata: FakeUsageMetadata = field(default_factory=FakeUsageMetadata)
+
+    @property
+    def text(self) -> str:
+        return "".join(p.text for p in self.candidates[0].content.parts if p.text)
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel.
+
+    Replays scripted function-call sequences so the whole Chat/MCP loop can
+    run without network access (load tests, local debugging).
+
+    Script format:
+        {
+          "latency_ms": 200,            # optional, per call
+          "jitter_ms": 50,              # optional, uniform +/- jitter
+          "error_rate": 0.05,           # optional, share of calls raising a 503
+          "slow_rate": 0.02,            # optional, share of calls taking slow_ms
+          "slow_ms": 5000,
+          "scripts": [
+            {
+              "match": "Leads",         # optional substring of the user query
+              "steps": [
+                {"calls": [{"name": "read_sheet", "args": {...}}]},
+                {"text": "final answer", "latency_ms": 50}
+              ]
+            }
+          ]
+        }
+
+    The first script whose "match" occurs in the latest user message is used
+    (a script without "match" is the fallback). The step is picked from the
+    tool results being resumed: the step after the one whose calls produced
+    them. Steps within a script should therefore call distinct tool sets.
+    A step with "error": <status code> always fails with FakeGeminiError.
+    """
+
+    def __init__(
+        self,
+        script: Optional[Dict[str, Any]] = None,
+        latency_ms: Optional[float] = None,
+        jitter_ms: Optional[float] = None,
+        seed: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        slow_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+    ):
+        script = script or DEFAULT_SCRIPT
+        self.scripts: List[Dict[str, Any]] = script.get("scripts", [])
+        if not self.scripts:
+            raise ValueError("Fake Gemini script has no 'scripts' entries")
+
+        self.latency_ms = latency_ms if latency_ms is not None else script.get("latency_ms", 0)
+        self.jitter_ms = jitter_ms if jitter_ms is not None else script.get("jitter_ms", 0)
+        self.error_rate = error_rate if error_rate is not None else script.get("error_rate", 0)
+        self.slow_rate = slow_rate if slow_rate is not None else script.get("slow_rate", 0)
+        self.slow_ms = slow_ms if slow_ms is not None else script.get("slow_ms", 0)
+        self._rng = random.Random(seed)
+
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[Path], **kwargs) -> "FakeGenerativeModel":
+        script = json.loads(Path(path).read_text(encoding="utf-8")) if path else None
+        return cls(script, **kwargs)
+
+    # ---------------------------------------------------------
+    #  Script selection
+    # ---------------------------------------------------------
+
+    @staticmethod
+    def _text_of(message: Dict[str, Any]) -> str:
+        return " ".join(
+            p.get("text", "") for p in message.get("parts", []) if isinstance(p, dict)
+        )
+
+    def _select_script(self, contents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        user_text = ""
+        for msg in reversed(contents):
+            if msg.get("role") == "user":
+                user_text = self._text_of(msg)
+                break
+
+        fallback = None
+        for script in self.scripts:
+            match = script.get("match")
+            if match is None:
+                fallback = fallback or script
+            elif match in user_text:
+                return script
+        return fallback or self.scripts[0]
+
+    @staticmethod
+    def _select_step(script: Dict[str, Any], contents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        steps = script["steps"]
+        last = contents[-1] if contents else {}
+        if last.get("role") != "function":
+            return steps[0]
+
+        answered = sorted(
+            p["function_response"]["name"]
+            for p in last.get("parts", [])
+            if "function_response" in p
+        )
+        for i, step in enumerate(steps):
+            called = sorted(c["name"] for c in step.get("calls", []))
+            if called and called == answered:
+                return steps[min(i + 1, len(steps) - 1)]
+        return steps[-1]
+
+    # ---------------------------------------------------------
+    #  Response building
+    # ---------------------------------------------------------
+
+    def _delay(self, step: Dict[str, Any]) -> float:
+        base = step.get("latency_ms", self.latency_ms)
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            base = self.slow_ms
+        jitter = self.jitter_ms and self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, base + jitter) / 1000.0
+
+    @staticmethod
+    def _build_response(step: Dict[str, Any], contents: List[Dict[str, Any]]) -> FakeResponse:
+        if step.get("calls"):
+            parts = [
+                FakePart(function_call=FakeFunctionCall(c["name"], dict(c.get("args", {}))))
+                for c in step["calls"]
+            ]
+        else:
+            parts = [FakePart(text=step.get("text", ""))]
+
+        # Rough token estimate (~4 chars per token) so usage accounting works offline
+        prompt_tokens = len(json.dumps(contents, default=str)) // 4
+        candidate_tokens = max(1, len(json.dumps(step, default=str)) // 4)
+        usage = FakeUsageMetadata(prompt_tokens, candidate_tokens, prompt_tokens + candidate_tokens)
+        return FakeResponse(candidates=[FakeCandidate(FakeContent(parts))], usage_metadata=usage)
+
+    def _next(self, contents: List[Dict[str, Any]]):
+        self.calls += 1
+        step = self._select_step(self._select_script(contents), contents)
+        error = step.get("error")
+        if error is None and self.error_rate and self._rng.random() < self.error_rate:
+            error = 503
+        return step, self._delay(step), error
+
+    # ---------------------------------------------------------
+    #  genai.GenerativeModel interface
+    # ---------------------------------------------------------
+
+    def generate_content(self, contents, *, tools=None, **kwargs) -> FakeResponse:
+        # Blocks like the real synchronous client does.
+        step, delay, error = self._next(contents)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise FakeGeminiError(error)
+        return self._build_response(step, contents)
+
+    async def generate_content_async(self, contents, *, tools=None, **kwargs) -> FakeResponse:
+        step, delay, error = self._next(contents)
+        if delay:
+            await asyncio.sleep(delay)
+        if error:
+            raise FakeGeminiError(error)
+        return self._build_response(step, contents)
@@ -1,16 +1,46 @@
 # backend/services/gemini_service.py
+from collections import deque
 from typing import List, Dict, Any, Optional
+import asyncio
 import json
-import google.generativeai as genai
+import random
+import threading
+import time
 
 
 from backend.config import get_settings
+from backend.services.fake_gemini import FakeGenerativeModel
+from backend.services.usage_tracker import TurnUsage
 from backend.utils.logger import get_logger
+from backend.utils.metrics import Counter
 
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+GEMINI_ATTEMPTS = Counter(
+    "gemini_call_attempts_total",
+    "generate_content attempts by outcome (hedged duplicates included)",
+    ("outcome",),
+)
+GEMINI_RETRIES = Counter(
+    "gemini_retries_total",
+    "Gemini calls retried after a transient error or deadline",
+    ("reason",),
+)
+GEMINI_HEDGES = Counter(
+    "gemini_hedged_requests_total",
+    "Duplicate Gemini requests fired after the hedge delay, by which copy answered",
+    ("winner",),
+)
+
+# HTTP status codes (google.api_core exceptions carry them as .code) worth retrying
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError)) or getattr(exc, "code", None) in RETRYABLE_CODES
+
 
 class GeminiService:
     """
@@ -22,9 +52,59 @@ class GeminiService:
     - Format result blocks for Gemini
     """
 
-    def __init__(self, model: str = "gemini-2.5-flash"):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(model)
+    def __init__(self, model: str = "gemini-2.5-flash", generative_model: Optional[Any] = None):
+        """
+        generative_model:
+            Any object exposing generate_content() (generate_content_async()
+            is used when present); overrides the backend
+            selected by settings.GEMINI_BACKEND (e.g. a FakeGenerativeModel).
+        """
+        self._model_name = model
+        self._model: Optional[Any] = None
+        self._model_lock = threading.Lock()
+        if generative_model is not None:
+            self._model = generative_model
+        elif settings.GEMINI_BACKEND == "fake":
+            logger.info("Using offline fake Gemini backend")
+            self._model = FakeGenerativeModel.from_file(
+                settings.GEMINI_FAKE_SCRIPT,
+                latency_ms=settings.GEMINI_FAKE_LATENCY_MS,
+                error_rate=settings.GEMINI_FAKE_ERROR_RATE,
+                slow_rate=settings.GEMINI_FAKE_SLOW_RATE,
+                slow_ms=settings.GEMINI_FAKE_SLOW_MS,
+            )
+
+        self.timeout = settings.GEMINI_TIMEOUT_S
+        self.max_retries = settings.GEMINI_MAX_RETRIES
+        self.backoff = settings.GEMINI_RETRY_BACKOFF_S
+        self.backoff_max = settings.GEMINI_RETRY_BACKOFF_MAX_S
+        self.hedge = settings.GEMINI_HEDGE
+        self.hedge_quantile = settings.GEMINI_HEDGE_QUANTILE
+        self.hedge_min_delay = settings.GEMINI_HEDGE_MIN_DELAY_S
+        # Recent successful call latencies, for the hedge delay
+        self._latencies: deque = deque(maxlen=200)
+
+    @property
+    def model(self) -> Any:
+        """
+        The generative model. The Gemini SDK takes most of a second to
+        import, so the real client is only built here, on first use or
+        from warm_up().
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(self._model_name)
+        return self._model
+
+    def warm_up(self):
+        """
+        Build the model now (blocking; run it in a worker thread).
+        """
+        self.model
 
     # ---------------------------------------------------------
     #  MESSAGE FORMATTING
@@ -55,6 +135,117 @@ class GeminiService:
 
         return formatted
 
+    @staticmethod
+    def prompt_chars(
+        messages: List[Dict[str, Any]],
+        tool_response: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, int]:
+        """
+        Prompt size by source. The last message is the current user turn;
+        "context_chars" on a message marks injected <context> data.
+        """
+        sizes = {"history": 0, "user": 0, "context": 0, "tool_results": 0}
+        for i, msg in enumerate(messages):
+            context = msg.get("context_chars", 0)
+            own = len(msg.get("content") or "") - context
+            sizes["context"] += context
+            sizes["user" if i == len(messages) - 1 else "history"] += own
+
+        for tr in tool_response or []:
+            sizes["tool_results"] += sum(len(str(c)) for c in tr.get("content", []))
+            sizes["tool_results"] += len(tr.get("error", ""))
+        return sizes
+
+    async def _generate(self, formatted_msgs, tools_schema, usage: Optional[TurnUsage], prompt_chars: Dict[str, int]):
+        start = time.perf_counter()
+        res = await self._call_with_retries(formatted_msgs, {"function_declarations": tools_schema})
+        if usage is not None:
+            usage.add_call(res, time.perf_counter() - start, prompt_chars)
+        return res
+
+    # ---------------------------------------------------------
+    #  DEADLINES, RETRIES, HEDGING
+    # ---------------------------------------------------------
+
+    async def _call_with_retries(self, contents, tools):
+        """
+        Each try gets `timeout` seconds. Transient failures (deadline,
+        429/5xx, connection errors) are retried up to `max_retries` times
+        with exponential backoff and full jitter.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.wait_for(self._hedged(contents, tools), self.timeout)
+            except Exception as e:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    GEMINI_ATTEMPTS.inc(outcome="timeout")
+                if attempt >= self.max_retries or not _is_transient(e):
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+                logger.warning(f"Gemini call failed ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+                GEMINI_RETRIES.inc(reason="timeout" if timed_out else "error")
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, contents, tools):
+        """
+        With hedging on, a duplicate request goes out when the first has
+        not answered within the recent `hedge_quantile` latency; the first
+        success wins and the other copy is cancelled.
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._attempt(contents, tools)
+
+        first = asyncio.create_task(self._attempt(contents, tools))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            second = asyncio.create_task(self._attempt(contents, tools))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        GEMINI_HEDGES.inc(winner="hedge" if task is second else "primary")
+                        return task.result()
+            return first.result()  # both failed
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        quantile = ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+        return max(self.hedge_min_delay, quantile)
+
+    async def _attempt(self, contents, tools):
+        start = time.perf_counter()
+        try:
+            generate = getattr(self.model, "generate_content_async", None)
+            if generate is not None:
+                res = await generate(contents, tools=tools)
+            else:
+                # Blocking-only models run in a worker thread so the event
+                # loop (other requests, prefetched MCP calls) keeps going
+                res = await asyncio.to_thread(self.model.generate_content, contents, tools=tools)
+        except asyncio.CancelledError:
+            GEMINI_ATTEMPTS.inc(outcome="cancelled")
+            raise
+        except Exception:
+            GEMINI_ATTEMPTS.inc(outcome="error")
+            raise
+
+        GEMINI_ATTEMPTS.inc(outcome="ok")
+        self._latencies.append(time.perf_counter() - start)
+        return res
+
     @staticmethod
     def extract_text(response):
         """
@@ -79,6 +270,7 @@ class GeminiService:
         self,
         messages: List[Dict[str, Any]],
         tools_schema: Optional[List[Dict[str, Any]]] = None,
+        usage: Optional[TurnUsage] = None,
     ):
         """
         Send messages to Gemini.
@@ -92,6 +284,10 @@ class GeminiService:
                 }
             ]
 
+        usage:
+            Per-turn accounting; token counts and wall time of this call
+            are appended to it.
+
         Returns either:
            - normal model text
            - or model function calls
@@ -100,10 +296,7 @@ class GeminiService:
         formatted_msgs = self.to_gemini_messages(messages)
 
         logger.info("Sending Gemini chat request...")
-        res = self.model.generate_content(
-            formatted_msgs,
-            tools={"function_declarations": tools_schema})
-        return res
+        return await self._generate(formatted_msgs, tools_schema, usage, self.prompt_chars(messages))
 
     # ---------------------------------------------------------
     #  POST-TOOL CALL LOOP
@@ -112,7 +305,8 @@ class GeminiService:
     async def resume_with_tool_results(self,
         messages: List[Dict[str, Any]],
         tool_response: List[Dict[str, Any]],
-        tools_schema: Optional[List[Dict[str, Any]]] = None):
+        tools_schema: Optional[List[Dict[str, Any]]] = None,
+        usage: Optional[TurnUsage] = None):
         """
         Execute second step:
         - include tool results
@@ -123,12 +317,12 @@ class GeminiService:
         # Add tool results as function response parts
         function_responses = []
         for tr in tool_response:
+            # Failed calls carry "error" instead of "content"
+            result = {"error": tr["error"]} if "error" in tr else {"content": tr["content"]}
             function_responses.append({
                 "function_response": {
                     "name": tr["tool_name"],
-                    "response": {
-                        "content": tr["content"]
-                    }
+                    "response": result
                 }
             })
         
@@ -139,8 +333,9 @@ class GeminiService:
         })
 
         logger.info("Resuming Gemini chat with tool results...")
-        res = self.model.generate_content(
+        return await self._generate(
             formatted_msgs,
-            tools={"function_declarations": tools_schema}
-        )
-        return res
\ No newline at end of file
+            tools_schema,
+            usage,
+            self.prompt_chars(messages, tool_response),
+        )
\ No newline at end of file
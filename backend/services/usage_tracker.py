@@ -0,0 +1,144 @@
+# backend/services/usage_tracker.py
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.config import get_settings
+from backend.utils.metrics import Counter
+
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total",
+    "Tokens reported by Gemini usage_metadata",
+    ("kind",),
+)
+
+PROMPT_SOURCES = ("history", "user", "context", "tool_results")
+
+
+class TurnUsage:
+    """
+    Token and latency accounting for one Chat.run turn.
+
+    Each Gemini call in the tool loop becomes one entry in `calls`
+    (iteration 0 is the initial call, iteration N follows the Nth round of
+    tool results).
+    """
+
+    def __init__(self, session_id: str, turn_id: str, query: str):
+        self.session_id = session_id
+        self.turn_id = turn_id
+        self.query = query[:200]
+        self.started_at = time.time()
+        self.calls: List[Dict[str, Any]] = []
+
+    def add_call(self, response: Any, seconds: float, prompt_chars: Dict[str, int]):
+        meta = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(meta, "prompt_token_count", 0) or 0
+        candidate_tokens = getattr(meta, "candidates_token_count", 0) or 0
+        total_tokens = getattr(meta, "total_token_count", 0) or prompt_tokens + candidate_tokens
+
+        # Attribute reported prompt tokens to sources by character share
+        total_chars = sum(prompt_chars.values()) or 1
+        by_source = {
+            src: round(prompt_tokens * prompt_chars.get(src, 0) / total_chars)
+            for src in PROMPT_SOURCES
+        }
+
+        self.calls.append({
+            "iteration": len(self.calls),
+            "latency_ms": round(seconds * 1000, 2),
+            "prompt_tokens": prompt_tokens,
+            "candidate_tokens": candidate_tokens,
+            "total_tokens": total_tokens,
+            "prompt_chars": dict(prompt_chars),
+            "prompt_tokens_by_source": by_source,
+        })
+
+        GEMINI_TOKENS.inc(prompt_tokens, kind="prompt")
+        GEMINI_TOKENS.inc(candidate_tokens, kind="candidates")
+
+    def totals(self) -> Dict[str, Any]:
+        by_source = {src: 0 for src in PROMPT_SOURCES}
+        for c in self.calls:
+            for src, n in c["prompt_tokens_by_source"].items():
+                by_source[src] += n
+        return {
+            "gemini_calls": len(self.calls),
+            "latency_ms": round(sum(c["latency_ms"] for c in self.calls), 2),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in self.calls),
+            "candidate_tokens": sum(c["candidate_tokens"] for c in self.calls),
+            "total_tokens": sum(c["total_tokens"] for c in self.calls),
+            "prompt_tokens_by_source": by_source,
+        }
+
+    def to_dict(self, include_calls: bool = True) -> Dict[str, Any]:
+        out = {
+            "session_id": self.session_id,
+            "turn_id": self.turn_id,
+            "query": self.query,
+            "started_at": self.started_at,
+            **self.totals(),
+        }
+        if include_calls:
+            out["calls"] = self.calls
+        return out
+
+
+class UsageTracker:
+    """
+    Keeps the most recent turns plus running per-session totals. Session
+    ids come from clients, so only the MAX_SESSIONS most recently active
+    sessions keep their totals.
+    """
+
+    MAX_SESSIONS = 10000
+
+    def __init__(self, max_turns: int = 1000):
+        self._turns: Deque[TurnUsage] = deque(maxlen=max_turns)
+        # session id -> totals, least recently active first
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_turn(self, turn: TurnUsage):
+        totals = turn.totals()
+        with self._lock:
+            self._turns.append(turn)
+            s = self._sessions.setdefault(turn.session_id, {
+                "session_id": turn.session_id,
+                "turns": 0,
+                "gemini_calls": 0,
+                "latency_ms": 0.0,
+                "prompt_tokens": 0,
+                "candidate_tokens": 0,
+                "total_tokens": 0,
+                "prompt_tokens_by_source": {src: 0 for src in PROMPT_SOURCES},
+            })
+            self._sessions.move_to_end(turn.session_id)
+            while len(self._sessions) > self.MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+            s["turns"] += 1
+            for key in ("gemini_calls", "latency_ms", "prompt_tokens", "candidate_tokens", "total_tokens"):
+                s[key] += totals[key]
+            for src, n in totals["prompt_tokens_by_source"].items():
+                s["prompt_tokens_by_source"][src] += n
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(s, latency_ms=round(s["latency_ms"], 2)) for s in self._sessions.values()]
+
+    def top_turns(self, limit: int = 10, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Recent turns with the largest prompts first.
+        """
+        with self._lock:
+            turns = [t for t in self._turns if session_id is None or t.session_id == session_id]
+        turns.sort(key=lambda t: t.totals()["prompt_tokens"], reverse=True)
+        return [t.to_dict() for t in turns[:limit]]
+
+    def session_turns(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [t.to_dict() for t in self._turns if t.session_id == session_id]
+
+
+usage_tracker = UsageTracker(max_turns=get_settings().USAGE_MAX_TURNS)
@@ -1,24 +1,146 @@
 # backend/utils/logger.py
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Optional
 
 from backend.config import get_settings
+from backend.utils.metrics import Counter
+from backend.utils.tracing import current_trace
+
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "session_id",
+}
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the writer queue was full",
+)
+
+_setup_lock = threading.Lock()
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
 
 
 def _build_log_format():
     return (
         "%(asctime)s | %(levelname)s | %(name)s | "
-        "%(filename)s:%(lineno)d | %(message)s"
+        "%(filename)s:%(lineno)d | %(request_id)s | %(message)s"
     )
 
 
+# ------------------------------
+# Lazy, size-limited payloads
+# ------------------------------
+
+class _Truncated:
+    """
+    Defers repr() of a payload until the background writer formats the
+    record, and caps its length.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else repr(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... [{len(text) - self.limit} more chars]"
+
+    __repr__ = __str__
+
+
+def truncated(value: Any, limit: Optional[int] = None) -> _Truncated:
+    """
+    Wrap a large log argument (tool args/results, prompts):
+        logger.info("Tool result: %s", truncated(result))
+    """
+    return _Truncated(value, limit or get_settings().LOG_MAX_FIELD_CHARS)
+
+
+# ------------------------------
+# Record enrichment + formatting
+# ------------------------------
+
+class _CorrelationFilter(logging.Filter):
+    """
+    Runs in the calling thread/task, where the request's trace is visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.request_id = trace.trace_id if trace else "-"
+        record.session_id = (trace.session_id if trace else None) or "-"
+        return True
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them (the listener thread does it)
+    and drops records instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, message capped at max_chars.
+    """
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} more chars]"
+
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": message,
+            "request_id": getattr(record, "request_id", "-"),
+            "session_id": getattr(record, "session_id", "-"),
+            "file": f"{record.filename}:{record.lineno}",
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
 def _create_file_handler(log_dir: Path, log_name: str, level: str) -> RotatingFileHandler:
     """
     Creates rotating file handler:
     - 5MB per file
     - 5 backup files
     """
+    settings = get_settings()
     log_file = log_dir / f"{log_name}.log"
     handler = RotatingFileHandler(
         log_file,
@@ -26,15 +148,54 @@ def _create_file_handler(log_dir: Path, log_name: str, level: str) -> RotatingFi
         backupCount=5,
     )
     handler.setLevel(level)
-    formatter = logging.Formatter(_build_log_format())
-    handler.setFormatter(formatter)
+    handler.setFormatter(JsonFormatter(settings.LOG_MAX_MESSAGE_CHARS))
     return handler
 
 
+def _setup_queue_handler() -> QueueHandler:
+    """
+    Builds the shared queue handler and starts the single background writer
+    (console + one rotating JSON file) on first use.
+    """
+    global _queue_handler, _listener
+
+    with _setup_lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        settings = get_settings()
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(settings.LOG_LEVEL)
+        if settings.LOG_JSON_CONSOLE:
+            console_handler.setFormatter(JsonFormatter(settings.LOG_MAX_MESSAGE_CHARS))
+        else:
+            console_handler.setFormatter(logging.Formatter(_build_log_format()))
+        handlers = [console_handler]
+
+        try:
+            handlers.append(_create_file_handler(settings.LOG_DIR, "backend", settings.LOG_LEVEL))
+        except Exception as e:
+            sys.stderr.write(f"Failed to create file logger: {e}\n")
+
+        handler = _LazyQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        handler.addFilter(_CorrelationFilter())
+
+        _listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush what's still queued
+
+        _queue_handler = handler
+        return handler
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Global logger factory.
     Uses env LOG_LEVEL and LOG_DIR.
+
+    All loggers share one queue; a background thread does the formatting
+    and console/file I/O so callers on the event loop never block on it.
     """
     settings = get_settings()
 
@@ -44,18 +205,6 @@ def get_logger(name: str) -> logging.Logger:
     if logger.handlers:
         return logger  # Prevent duplicate handlers
 
-    # Console Handler (always)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(settings.LOG_LEVEL)
-    console_handler.setFormatter(logging.Formatter(_build_log_format()))
-    logger.addHandler(console_handler)
-
-    # File Handler
-    try:
-        file_handler = _create_file_handler(settings.LOG_DIR, name, settings.LOG_LEVEL)
-        logger.addHandler(file_handler)
-    except Exception as e:
-        logger.error(f"Failed to create file logger: {e}")
-
+    logger.addHandler(_setup_queue_handler())
     logger.propagate = False
-    return logger
\ No newline at end of file
+    return logger
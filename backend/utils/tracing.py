@@ -0,0 +1,93 @@
+# backend/utils/tracing.py
+"""
+Per-request timing spans.
+
+A Trace lives in a context variable, so every await inside one request
+(Chat.run, ToolManager, MCP calls) records into the same trace. Each span
+is also observed into a histogram for the /metrics endpoint.
+
+Like metrics.py, this module must not import backend.config.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from backend.utils.metrics import Histogram
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_duration_seconds",
+    "Time spent per chat pipeline stage",
+    ("stage",),
+)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Spans recorded for one unit of work (an HTTP request, an MCP tool call).
+    """
+
+    def __init__(self, trace_id: Optional[str] = None, name: str = "", session_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.name = name
+        self.session_id = session_id
+        self.spans: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Total milliseconds per stage name.
+        """
+        totals: Dict[str, float] = {}
+        for s in self.spans:
+            totals[s["stage"]] = totals.get(s["stage"], 0.0) + s["ms"]
+        return {k: round(v, 2) for k, v in totals.items()}
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None, name: str = "", session_id: Optional[str] = None):
+    """
+    Make a new Trace current for the enclosed block.
+    """
+    trace = Trace(trace_id, name, session_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str, histogram: Histogram = STAGE_SECONDS, **labels):
+    """
+    Time a block, add it to the current trace and observe it in `histogram`
+    (labelled with `stage` plus `labels`). The block gets a dict whose
+    entries (e.g. a status) are added to the trace span only.
+    """
+    start = time.perf_counter()
+    attrs: Dict[str, Any] = {}
+    try:
+        yield attrs
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, stage=stage, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({"stage": stage, "ms": elapsed * 1000, **labels, **attrs})
+
+
+def trace_meta() -> Optional[Dict[str, str]]:
+    """
+    Request metadata that carries the current trace into the MCP server.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    return {"trace_id": trace.trace_id}
@@ -0,0 +1,21 @@
+# tests/conftest.py
+"""
+Shared test setup. Run from the repo root with `python -m pytest -q`.
+
+Async tests use anyio's pytest plugin (`@pytest.mark.anyio`) on asyncio.
+Nothing here talks to Gemini or spawns the MCP server.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# backend.config requires a key at import time
+os.environ.setdefault("GEMINI_API_KEY", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,125 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from backend.core.admission import AdmissionController, AdmissionRejected, RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def _hold(admission: AdmissionController, release: asyncio.Event, priority: str = "interactive"):
+    async with admission.slot("client", priority, rate_limit=False):
+        await release.wait()
+
+
+async def test_runs_immediately_below_the_limit():
+    admission = AdmissionController(max_in_flight=2, max_queue=0, rate_per_minute=0)
+    async with admission.slot("a"):
+        async with admission.slot("b"):
+            pass
+
+
+async def test_full_queue_is_rejected_with_503():
+    admission = AdmissionController(max_in_flight=1, max_queue=1, rate_per_minute=0)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with admission.slot("c", rate_limit=False):
+            pass
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after >= 1
+
+    release.set()
+    await asyncio.gather(running, waiting)
+
+
+async def test_queue_timeout_is_rejected_with_503():
+    admission = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05, rate_per_minute=0)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with admission.slot("b", rate_limit=False):
+            pass
+    assert exc.value.status_code == 503
+    assert admission.queued == 0
+
+    release.set()
+    await running
+    # The timed-out waiter did not leak a slot
+    async with admission.slot("c", rate_limit=False):
+        pass
+
+
+async def test_interactive_requests_go_ahead_of_batch():
+    admission = AdmissionController(max_in_flight=1, max_queue=8, rate_per_minute=0)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+
+    order = []
+
+    async def queued(name: str, priority: str):
+        async with admission.slot(name, priority, rate_limit=False):
+            order.append(name)
+
+    batch = asyncio.create_task(queued("batch", "batch"))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(queued("interactive", "interactive"))
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(running, batch, interactive)
+    assert order == ["interactive", "batch"]
+
+
+async def test_batch_only_fills_half_the_queue():
+    admission = AdmissionController(max_in_flight=1, max_queue=2, rate_per_minute=0)
+    release = asyncio.Event()
+    running = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+    first = asyncio.create_task(_hold(admission, release, "batch"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected):
+        async with admission.slot("b", "batch", rate_limit=False):
+            pass
+    # Interactive requests still get the other half
+    second = asyncio.create_task(_hold(admission, release))
+    await asyncio.sleep(0)
+    assert admission.queued == 2
+
+    release.set()
+    await asyncio.gather(running, first, second)
+
+
+async def test_unknown_priority_is_a_value_error():
+    admission = AdmissionController(rate_per_minute=0)
+    with pytest.raises(ValueError):
+        async with admission.slot("a", "urgent"):
+            pass
+
+
+def test_rate_limit_rejects_with_429_after_the_burst():
+    admission = AdmissionController(rate_per_minute=60, burst=2)
+    admission.check_rate("a")
+    admission.check_rate("a")
+    with pytest.raises(AdmissionRejected) as exc:
+        admission.check_rate("a")
+    assert exc.value.status_code == 429
+    # Other clients have their own bucket
+    admission.check_rate("b")
+
+
+def test_rate_limiter_prunes_refilled_buckets(monkeypatch):
+    monkeypatch.setattr(RateLimiter, "MAX_CLIENTS", 3)
+    limiter = RateLimiter(rate_per_minute=6e9, burst=1)
+    for i in range(10):
+        assert limiter.acquire(f"client-{i}") == 0
+    assert len(limiter._buckets) <= 4
@@ -0,0 +1,98 @@
+# tests/test_batch.py
+import asyncio
+
+import pytest
+
+from backend.core.batch import SharedToolCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClient:
+    """
+    Records call_tool calls; each answer is the call count at that time.
+    """
+
+    def __init__(self, delay: float = 0.01, fail_first: bool = False):
+        self.calls = []
+        self.delay = delay
+        self.fail_first = fail_first
+
+    async def call_tool(self, name, args, progress_callback=None):
+        self.calls.append((name, dict(args)))
+        await asyncio.sleep(self.delay)
+        if self.fail_first and len(self.calls) == 1:
+            raise RuntimeError("transient")
+        return len(self.calls)
+
+
+async def test_concurrent_identical_reads_make_one_call():
+    client = FakeClient()
+    cache = SharedToolCache()
+    wrapped = cache.wrap(client)
+
+    results = await asyncio.gather(
+        *(wrapped.call_tool("read_sheet", {"file_name": "A.xlsx"}) for _ in range(5))
+    )
+    assert results == [1] * 5
+    assert len(client.calls) == 1
+
+    # A later identical call is answered from the cache too
+    assert await wrapped.call_tool("read_sheet", {"file_name": "A.xlsx"}) == 1
+    # Different arguments are a different call
+    assert await wrapped.call_tool("read_sheet", {"file_name": "B.xlsx"}) == 2
+
+
+async def test_a_write_clears_the_cache():
+    client = FakeClient(delay=0)
+    wrapped = SharedToolCache().wrap(client)
+
+    await wrapped.call_tool("read_sheet", {"file_name": "A.xlsx"})
+    await wrapped.call_tool("append_row", {"file_name": "A.xlsx", "row": {}})
+    await wrapped.call_tool("read_sheet", {"file_name": "A.xlsx"})
+    assert [name for name, _ in client.calls] == ["read_sheet", "append_row", "read_sheet"]
+
+
+async def test_writes_and_cursor_pages_are_never_shared():
+    client = FakeClient(delay=0)
+    wrapped = SharedToolCache().wrap(client)
+
+    await wrapped.call_tool("write_cell", {"file_name": "A.xlsx"})
+    await wrapped.call_tool("write_cell", {"file_name": "A.xlsx"})
+    # Each call on a run_sql cursor returns its next page
+    await wrapped.call_tool("run_sql", {"cursor": "abc", "limit": 10})
+    await wrapped.call_tool("run_sql", {"cursor": "abc", "limit": 10})
+    assert len(client.calls) == 4
+
+
+async def test_a_failed_call_is_retried():
+    client = FakeClient(delay=0, fail_first=True)
+    wrapped = SharedToolCache().wrap(client)
+
+    with pytest.raises(RuntimeError):
+        await wrapped.call_tool("list_sheets", {"file_name": "A.xlsx"})
+    assert await wrapped.call_tool("list_sheets", {"file_name": "A.xlsx"}) == 2
+
+
+async def test_in_flight_calls_are_bounded():
+    active = 0
+    peak = 0
+
+    class Counting(FakeClient):
+        async def call_tool(self, name, args, progress_callback=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return name
+
+    wrapped = SharedToolCache(max_concurrent_calls=2).wrap(Counting())
+    await asyncio.gather(*(wrapped.call_tool("read_sheet", {"file_name": f"{i}.xlsx"}) for i in range(6)))
+    assert peak == 2
+
+
+async def test_other_attributes_reach_the_wrapped_client():
+    client = FakeClient()
+    client.cached_tools = ["read_sheet"]
+    assert SharedToolCache().wrap(client).cached_tools == ["read_sheet"]
@@ -0,0 +1,110 @@
+# tests/test_chat.py
+import json
+import uuid
+
+import pytest
+from mcp.types import CallToolResult, TextContent, Tool
+
+from backend.core.chat import Chat
+from backend.mcp.tool_manager import ToolManager
+from backend.services.fake_gemini import FakeGenerativeModel
+from backend.services.gemini_service import GeminiService
+from backend.services.usage_tracker import usage_tracker
+from backend.utils.tracing import start_trace
+
+pytestmark = pytest.mark.anyio
+
+SCRIPT = {
+    "scripts": [
+        {
+            "match": "loop",
+            "steps": [{"calls": [{"name": "list_sheets", "args": {"file_name": "Deals.xlsx"}}]}],
+        },
+        {
+            "steps": [
+                {"calls": [{"name": "list_sheets", "args": {"file_name": "Deals.xlsx"}}]},
+                {"text": "Deals.xlsx has one sheet, Pipeline."},
+            ]
+        },
+    ]
+}
+
+
+class FakeMCPClient:
+    """
+    Answers list_sheets from memory and records every call.
+    """
+
+    def __init__(self, error: bool = False):
+        self.calls = []
+        self.error = error
+        self.cached_tools = [
+            Tool(
+                name="list_sheets",
+                description="List the sheets of a workbook",
+                inputSchema={
+                    "type": "object",
+                    "properties": {"file_name": {"type": "string", "title": "File Name"}},
+                    "required": ["file_name"],
+                },
+            )
+        ]
+
+    async def list_tools(self):
+        return self.cached_tools
+
+    async def call_tool(self, name, args, progress_callback=None):
+        self.calls.append((name, dict(args)))
+        if self.error:
+            return CallToolResult(content=[TextContent(type="text", text="File not found")], isError=True)
+        return CallToolResult(content=[TextContent(type="text", text=json.dumps(["Pipeline"]))], isError=False)
+
+
+def _chat(client: FakeMCPClient, **kwargs) -> Chat:
+    model = FakeGenerativeModel(SCRIPT)
+    return Chat(GeminiService(generative_model=model), {"excel": client}, **kwargs)
+
+
+async def test_turn_calls_the_tool_and_answers():
+    client = FakeMCPClient()
+    chat = _chat(client)
+    session_id = uuid.uuid4().hex
+
+    with start_trace(session_id=session_id):
+        reply = await chat.run("Which sheets does Deals.xlsx have?")
+
+    assert reply == "Deals.xlsx has one sheet, Pipeline."
+    assert client.calls == [("list_sheets", {"file_name": "Deals.xlsx"})]
+    assert chat.gemini_service.model.calls == 2
+    assert chat.messages[-1] == {"role": "model", "content": reply}
+
+    # Both Gemini calls of the turn were accounted for
+    [turn] = usage_tracker.session_turns(session_id)
+    assert turn["gemini_calls"] == 2
+    assert turn["prompt_tokens"] > 0
+
+
+async def test_tool_loop_is_cut_off():
+    client = FakeMCPClient()
+    chat = _chat(client, max_tool_iterations=2)
+
+    reply = await chat.run("loop forever")
+
+    assert reply.startswith("Stopped after 2 rounds")
+    assert len(client.calls) == 2
+
+
+async def test_tool_error_results_are_reported_as_errors():
+    calls = [{"name": "list_sheets", "arguments": {"file_name": "Missing.xlsx"}}]
+
+    [result] = await ToolManager.execute_tool_calls({"excel": FakeMCPClient(error=True)}, calls)
+
+    assert result == {"tool_name": "list_sheets", "error": "File not found"}
+
+
+async def test_unknown_tools_are_reported_as_errors():
+    calls = [{"name": "drop_database", "arguments": {}}]
+
+    [result] = await ToolManager.execute_tool_calls({"excel": FakeMCPClient()}, calls)
+
+    assert "not available" in result["error"]
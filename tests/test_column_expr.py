@@ -0,0 +1,107 @@
+# tests/test_column_expr.py
+import pandas as pd
+import pytest
+
+from backend.mcp import column_expr
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "Amount": [100.0, 250.0, 40.0],
+        "Probability": [50, 20, 100],
+        "Close Value": [80.0, 0.0, 40.0],
+        "Stage": ["Won", "Lost", "Won"],
+    })
+
+
+def test_arithmetic_over_columns(df):
+    result = column_expr.evaluate(df, "Amount * Probability / 100")
+    assert result.tolist() == [50.0, 50.0, 40.0]
+
+
+def test_backticks_comparisons_and_conditions(df):
+    result = column_expr.evaluate(df, "(`Close Value` - 10) * ((Stage == 'Won') & (Amount > 50))")
+    assert result.tolist() == [70.0, 0.0, 0.0]
+
+
+def test_whitelisted_functions(df):
+    assert column_expr.evaluate(df, "sqrt(Probability)").round(6).tolist() == [7.071068, 4.472136, 10.0]
+
+
+@pytest.mark.parametrize("expression", [
+    # Attribute access, subscripts and calls outside the whitelist
+    "Amount.__class__",
+    "Stage.str.upper()",
+    "Amount[0]",
+    "__import__('os').system('true')",
+    "open('/etc/passwd')",
+    "abs(Amount, 1)",
+    "abs(x=Amount)",
+    # Constructs pandas.eval would otherwise accept or Python would run
+    "lambda: 1",
+    "[x for x in Amount]",
+    "{'a': 1}",
+    "Amount if Amount > 0 else 0",
+    "(Amount := 1)",
+    "f'{Amount}'",
+    "None",
+])
+def test_disallowed_syntax_is_rejected(df, expression):
+    with pytest.raises(ValueError):
+        column_expr.evaluate(df, expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "(Amount > 0) and (Stage == 'Won')",
+    "(Amount > 0) or (Stage == 'Won')",
+    "not (Amount > 0)",
+])
+def test_boolean_keywords_are_rejected(df, expression):
+    with pytest.raises(ValueError, match="instead of and/or/not"):
+        column_expr.evaluate(df, expression)
+
+
+@pytest.mark.parametrize("expression", [
+    # Bitwise meaning on numbers
+    "Amount & Probability",
+    "~Amount",
+    "(Amount > 0) | Probability",
+])
+def test_bitwise_operators_need_conditions(df, expression):
+    with pytest.raises(ValueError, match="combine comparisons"):
+        column_expr.evaluate(df, expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "'ab' * 1000000",
+    "Stage + 'x'",
+    "'%s' % Amount",
+])
+def test_string_literals_are_only_compared(df, expression):
+    with pytest.raises(ValueError, match="String literals"):
+        column_expr.evaluate(df, expression)
+
+
+@pytest.mark.parametrize("expression", ["Stage * 3", "(Stage + Stage) * Probability", "Stage % 2"])
+def test_text_columns_cannot_be_repeated(df, expression):
+    with pytest.raises(ValueError, match="needs numeric columns"):
+        column_expr.evaluate(df, expression)
+
+
+@pytest.mark.parametrize("expression", ["10 ** 10 ** 10", "Amount ** Probability", "2 ** 17"])
+def test_exponents_are_bounded_literals(df, expression):
+    with pytest.raises(ValueError, match="Exponents"):
+        column_expr.evaluate(df, expression)
+
+
+def test_unknown_column_and_reserved_names(df):
+    with pytest.raises(ValueError, match="Unknown column"):
+        column_expr.evaluate(df, "Revenue * 2")
+    with pytest.raises(ValueError, match="reserved"):
+        column_expr.evaluate(df, "__col_0 * 2")
+
+
+def test_overlong_expression_is_rejected(df):
+    with pytest.raises(ValueError, match="longer than"):
+        column_expr.evaluate(df, " + ".join(["Amount"] * 100))
@@ -0,0 +1,75 @@
+# tests/test_sql_mirror.py
+import pytest
+
+from backend.mcp.sql_mirror import SqlMirror
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = SqlMirror(tmp_path, tmp_path / "mirror.sqlite", max_rows=50, registry=None)
+    conn = mirror._db()
+    conn.execute('CREATE TABLE "deals" ("Stage" TEXT, "Amount" REAL)')
+    conn.executemany('INSERT INTO "deals" VALUES (?, ?)', [("Won", 10.0 * i) for i in range(10)])
+    yield mirror
+    mirror._conn.close()
+
+
+def test_select_returns_rows(mirror):
+    result = mirror.query('SELECT Stage, SUM(Amount) AS total FROM deals GROUP BY Stage')
+    assert result["columns"] == ["Stage", "total"]
+    assert result["rows"] == [{"Stage": "Won", "total": 450.0}]
+    assert result["truncated"] is False
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO deals VALUES ('Lost', 1)",
+    "UPDATE deals SET Amount = 0",
+    "DELETE FROM deals",
+    "DROP TABLE deals",
+    "CREATE TABLE t (x)",
+    "CREATE TEMP TABLE t (x)",
+    "ATTACH DATABASE ':memory:' AS other",
+    "PRAGMA query_only = OFF",
+    "PRAGMA journal_mode = DELETE",
+    "SELECT load_extension('x')",
+    "WITH t AS (SELECT 1) DELETE FROM deals",
+])
+def test_anything_but_reads_is_denied(mirror, sql):
+    with pytest.raises(ValueError):
+        mirror.query(sql)
+    assert mirror._db().execute('SELECT COUNT(*) FROM "deals"').fetchone()[0] == 10
+
+
+def test_statements_without_rows_are_rejected(mirror):
+    with pytest.raises(ValueError, match="Only SELECT"):
+        mirror.query("-- no statement")
+
+
+def test_sql_errors_become_value_errors(mirror):
+    with pytest.raises(ValueError, match="SQL error"):
+        mirror.query("SELECT * FROM missing")
+
+
+def test_limit_is_capped_by_max_rows(mirror):
+    result = mirror.query("SELECT * FROM deals d1, deals d2", limit=1000)
+    assert result["row_count"] == 50
+    assert result["truncated"] is True
+    assert "cursor" not in result
+
+
+def test_pages_see_one_snapshot(mirror):
+    first = mirror.query("SELECT Amount FROM deals ORDER BY rowid", limit=4, paginate=True)
+    assert [row["Amount"] for row in first["rows"]] == [0.0, 10.0, 20.0, 30.0]
+
+    # A write between pages is not seen by the open query
+    mirror._db().execute('INSERT INTO "deals" VALUES (?, ?)', ("Lost", 999.0))
+
+    second = mirror.fetch(first["cursor"], limit=4)
+    third = mirror.fetch(second["cursor"], limit=4)
+    amounts = [row["Amount"] for page in (first, second, third) for row in page["rows"]]
+    assert amounts == [10.0 * i for i in range(10)]
+    assert third["truncated"] is False and "cursor" not in third
+
+    # The cursor closed after its last page
+    with pytest.raises(ValueError, match="Unknown or expired cursor"):
+        mirror.fetch(first["cursor"])